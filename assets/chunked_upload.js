@@ -0,0 +1,146 @@
+// assets/chunked_upload.js
+// Chunked, resumable uploads for any element with class "chunked-upload" (server side: utils/uploads.py).
+// Files go up as raw 4 MB chunks instead of one base64 callback payload; an interrupted upload of the same
+// file resumes from the last chunk the server has. When done, the file handles and metadata are written to
+// the dcc.Store named by the element's data-store attribute. Small files the server already has (same sha256)
+// are not sent at all; any duplicate is stored once.
+(function () {
+    const CHUNK_SIZE = 4 * 1024 * 1024;
+    const MAX_RETRIES = 5;
+    // crypto.subtle can only hash a whole buffer, so only small files are probed before sending; bigger ones
+    // are uploaded in chunks and deduplicated by content hash when the server finishes them
+    const PROBE_MAX_BYTES = 8 * 1024 * 1024;
+
+    function resumeKey(file) {
+        return 'janus-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    }
+
+    async function readJson(response) {
+        const body = await response.json().catch(() => ({}));
+        if (!response.ok && response.status !== 409) {
+            throw new Error(body.error || response.statusText);
+        }
+        return body;
+    }
+
+    async function beginUpload(file) {
+        const key = resumeKey(file);
+        const saved = localStorage.getItem(key);
+        if (saved) {
+            const response = await fetch('/upload/' + saved);
+            if (response.ok) {
+                return {id: saved, offset: (await response.json()).offset};
+            }
+            localStorage.removeItem(key);
+        }
+        const started = await readJson(await fetch('/upload', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size}),
+        }));
+        localStorage.setItem(key, started.upload_id);
+        return {id: started.upload_id, offset: started.offset};
+    }
+
+    async function knownFile(file) {
+        if (file.size > PROBE_MAX_BYTES || !(window.crypto && window.crypto.subtle)) {
+            return null;
+        }
+        try {
+            const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+            const sha256 = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+            const response = await fetch('/upload/known/' + sha256);
+            return response.ok ? Object.assign(await response.json(), {filename: file.name}) : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    async function uploadFile(file, onProgress) {
+        const known = await knownFile(file);
+        if (known) {
+            onProgress(1);
+            return known;
+        }
+        let {id, offset} = await beginUpload(file);
+        let retries = 0;
+        onProgress(offset / file.size);
+        while (offset < file.size) {
+            try {
+                const response = await fetch('/upload/' + id + '?offset=' + offset, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/octet-stream'},
+                    body: file.slice(offset, offset + CHUNK_SIZE),
+                });
+                // a 409 carries the offset the server actually has, so either way we continue from there
+                offset = (await readJson(response)).offset;
+                retries = 0;
+            } catch (error) {
+                if (++retries > MAX_RETRIES) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                const response = await fetch('/upload/' + id).catch(() => null);
+                if (response && response.ok) {
+                    offset = (await response.json()).offset;
+                }
+            }
+            onProgress(offset / file.size);
+        }
+        const meta = await readJson(await fetch('/upload/' + id + '/finish', {method: 'POST'}));
+        localStorage.removeItem(resumeKey(file));
+        return meta;
+    }
+
+    async function uploadFiles(zone, files) {
+        if (!files.length || zone.dataset.busy) {
+            return;
+        }
+        zone.dataset.busy = '1';
+        const status = zone.querySelector('.chunked-upload-status');
+        const setStatus = text => { if (status) { status.textContent = text; } };
+        const uploaded = [];
+        const errors = [];
+        for (const [i, file] of files.entries()) {
+            try {
+                uploaded.push(await uploadFile(file, fraction =>
+                    setStatus(`Uploading ${file.name} (${i + 1}/${files.length}): ${Math.floor(fraction * 100)}%`)));
+            } catch (error) {
+                errors.push(file.name + ': ' + error.message);
+            }
+        }
+        setStatus(errors.length ? 'Upload failed for ' + errors.join(', ') : '');
+        delete zone.dataset.busy;
+        if (uploaded.length) {
+            window.dash_clientside.set_props(zone.dataset.store, {data: {files: uploaded, uploaded_at: Date.now()}});
+        }
+    }
+
+    // Dash renders pages after this script runs, so handlers are delegated from the document
+    document.addEventListener('click', event => {
+        const zone = event.target.closest('.chunked-upload');
+        if (!zone) {
+            return;
+        }
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.accept = '.apk';
+        input.multiple = zone.dataset.multiple === 'true';
+        input.onchange = () => uploadFiles(zone, Array.from(input.files));
+        input.click();
+    });
+    document.addEventListener('dragover', event => {
+        if (event.target.closest('.chunked-upload')) {
+            event.preventDefault();
+        }
+    });
+    document.addEventListener('drop', event => {
+        const zone = event.target.closest('.chunked-upload');
+        if (!zone) {
+            return;
+        }
+        event.preventDefault();
+        const files = Array.from(event.dataTransfer.files);
+        uploadFiles(zone, zone.dataset.multiple === 'true' ? files : files.slice(0, 1));
+    });
+})();
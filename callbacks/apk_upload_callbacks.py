@@ -1,41 +1,99 @@
-import base64
-import os
+import logging
+import threading
 import zipfile
-from dash import Input, Output, State, html
+from collections import OrderedDict
+from dash import Input, Output, State, ctx, html
 from app import app
-from utils.dex_parser import DEXParser
+from utils.dex_parser import is_code_dex, parse_dex_entry
+from utils.string_pages import page_items, search_items
+from utils.uploads import upload_path
+from utils.worker_pool import get_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# strings per uploaded APK, keyed by upload handle; filled in the background as each DEX is parsed and
+# paged through server-side by the table
+STRINGS_CACHE_SIZE = 8
+_strings_cache = OrderedDict()
+_strings_lock = threading.Lock()
+
+
+def parse_apk_strings(entry, apk_path):
+    try:
+        with zipfile.ZipFile(apk_path, 'r') as zip_ref:
+            dex_names = [name for name in zip_ref.namelist() if is_code_dex(name)]
+        entry['dex_total'] = len(dex_names)
+        parts = {}
+        # every DEX in memory on the shared pool; each one's strings are visible as soon as it finishes
+        for index, strings in get_worker_pool().imap_unordered(parse_dex_entry, [(apk_path, name) for name in dex_names]):
+            parts[index] = strings
+            with _strings_lock:
+                entry['strings'] = entry['strings'] + strings
+                entry['dex_done'] += 1
+        # final order follows classes.dex, classes2.dex, ...
+        with _strings_lock:
+            entry['strings'] = [s for index in sorted(parts) for s in parts[index]]
+    except Exception as e:
+        logger.error(f"Error parsing {apk_path}: {str(e)}")
+        entry['error'] = str(e)
+    finally:
+        entry['complete'] = True
+
+
+def apk_strings(handle):
+    # the (possibly still filling) entry for an upload, starting its parse on first use
+    with _strings_lock:
+        entry = _strings_cache.get(handle)
+        if entry is not None:
+            _strings_cache.move_to_end(handle)
+            return entry
+        entry = {'strings': [], 'dex_done': 0, 'dex_total': None, 'complete': False, 'error': None}
+        _strings_cache[handle] = entry
+        while len(_strings_cache) > STRINGS_CACHE_SIZE:
+            _strings_cache.popitem(last=False)
+    threading.Thread(target=parse_apk_strings, args=(entry, upload_path(handle)), daemon=True).start()
+    return entry
+
 
 @app.callback(
-    Output('apk-upload-output', 'children'),
-    [Input('upload-apk', 'contents')],
-    [State('upload-apk', 'filename')]
+    [Output('apk-upload-output', 'children'),
+     Output('apk-upload-interval', 'disabled')],
+    [Input('upload-apk-files', 'data'),
+     Input('apk-upload-interval', 'n_intervals')]
 )
-def analyze_apk(contents, filename):
-    if contents is not None:
-        # Decode the file contents
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        
-        # Save the uploaded file
-        apk_path = 'uploaded_apk.apk'
-        with open(apk_path, 'wb') as f:
-            f.write(decoded)
-        
-        # Extract the DEX file from the APK
-        with zipfile.ZipFile(apk_path, 'r') as zip_ref:
-            zip_ref.extract('classes.dex', 'extracted_apk')
-        
-        # Parse the DEX file
-        dex_file_path = os.path.join('extracted_apk', 'classes.dex')
-        parser = DEXParser(dex_file_path)
-        parser.parse()
-        strings = parser.get_strings()
-        
-        # Clean up extracted files
-        os.remove(apk_path)
-        os.remove(dex_file_path)
-        os.rmdir('extracted_apk')
-        
-        # Display the strings
-        return html.Pre('\n'.join(strings))
-    return 'No file uploaded yet.'
\ No newline at end of file
+def analyze_apk(upload, n_intervals):
+    if upload and upload.get('files'):
+        # the chunked upload has already streamed the file to disk
+        entry = apk_strings(upload['files'][0]['handle'])
+        if entry['error']:
+            status = f"Error: {entry['error']}"
+        elif entry['complete']:
+            status = f"{len(entry['strings'])} strings from {entry['dex_total']} DEX files"
+        else:
+            status = f"{len(entry['strings'])} strings so far, {entry['dex_done']}/{entry['dex_total'] or '?'} DEX files parsed"
+        return html.Div([
+            html.H5(upload['files'][0]['filename']),
+            html.Small(status, className='text-muted'),
+        ]), entry['complete']
+    return 'No file uploaded yet.', True
+
+
+@app.callback(
+    [Output('apk-upload-strings', 'data'),
+     Output('apk-upload-strings', 'page_count'),
+     Output('apk-upload-strings', 'page_current')],
+    [Input('apk-upload-strings', 'page_current'),
+     Input('apk-upload-strings', 'page_size'),
+     Input('apk-upload-strings-search', 'value'),
+     Input('upload-apk-files', 'data'),
+     Input('apk-upload-interval', 'n_intervals')]
+)
+def update_strings_table(page_current, page_size, search, upload, n_intervals):
+    if not upload or not upload.get('files'):
+        return [], 1, 0
+    # a new search or upload starts again from the first page
+    if ctx.triggered_id in ('apk-upload-strings-search', 'upload-apk-files'):
+        page_current = 0
+    strings = search_items(apk_strings(upload['files'][0]['handle'])['strings'], search)
+    page, page_count, page_current = page_items(strings, page_current, page_size)
+    return [{'string': s} for s in page], page_count, page_current
@@ -1,130 +1,153 @@
-import base64
-import os
+import threading
 import zipfile
-import tempfile
-from dash import dcc, html
+from collections import OrderedDict
+from itertools import combinations
+from dash import ctx, dcc, html
 from dash.dependencies import Input, Output, State
 from app import app
-from utils.dex_parser import DEXParser
-
-def parse_contents(contents, filename):
-    if isinstance(contents, list):
-        contents = contents[0]
-    if isinstance(filename, list):
-        filename = filename[0]
-
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    temp_dir = tempfile.mkdtemp()
-
-    file_path = os.path.join(temp_dir, filename)
-    with open(file_path, 'wb') as f:
-        f.write(decoded)
-
-    # Extract all DEX files from the APK
-    dex_files = []
+from utils.dex_parser import is_code_dex, parse_dex_entry
+from utils.string_pages import page_items, search_items
+from utils.uploads import upload_path
+from utils.worker_pool import get_worker_pool
+
+# parsed strings per uploaded file, keyed by content hash (the upload handle), so a slot is only parsed
+# when a new file lands in it
+PARSE_CACHE_SIZE = 16
+MAX_INTERNED_STRINGS = 2000000
+_parse_cache = OrderedDict()
+# string -> int id shared by every cached parse; cross-slot matching then compares small ints
+_string_ids = {}
+_parse_locks = {}
+# shared-string masks per combination of uploaded files
+MASK_CACHE_SIZE = 16
+_mask_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# slot membership bitmask -> label shown in the table (and matched by the layout's row styles)
+MATCH_LABELS = {0b011: '1 & 2', 0b110: '2 & 3', 0b101: '1 & 3', 0b111: 'all'}
+
+
+def parse_upload(upload):
+    # strings of the uploaded APK in one slot; upload is that slot's chunked-upload store data
+    handle = upload['files'][0]['handle']
+    # the header and the three table callbacks all fire on a new upload; only one of them parses
+    with _cache_lock:
+        parse_lock = _parse_locks.setdefault(handle, threading.Lock())
+    with parse_lock:
+        return _parse_upload(handle)
+
+
+def _parse_upload(handle):
+    with _cache_lock:
+        if handle in _parse_cache:
+            _parse_cache.move_to_end(handle)
+            return _parse_cache[handle]
+    file_path = upload_path(handle)
+
+    # Parse all DEX files in memory, one worker per DEX
     with zipfile.ZipFile(file_path, 'r') as zip_ref:
-        for file in zip_ref.namelist():
-            if file.startswith('classes') and file.endswith('.dex'):
-                zip_ref.extract(file, temp_dir)
-                dex_files.append(os.path.join(temp_dir, file))
-
-    # Parse all DEX files
+        dex_names = [file for file in zip_ref.namelist() if is_code_dex(file)]
     all_strings = []
-    for dex_file_path in dex_files:
-        parser = DEXParser(dex_file_path)
-        parser.parse()
-        strings = parser.get_strings()
+    for strings in get_worker_pool().starmap(parse_dex_entry, [(file_path, dex_name) for dex_name in dex_names]):
         all_strings.extend(strings)
 
     # Filter strings 'http' or 'https'
     strings_with_http = [s for s in all_strings if 'http:' in s or 'https:' in s or 'https?' in s]
 
-    return strings_with_http
-
-def highlight_matches(list1, list2, list3):
-    matches_1_2 = set(list1) & set(list2) - set(list3)
-    matches_2_3 = set(list2) & set(list3) - set(list1)
-    matches_1_3 = set(list1) & set(list3) - set(list2)
-    matches_all = set(list1) & set(list2) & set(list3)
-
-    highlighted_list1 = [html.Span(s, style={'color': 'red'}) if s in matches_1_2 else
-                         html.Span(s, style={'color': 'blue'}) if s in matches_1_3 else
-                         html.Span(s, style={'color': 'green'}) if s in matches_all else s for s in list1]
-
-    highlighted_list2 = [html.Span(s, style={'color': 'red'}) if s in matches_1_2 else
-                         html.Span(s, style={'color': 'orange'}) if s in matches_2_3 else
-                         html.Span(s, style={'color': 'green'}) if s in matches_all else s for s in list2]
-
-    highlighted_list3 = [html.Span(s, style={'color': 'orange'}) if s in matches_2_3 else
-                         html.Span(s, style={'color': 'blue'}) if s in matches_1_3 else
-                         html.Span(s, style={'color': 'green'}) if s in matches_all else s for s in list3]
-
-    return highlighted_list1, highlighted_list2, highlighted_list3
-
-def align_lists(lists):
-    max_length = max(len(lst) for lst in lists)
-    aligned_lists = []
-    for lst in lists:
-        aligned_list = lst + [''] * (max_length - len(lst))
-        aligned_lists.append(aligned_list)
-    return aligned_lists
-
-def create_tooltip_span(s):
-    return html.Span(
-        s if len(s) <= 50 else s[:50] + '...',
-        title=str(s),
-        style={'whiteSpace': 'nowrap', 'overflow': 'hidden', 'textOverflow': 'ellipsis', 'display': 'inline-block', 'maxWidth': '50ch'}
-    )
+    with _cache_lock:
+        if len(_string_ids) > MAX_INTERNED_STRINGS:
+            # ids are only comparable within one table, so the cached parses go with it
+            _string_ids.clear()
+            _parse_cache.clear()
+            _mask_cache.clear()
+        ids = [_string_ids.setdefault(s, len(_string_ids)) for s in strings_with_http]
+        parsed = {'strings': strings_with_http, 'ids': ids, 'id_set': frozenset(ids)}
+        _parse_cache[handle] = parsed
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            evicted, _ = _parse_cache.popitem(last=False)
+            _parse_locks.pop(evicted, None)
+    return parsed
+
+
+def match_masks(id_sets):
+    # for every id present in at least two slots, a bitmask of the slots holding it
+    shared = set()
+    for a, b in combinations(id_sets, 2):
+        shared |= a & b
+    return {i: sum(1 << k for k, ids in enumerate(id_sets) if i in ids) for i in shared}
+
+
+def slot_uploads(uploads):
+    return [upload if upload and upload.get('files') else None for upload in uploads]
+
+
+def comparison(uploads):
+    # parses and shared-string masks for the three slots; masks are cached per combination of files
+    parsed = [parse_upload(upload) if upload is not None else None for upload in uploads]
+    key = tuple(upload['files'][0]['handle'] if upload is not None else None for upload in uploads)
+    with _cache_lock:
+        masks = _mask_cache.get(key)
+    if masks is None:
+        masks = match_masks([p['id_set'] if p is not None else frozenset() for p in parsed])
+        with _cache_lock:
+            _mask_cache[key] = masks
+            while len(_mask_cache) > MASK_CACHE_SIZE:
+                _mask_cache.popitem(last=False)
+    return parsed, masks
+
 
 @app.callback(
     [Output('output-data-upload-1', 'children'),
      Output('output-data-upload-2', 'children'),
      Output('output-data-upload-3', 'children')],
-    [Input('upload-data-1', 'contents'),
-     Input('upload-data-2', 'contents'),
-     Input('upload-data-3', 'contents')],
-    [State('upload-data-1', 'filename'),
-     State('upload-data-2', 'filename'),
-     State('upload-data-3', 'filename')]
+    [Input('upload-data-1-files', 'data'),
+     Input('upload-data-2-files', 'data'),
+     Input('upload-data-3-files', 'data')]
 )
-def update_output(contents1, contents2, contents3, filename1, filename2, filename3):
+def update_output(upload1, upload2, upload3):
+    uploads = slot_uploads((upload1, upload2, upload3))
+    parsed, masks = comparison(uploads)
     outputs = []
-    lists = []
-    filenames = [filename1, filename2, filename3]
-    for contents, filename in zip([contents1, contents2, contents3], filenames):
-        if contents is not None:
-            lists.append(parse_contents(contents, filename))
-        else:
-            lists.append([])
-
-    aligned_lists = align_lists(lists)
-
-    if len(aligned_lists) == 3:
-        highlighted_list1, highlighted_list2, highlighted_list3 = highlight_matches(aligned_lists[0], aligned_lists[1], aligned_lists[2])
-        outputs.append(html.Div([
-            html.H5(filenames[0]),
-            html.Pre([html.Span([create_tooltip_span(s), html.Br()]) for s in highlighted_list1], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-all'})
-        ]))
-        outputs.append(html.Div([
-            html.H5(filenames[1]),
-            html.Pre([html.Span([create_tooltip_span(s), html.Br()]) for s in highlighted_list2], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-all'})
-        ]))
+    for k, (upload, p) in enumerate(zip(uploads, parsed)):
+        if upload is None:
+            outputs.append(html.Div('No file uploaded yet.'))
+            continue
+        shared = sum(1 for i in p['ids'] if masks.get(i, 0) & (1 << k))
         outputs.append(html.Div([
-            html.H5(filenames[2]),
-            html.Pre([html.Span([create_tooltip_span(s), html.Br()]) for s in highlighted_list3], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-all'})
+            html.H5(upload['files'][0]['filename']),
+            html.Small(f"{len(p['strings'])} strings, {shared} shared with another file", className='text-muted'),
         ]))
-    else:
-        for i, (contents, filename) in enumerate(zip([contents1, contents2, contents3], filenames)):
-            if contents is not None:
-                outputs.append(html.Div([
-                    html.H5(filename),
-                    html.Pre([html.Span([create_tooltip_span(s), html.Br()]) for s in aligned_lists[i]], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-all'})
-                ]))
-            else:
-                outputs.append('No file uploaded yet.')
-
-    while len(outputs) < 3:
-        outputs.append(html.Div('No file uploaded yet.'))
-
     return outputs
+
+
+def register_slot_table(slot):
+    table_id = f'dragdrop-strings-{slot}'
+
+    @app.callback(
+        [Output(table_id, 'data'),
+         Output(table_id, 'page_count'),
+         Output(table_id, 'page_current')],
+        [Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(f'{table_id}-search', 'value'),
+         Input('upload-data-1-files', 'data'),
+         Input('upload-data-2-files', 'data'),
+         Input('upload-data-3-files', 'data')]
+    )
+    def update_slot_table(page_current, page_size, search, upload1, upload2, upload3):
+        uploads = slot_uploads((upload1, upload2, upload3))
+        if uploads[slot - 1] is None:
+            return [], 1, 0
+        # a new search or upload starts again from the first page
+        if ctx.triggered_id != table_id:
+            page_current = 0
+        parsed, masks = comparison(uploads)
+        p = parsed[slot - 1]
+        items = search_items(list(zip(p['strings'], p['ids'])), search, key=lambda item: item[0])
+        page, page_count, page_current = page_items(items, page_current, page_size)
+        data = [{'string': s, 'match': MATCH_LABELS.get(masks.get(i, 0), '')} for s, i in page]
+        return data, page_count, page_current
+
+
+for slot in (1, 2, 3):
+    register_slot_table(slot)
@@ -0,0 +1,156 @@
+# callbacks/batch_connectivity_callbacks.py
+from dash import no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import logging
+
+from app import app
+from callbacks.historical_connectivity_callbacks import incremental_progress, render_results
+from layouts.historical_connectivity_layout import preset_configs
+from utils.batch_analysis import load_package_file, parse_package_list
+from utils.jobs import ACTIVE_STATUSES, cancel_job, cancel_session_jobs, get_job, get_job_result, submit_job
+
+logger = logging.getLogger(__name__)
+
+COMBINED_VIEW = '__combined__'
+
+@app.callback(
+    Output("batch-package-list", "value"),
+    [Input("batch-package-file", "contents")],
+    [State("batch-package-list", "value")],
+    prevent_initial_call=True
+)
+def load_package_list_file(contents, current_value):
+    if not contents:
+        raise PreventUpdate
+    packages = parse_package_list((current_value or '') + '\n' + load_package_file(contents))
+    return '\n'.join(packages)
+
+@app.callback(
+    [Output("batch-connectivity-job", "data"),
+     Output("batch-results", "children", allow_duplicate=True),
+     Output("batch-result-package", "options", allow_duplicate=True),
+     Output("batch-error-message", "children", allow_duplicate=True),
+     Output("batch-submit-button", "disabled", allow_duplicate=True)],
+    [Input("batch-submit-button", "n_clicks")],
+    [State("batch-api-key", "value"),
+     State("batch-start-date", "value"),
+     State("batch-end-date", "value"),
+     State("batch-package-list", "value"),
+     State("batch-desired-versions", "value"),
+     State("batch-highlight-dropdown", "value"),
+     State("batch-num-cores-slider", "value"),
+     State("batch-parser-selection", "value"),
+     State("batch-summary-export-formats", "value"),
+     State("session-id", "data")],
+    prevent_initial_call=True
+)
+def submit_batch_callback(n_clicks, api_key, start_date, end_date, package_list, desired_versions, highlight_presets, num_cores, parser_selection, summary_formats, session_id):
+    if not n_clicks:
+        raise PreventUpdate
+
+    packages = parse_package_list(package_list)
+    if not packages:
+        return no_update, no_update, no_update, "Please enter at least one package.", False
+
+    highlight_config = [{"name": preset, "regex": preset_configs[preset]["regex"], "color": preset_configs[preset]["color"]}
+                        for preset in highlight_presets or []]
+    try:
+        for cancelled_job_id in cancel_session_jobs(session_id, 'historical_connectivity_batch'):
+            logger.info(f"Cancelling previous batch job {cancelled_job_id} for session {session_id}")
+
+        job_id = submit_job('historical_connectivity_batch', {
+            'api_key': api_key,
+            'start_date': start_date,
+            'end_date': end_date,
+            'package_list_input': '\n'.join(packages),
+            'desired_versions': desired_versions,
+            'highlight_config': highlight_config,
+            'num_cores': num_cores,
+            'parser_selection': parser_selection,
+            'summary_formats': summary_formats or [],
+        }, session_id=session_id)
+        logger.info(f"Queued batch job {job_id} for {len(packages)} packages")
+        return {'job_id': job_id, 'rendered': False}, [], [], "", True
+    except Exception as e:
+        error_message = f"An error occurred: {str(e)}"
+        logger.error(error_message)
+        return no_update, [], [], error_message, False
+
+@app.callback(
+    Output("batch-job-status", "children", allow_duplicate=True),
+    [Input("batch-cancel-button", "n_clicks")],
+    [State("batch-connectivity-job", "data")],
+    prevent_initial_call=True
+)
+def cancel_batch_callback(n_clicks, job_data):
+    if not n_clicks or not job_data or not job_data.get('job_id') or job_data.get('rendered'):
+        raise PreventUpdate
+    cancel_job(job_data['job_id'])
+    return f"Job {job_data['job_id'][:8]}: cancelling"
+
+@app.callback(
+    [Output("batch-connectivity-job", "data", allow_duplicate=True),
+     Output("batch-result-package", "options"),
+     Output("batch-result-package", "value"),
+     Output("batch-error-message", "children"),
+     Output("batch-submit-button", "disabled"),
+     Output("batch-job-status", "children")],
+    [Input("batch-progress-interval", "n_intervals")],
+    [State("batch-connectivity-job", "data")],
+    prevent_initial_call=True
+)
+def poll_batch_callback(n, job_data):
+    if not job_data or not job_data.get('job_id') or job_data.get('rendered'):
+        raise PreventUpdate
+
+    job = get_job(job_data['job_id'])
+    if job is None:
+        raise PreventUpdate
+
+    status_text = f"Job {job['job_id'][:8]}: {job['status']}"
+    if job['status'] in ACTIVE_STATUSES:
+        return no_update, no_update, no_update, no_update, True, status_text
+
+    job_data = dict(job_data, rendered=True)
+    if job['status'] == 'completed':
+        results = get_job_result(job['job_id']) or {}
+        options = [{'label': 'All packages (combined)', 'value': COMBINED_VIEW}] if results.get('combined') else []
+        options.extend({'label': package_name, 'value': package_name} for package_name in results.get('packages', {}))
+        if not options:
+            return job_data, [], None, "No data to display. Please check your inputs and try again.", False, status_text
+        return job_data, options, options[0]['value'], "", False, status_text
+    if job['status'] == 'failed':
+        return job_data, [], None, f"An error occurred: {job['error']}", False, status_text
+    return job_data, [], None, "Processing was cancelled or interrupted. Resubmit to resume.", False, status_text
+
+@app.callback(
+    Output("batch-results", "children"),
+    [Input("batch-result-package", "value")],
+    [State("batch-connectivity-job", "data")],
+    prevent_initial_call=True
+)
+def show_batch_result(selected, job_data):
+    # figures are rendered one package at a time, a batch can hold hundreds
+    if not selected or not job_data or not job_data.get('job_id'):
+        return []
+    results = get_job_result(job_data['job_id'])
+    if not results:
+        return []
+    if selected == COMBINED_VIEW:
+        return render_results(results['combined'], "combined")
+    return render_results(results['packages'].get(selected) or {}, selected)
+
+@app.callback(
+    [Output('batch-progress-log', 'children'),
+     Output('batch-download-progress', 'value'),
+     Output('batch-download-progress', 'label'),
+     Output('batch-parse-progress', 'value'),
+     Output('batch-parse-progress', 'label'),
+     Output('batch-connectivity-progress', 'data')],
+    [Input('batch-progress-interval', 'n_intervals')],
+    [State('batch-connectivity-job', 'data'),
+     State('batch-connectivity-progress', 'data')]
+)
+def update_batch_progress(n, job_data, progress_data):
+    return incremental_progress(job_data, progress_data)
@@ -0,0 +1,58 @@
+# callbacks/endpoint_search_callbacks.py
+from dash import html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+import logging
+
+from app import app
+from utils.results_store import get_results_store
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULT_ROWS = 5000
+
+@app.callback(
+    [Output("endpoint-search-results", "children"),
+     Output("endpoint-search-stats", "children")],
+    [Input("endpoint-search-button", "n_clicks"),
+     Input("endpoint-search-term", "value")],
+    [State("endpoint-search-type", "value"),
+     State("endpoint-search-prefix", "value")],
+    prevent_initial_call=True
+)
+def search_endpoints(n_clicks, term, data_type, prefix):
+    if not term or not term.strip():
+        raise PreventUpdate
+
+    index = get_results_store().endpoint_index
+    # APKs analysed by other processes (e.g. cli.py) are picked up by the background backfill, not per search
+    index.ensure_backfill()
+    try:
+        rows, elapsed_ms = index.lookup(term, None if data_type == 'any' else data_type, bool(prefix), MAX_RESULT_ROWS)
+    except Exception as e:
+        logger.error(f"Endpoint search failed: {str(e)}")
+        return html.Div(f"An error occurred: {str(e)}", className="text-danger"), ""
+
+    packages = {row['package'] for row in rows}
+    stats = f"{len(rows)} matches in {len(packages)} packages ({elapsed_ms:.1f} ms)"
+    if len(rows) >= MAX_RESULT_ROWS:
+        stats += f", showing the first {MAX_RESULT_ROWS}"
+    if not rows:
+        return html.P("No analysed app embeds this endpoint."), stats
+
+    table = dbc.Table(
+        [html.Thead(html.Tr([html.Th(name) for name in ("Package", "Version", "Date", "Type", "Endpoint", "Count")]))] +
+        [html.Tbody([
+            html.Tr([
+                html.Td(html.A(row['package'], href=f"https://play.google.com/store/apps/details?id={row['package']}", target="_blank")),
+                html.Td(row['version']),
+                html.Td((row['date'] or '')[:10]),
+                html.Td(row['data_type']),
+                html.Td(row['term'], style={'wordBreak': 'break-all'}),
+                html.Td(row['count']),
+            ]) for row in rows
+        ])],
+        bordered=True, hover=True, size="sm", striped=True
+    )
+    return table, stats
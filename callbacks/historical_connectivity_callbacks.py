@@ -1,9 +1,11 @@
 # callbacks/apk_historical_analysis_callbacks.py
-from dash import dcc, html, callback_context, no_update
+from dash import dcc, html, callback_context, no_update, Patch
 import dash
 from dash.dependencies import Input, Output, State, ALL
 from app import app
-from utils.historical_connectivity_logic import process_apks, generate_download_link, ui_logger, current_process
+from utils.historical_connectivity_logic import generate_download_link, ui_logger
+from utils.version_diff import plot_changes_timeline
+from utils.jobs import ACTIVE_STATUSES, JOB_EVENTS_PER_JOB, cancel_job, cancel_session_jobs, get_job, get_job_result, submit_job
 import json
 import dash_bootstrap_components as dbc
 import re
@@ -128,9 +130,10 @@ def create_highlight_list(highlight_config):
     ]
 
 @app.callback(
-    [Output("results-historical-connectivity", "children"),
-     Output("error-message", "children"),
-     Output("submit-button", "disabled"),
+    [Output("historical-connectivity-job", "data"),
+     Output("results-historical-connectivity", "children", allow_duplicate=True),
+     Output("error-message", "children", allow_duplicate=True),
+     Output("submit-button", "disabled", allow_duplicate=True),
      Output("loading-output", "children")],
     [Input("submit-button", "n_clicks")],
     [State("api-key", "value"),
@@ -140,73 +143,220 @@ def create_highlight_list(highlight_config):
      State("desired-versions", "value"),
      State("highlight-config-store", "data"),
      State("num-cores-slider", "value"),
-     State("parser-selection", "value")]
+     State("parser-selection", "value"),
+     State("summary-export-formats", "value"),
+     State("session-id", "data")],
+    prevent_initial_call=True
 )
-def process_apks_callback(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection):
-    global current_process
-
+def process_apks_callback(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection, summary_formats, session_id):
     if n_clicks is None:
         raise PreventUpdate
 
     ctx = callback_context
     if not ctx.triggered:
         raise PreventUpdate
-    
+
+    if not package_list_input:
+        return no_update, no_update, "Please select a package.", False, None
+
     try:
-        # Cancel the existing process if there is one
-        if current_process is not None and current_process != threading.current_thread():
-            current_process = None
-            ui_logger.logger.info("Cancelling previous process")
+        # Cancel this session's previous job if it is still going, other users' jobs are left alone
+        for cancelled_job_id in cancel_session_jobs(session_id, 'historical_connectivity'):
+            logger.info(f"Cancelling previous job {cancelled_job_id} for session {session_id}")
 
-        ui_logger.logger.info("Starting new APK processing")
-        results = process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection)
-        
-        if results is None:
-            ui_logger.logger.warning("Processing was cancelled or no data to display. Please check your inputs and try again.")
-            return [], "Processing was cancelled or no data to display. Please check your inputs and try again.", False, None
-
-        output_results = []
-        for data_type, result in results.items():
-            if result['too_large_to_display']:
-                output_results.extend([
-                    html.H4(f"{data_type.capitalize()} Analysis"),
-                    html.P(f"The {data_type} dataset is too large to display ({result['feature_count']} features). Please download the figure to view."),
-                    generate_download_link(result['figure'], package_list_input, data_type),
-                    html.Hr()
-                ])
-            else:
-                dropdown_options = [{'label': info['feature'], 'value': i} for i, info in enumerate(result['feature_info'])]
-                
-                output_results.extend([
-                    html.H4(f"{data_type.capitalize()} Analysis"),
-                    dcc.Graph(figure=result['figure'], style={'height': '800px'}),
-                    generate_download_link(result['figure'], package_list_input, data_type),
-                    html.H5("Feature Information"),
-                    dcc.Dropdown(
-                        id=f'feature-dropdown-{data_type}',
-                        options=dropdown_options,
-                        value=0 if dropdown_options else None,
-                        placeholder="Select a feature",
-                        style={'marginBottom': '10px'}
-                    ),
-                    html.Div(id=f'feature-info-{data_type}'),
-                    dcc.Store(id=f'feature-info-store-{data_type}', data=result['feature_info']),
-                    html.Hr()
-                ])
-
-        ui_logger.logger.info("APK processing complete")
-        return output_results, "", False, None
+        job_id = submit_job('historical_connectivity', {
+            'api_key': api_key,
+            'start_date': start_date,
+            'end_date': end_date,
+            'package_list_input': package_list_input,
+            'desired_versions': desired_versions,
+            'highlight_config': highlight_config or [],
+            'num_cores': num_cores,
+            'parser_selection': parser_selection,
+            'summary_formats': summary_formats or [],
+        }, session_id=session_id)
+        logger.info(f"Queued APK processing job {job_id}")
+        return {'job_id': job_id, 'package': package_list_input, 'rendered': False}, [], "", True, None
     except Exception as e:
         error_message = f"An error occurred: {str(e)}"
-        ui_logger.logger.error(error_message)
-        return [], error_message, False, None
+        logger.error(error_message)
+        return no_update, [], error_message, False, None
+
+@app.callback(
+    Output("job-status", "children", allow_duplicate=True),
+    [Input("cancel-button", "n_clicks")],
+    [State("historical-connectivity-job", "data")],
+    prevent_initial_call=True
+)
+def cancel_job_callback(n_clicks, job_data):
+    if not n_clicks or not job_data or not job_data.get('job_id') or job_data.get('rendered'):
+        raise PreventUpdate
+    cancel_job(job_data['job_id'])
+    logger.info(f"Cancellation requested for job {job_data['job_id']}")
+    return f"Job {job_data['job_id'][:8]}: cancelling"
 
 @app.callback(
-    Output('progress-historical-connectivity', 'children'),
-    [Input('progress-interval', 'n_intervals')]
+    [Output("historical-connectivity-job", "data", allow_duplicate=True),
+     Output("results-historical-connectivity", "children"),
+     Output("error-message", "children"),
+     Output("submit-button", "disabled"),
+     Output("job-status", "children")],
+    [Input("progress-interval", "n_intervals")],
+    [State("historical-connectivity-job", "data")],
+    prevent_initial_call=True
 )
-def update_progress(n):
-    return ui_logger.get_logs()
+def poll_job_callback(n, job_data):
+    if not job_data or not job_data.get('job_id') or job_data.get('rendered'):
+        raise PreventUpdate
+
+    job = get_job(job_data['job_id'])
+    if job is None:
+        raise PreventUpdate
+
+    status_text = f"Job {job['job_id'][:8]}: {job['status']}"
+    if job['status'] in ACTIVE_STATUSES:
+        return no_update, no_update, no_update, True, status_text
+
+    job_data = dict(job_data, rendered=True)
+    if job['status'] == 'completed':
+        results = get_job_result(job['job_id'])
+        if not results:
+            message = "No data to display. Please check your inputs and try again."
+            return job_data, [], message, False, status_text
+        return job_data, render_results(results, job_data['package']), "", False, status_text
+    if job['status'] == 'failed':
+        return job_data, [], f"An error occurred: {job['error']}", False, status_text
+    return job_data, [], "Processing was cancelled or interrupted.", False, status_text
+
+def render_results(results, package_name):
+    output_results = []
+    for data_type, result in results.items():
+        if result is None:
+            continue
+        summary_files = create_summary_file_list(result.get('summary_files'))
+        if result['too_large_to_display']:
+            output_results.extend([
+                html.H4(f"{data_type.capitalize()} Analysis"),
+                html.P(f"The {data_type} dataset is too large to display ({result['feature_count']} features). Please download the figure to view."),
+                generate_download_link(result['figure'], package_name, data_type),
+                summary_files,
+                create_changes_timeline(result.get('changes'), package_name, data_type),
+                html.Hr()
+            ])
+        else:
+            dropdown_options = [{'label': info['feature'], 'value': i} for i, info in enumerate(result['feature_info'])]
+
+            output_results.extend([
+                html.H4(f"{data_type.capitalize()} Analysis"),
+                dcc.Graph(figure=result['figure'], style={'height': '800px'}),
+                generate_download_link(result['figure'], package_name, data_type),
+                summary_files,
+                html.H5("Feature Information"),
+                dcc.Dropdown(
+                    id=f'feature-dropdown-{data_type}',
+                    options=dropdown_options,
+                    value=0 if dropdown_options else None,
+                    placeholder="Select a feature",
+                    style={'marginBottom': '10px'}
+                ),
+                html.Div(id=f'feature-info-{data_type}'),
+                dcc.Store(id=f'feature-info-store-{data_type}', data=result['feature_info']),
+                create_changes_timeline(result.get('changes'), package_name, data_type),
+                html.Hr()
+            ])
+    return output_results
+
+def create_changes_timeline(changes, package_name, data_type, max_listed=50):
+    # only the changes are sent to the browser, not the full feature x version matrix
+    if not changes:
+        return html.Div()
+
+    def feature_list(title, features, color):
+        if not features:
+            return None
+        shown = [html.Li(feature, style={'color': color}) for feature in features[:max_listed]]
+        if len(features) > max_listed:
+            shown.append(html.Li(f"... and {len(features) - max_listed} more", className="text-muted"))
+        return html.Div([html.Strong(title), html.Ul(shown)])
+
+    transitions = [
+        html.Details([
+            html.Summary(f"{delta['from_version']} → {delta['to_version']} ({delta['date']}): "
+                         f"+{len(delta['added'])} / -{len(delta['removed'])} / ={delta['persisting']}"),
+            feature_list("Added", delta['added'], 'green'),
+            feature_list("Removed", delta['removed'], 'red'),
+        ])
+        for delta in changes if delta['added'] or delta['removed']
+    ]
+    return html.Div([
+        html.H5("Changes Timeline"),
+        dcc.Graph(figure=plot_changes_timeline(changes, package_name, data_type), style={'height': '400px'}),
+        html.Div(transitions or html.P("No changes between the sampled versions."), style={'maxHeight': '300px', 'overflowY': 'auto'}),
+    ], className="mt-3")
+
+def create_summary_file_list(summary_files):
+    if not summary_files:
+        return html.Div()
+    return html.Div([
+        html.Small("Summaries written to:", className="text-muted d-block"),
+        html.Ul([html.Li(html.Code(path)) for path in summary_files])
+    ], className="mt-2")
+
+def progress_bar_state(event):
+    if not event or not event['total']:
+        return 0, ""
+    return round(100 * event['done'] / event['total']), f"{event['done']}/{event['total']}"
+
+@app.callback(
+    [Output('progress-historical-connectivity', 'children'),
+     Output('download-progress', 'value'),
+     Output('download-progress', 'label'),
+     Output('parse-progress', 'value'),
+     Output('parse-progress', 'label'),
+     Output('historical-connectivity-progress', 'data')],
+    [Input('progress-interval', 'n_intervals')],
+    [State('historical-connectivity-job', 'data'),
+     State('historical-connectivity-progress', 'data')]
+)
+def update_progress(n, job_data, progress_data):
+    return incremental_progress(job_data, progress_data)
+
+def incremental_progress(job_data, progress_data):
+    # only events newer than the last seen sequence number are fetched and sent to the browser
+    if not job_data or not job_data.get('job_id'):
+        raise PreventUpdate
+
+    job_id = job_data['job_id']
+    progress_data = progress_data or {}
+    new_job = progress_data.get('job_id') != job_id
+    after_seq = 0 if new_job else progress_data.get('seq', 0)
+
+    events, seq, truncated = ui_logger.get_events(job_id, after_seq)
+    if not events and not new_job:
+        raise PreventUpdate
+
+    lines = [event['message'] + '\n' for event in events if event['type'] == 'log']
+    latest = {}
+    for event in events:
+        if event['type'] == 'progress':
+            latest[event['stage']] = event
+
+    shown = 0 if new_job else progress_data.get('shown', 0)
+    if new_job or truncated or shown + len(lines) > JOB_EVENTS_PER_JOB:
+        # start over from what the server still holds, so the browser's copy stays bounded too
+        if not new_job:
+            events, seq, _ = ui_logger.get_events(job_id)
+            lines = [event['message'] + '\n' for event in events if event['type'] == 'log']
+        log_children = lines
+        shown = len(lines)
+    else:
+        log_children = Patch()
+        log_children.extend(lines)
+        shown += len(lines)
+
+    download_value, download_label = progress_bar_state(latest.get('download')) if 'download' in latest or new_job else (no_update, no_update)
+    parse_value, parse_label = progress_bar_state(latest.get('parse')) if 'parse' in latest or new_job else (no_update, no_update)
+    return log_children, download_value, download_label, parse_value, parse_label, {'job_id': job_id, 'seq': seq, 'shown': shown}
 
 for data_type in ['urls', 'domains', 'subdomains']:
     @app.callback(
@@ -41,35 +41,39 @@ def update_output(n_clicks, api_key, pkgs1, start_date1, end_date1, pkgs2, start
         svm_progress['current_task'] = "Currently searching for APKs"
 
         sample1 = {
-            'package_names': pkgs1.split(','),
+            'package_names': [pkg.strip() for pkg in pkgs1.split(',') if pkg.strip()],
             'start_date': datetime.strptime(start_date1, "%Y-%m-%d"),
-            'end_date': datetime.strptime(start_date1, "%Y-%m-%d"),
+            'end_date': datetime.strptime(end_date1, "%Y-%m-%d"),
             'desired_versions': desired_versions1,
             'folder_name': 'Sample1'
         }
         sample2 = {
-            'package_names': pkgs2.split(','),
+            'package_names': [pkg.strip() for pkg in pkgs2.split(',') if pkg.strip()],
             'start_date': datetime.strptime(start_date2, "%Y-%m-%d"),
-            'end_date': datetime.strptime(start_date2, "%Y-%m-%d"),
+            'end_date': datetime.strptime(end_date2, "%Y-%m-%d"),
             'desired_versions': desired_versions2,
             'folder_name': 'Sample2'
         }
 
-        for sample in [sample1, sample2]:
-            for pkg in sample['package_names']:
-                svm_progress['current_task'] = f"Currently downloading {pkg}"
-                svm_utils.download_apks_for_config([pkg], sample['start_date'], sample['end_date'],
-                                                   sample['desired_versions'], sample['folder_name'])
+        # both samples are planned in one pass over the catalogue, then downloaded together
+        plan = svm_utils.plan_samples([sample1, sample2])
 
-        folder_paths = {
-            'downloaded_apks/Sample1': 'Sample1',
-            'downloaded_apks/Sample2': 'Sample2'
-        }
-        features_list, labels_list = svm_utils.extract_features_and_labels(folder_paths, 'features_labels.pkl',
-                                                                           [svm_utils.extract_full_urls_from_apk,
-                                                                            svm_utils.extract_permissions])
-        df = svm_utils.prepare_dataframe(features_list, labels_list)
-        sorted_features = svm_utils.perform_svm_analysis(df)
+        def download_progress(done, total):
+            svm_progress['current_task'] = f"Currently downloading APKs ({done}/{total})"
+
+        svm_progress['current_task'] = f"Currently downloading {len(plan)} APKs"
+        apk_samples = svm_utils.download_planned_apks(plan, progress=download_progress)
+
+        def extraction_progress(done, total):
+            svm_progress['current_task'] = f"Currently extracting features ({done}/{total} new APKs)"
+
+        svm_progress['current_task'] = "Currently extracting features"
+        features_list, labels_list = svm_utils.extract_features_and_labels(apk_samples,
+                                                                           svm_utils.SVM_FEATURE_EXTRACTORS,
+                                                                           'features_labels.pkl',
+                                                                           progress=extraction_progress)
+        X, feature_names, y = svm_utils.prepare_feature_matrix(features_list, labels_list)
+        sorted_features = svm_utils.rank_features(X, y, feature_names)
         svm_progress['current_task'] = f"Completed"
         return html.Div([
             html.H3("SVM Analysis Results"),
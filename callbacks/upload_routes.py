@@ -0,0 +1,57 @@
+# callbacks/upload_routes.py
+# HTTP side of the chunked uploads used by assets/chunked_upload.js
+from flask import jsonify, request
+
+from app import server
+from utils.uploads import UploadError, append_chunk, finish_upload, known_upload, start_upload, upload_status
+
+
+def upload_error(e):
+    body = {'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+
+@server.route('/upload', methods=['POST'])
+def upload_start():
+    params = request.get_json(silent=True) or {}
+    try:
+        return jsonify(start_upload(params.get('filename'), params.get('size', 0)))
+    except (UploadError, ValueError, TypeError) as e:
+        return upload_error(e if isinstance(e, UploadError) else UploadError(str(e)))
+
+
+@server.route('/upload/known/<sha256>', methods=['GET'])
+def upload_known(sha256):
+    try:
+        return jsonify(known_upload(sha256))
+    except UploadError as e:
+        return upload_error(e)
+
+
+@server.route('/upload/<upload_id>', methods=['GET'])
+def upload_get(upload_id):
+    try:
+        return jsonify(upload_status(upload_id))
+    except UploadError as e:
+        return upload_error(e)
+
+
+@server.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get('offset', -1))
+        return jsonify(append_chunk(upload_id, offset, request.stream, request.content_length or 0))
+    except ValueError:
+        return upload_error(UploadError("Invalid offset"))
+    except UploadError as e:
+        return upload_error(e)
+
+
+@server.route('/upload/<upload_id>/finish', methods=['POST'])
+def upload_finish(upload_id):
+    try:
+        return jsonify(finish_upload(upload_id))
+    except UploadError as e:
+        return upload_error(e)
@@ -7,9 +7,7 @@ from utils.user_apk_analysis_logic import (
     process_uploaded_apks,
     generate_download_link,
     extract_apk_features,
-    plot_data,
-    save_uploaded_files,
-    save_uploaded_file_to_server
+    plot_data
 )
 from dash.exceptions import PreventUpdate
 
@@ -18,18 +16,15 @@ from dash.dependencies import Input, Output, State, ALL, MATCH
 from dash.exceptions import PreventUpdate
 import dash
 from app import app
-from utils.user_apk_analysis_logic import process_uploaded_apks, generate_download_link, extract_apk_features
+from utils.user_apk_analysis_logic import process_uploaded_apks, generate_download_link, extract_apk_features, upload_run_id
+from utils.jobs import get_job_events
+from dash import Patch
 import logging
 import json
 import re
 from layouts.user_apk_analysis_layout import preset_configs
 import dash_bootstrap_components as dbc
-from androguard.core.bytecodes.apk import APK
-import base64
-import io
-import tempfile
-import os
-from multiprocessing import Pool
+from utils.uploads import apk_metadata, upload_path
 
 
 logging.basicConfig(level=logging.INFO)
@@ -37,15 +32,14 @@ logger = logging.getLogger(__name__)
 
 @app.callback(
     Output('user-apk-upload-output', 'children'),
-    Input('user-apk-upload', 'contents'),
-    State('user-apk-upload', 'filename')
+    Input('user-apk-upload-files', 'data')
 )
-def update_output(list_of_contents, list_of_names):
-    if list_of_contents is not None:
+def update_output(upload):
+    if upload and upload.get('files'):
         children = [
             html.Div([
-                html.H5(f'Uploaded file: {name}')
-            ]) for name in list_of_names
+                html.H5(f"Uploaded file: {item['filename']}")
+            ]) for item in upload['files']
         ]
         return children
     return []
@@ -205,12 +199,33 @@ def is_valid_color(color):
     return color.lower() in valid_color_names
 
 @app.callback(
-    Output("user-apk-progress", "children"),
-    [Input("user-apk-progress-interval", "n_intervals")]
+    [Output("user-apk-progress", "children"),
+     Output("user-apk-progress-store", "data")],
+    [Input("user-apk-progress-interval", "n_intervals")],
+    [State("user-apk-upload-store", "data"),
+     State("user-apk-parser-selection", "value"),
+     State("user-apk-progress-store", "data")]
 )
-def update_progress(n):
-    # Implement progress update logic here
-    return "Processing..."
+def update_progress(n, stored_data, parser_selection, progress_data):
+    # per-APK lines from the analysis of the current uploads; only events newer than the last seen one are sent
+    if not stored_data:
+        raise PreventUpdate
+    run_id = upload_run_id(stored_data, parser_selection)
+    progress_data = progress_data or {}
+    after_seq = progress_data.get('seq', 0) if progress_data.get('run_id') == run_id else 0
+    events, seq, _ = get_job_events(run_id, after_seq)
+    if not events:
+        raise PreventUpdate
+
+    # a new analysis of the same uploads starts with a parse 0/N event and replaces the earlier lines
+    starts = [k for k, event in enumerate(events) if event['type'] == 'progress' and event['done'] == 0]
+    lines = [event['message'] + '\n' for event in events[starts[-1] if starts else 0:] if event['type'] == 'log']
+    if after_seq and not starts:
+        children = Patch()
+        children.extend(lines)
+    else:
+        children = lines
+    return children, {'run_id': run_id, 'seq': seq}
 
 # Add these callbacks for each data type
 for data_type in ['urls', 'domains', 'subdomains']:
@@ -241,39 +256,35 @@ for data_type in ['urls', 'domains', 'subdomains']:
 @app.callback(
     [Output('user-apk-upload-store', 'data'),
      Output('user-apk-upload-list', 'children')],
-    [Input('user-apk-upload', 'contents'),
-     Input('user-apk-upload', 'filename'),
+    [Input('user-apk-upload-files', 'data'),
      Input({'type': 'move-up', 'index': ALL}, 'n_clicks'),
      Input({'type': 'move-down', 'index': ALL}, 'n_clicks'),
      Input({'type': 'remove-apk', 'index': ALL}, 'n_clicks')],
     [State('user-apk-upload-store', 'data')]
 )
-def manage_uploaded_files(contents, filenames, move_up_clicks, move_down_clicks, remove_clicks, stored_data):
+def manage_uploaded_files(upload, move_up_clicks, move_down_clicks, remove_clicks, stored_data):
     ctx = callback_context
     if not ctx.triggered:
         raise PreventUpdate
     
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
-    if trigger_id == 'user-apk-upload':
-        # Handle new file uploads
+    if trigger_id == 'user-apk-upload-files':
+        # Handle new file uploads, already streamed to the server in chunks
         stored_data = stored_data or []
-        for content, filename in zip(contents or [], filenames or []):
-            if content and filename:
-                try:
-                    # Save the file to the server and get the server-side path
-                    server_path = save_uploaded_file_to_server(content, filename)
-                    
-                    # Extract APK information
-                    apk = APK(server_path)
-                    stored_data.append({
-                        'filename': filename,
-                        'package_name': apk.get_package(),
-                        'version_code': apk.get_androidversion_code(),
-                        'server_path': server_path
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing APK {filename}: {str(e)}")
+        for item in (upload or {}).get('files', []):
+            try:
+                # APK information is parsed once per distinct file and cached by its sha256
+                metadata = apk_metadata(item['handle'])
+                stored_data.append({
+                    'filename': item['filename'],
+                    'package_name': metadata['package_name'],
+                    'version_code': metadata['version_code'],
+                    'server_path': upload_path(item['handle']),
+                    'sha256': item['handle']
+                })
+            except Exception as e:
+                logger.error(f"Error processing APK {item.get('filename')}: {str(e)}")
 
     else:
         # Handle move up, move down, or remove actions
@@ -284,12 +295,8 @@ def manage_uploaded_files(contents, filenames, move_up_clicks, move_down_clicks,
         elif action == 'move-down' and index < len(stored_data) - 1:
             stored_data[index], stored_data[index+1] = stored_data[index+1], stored_data[index]
         elif action == 'remove-apk':
-            # Remove the file from the server when removing from the list
-            file_to_remove = stored_data.pop(index)
-            try:
-                os.remove(file_to_remove['server_path'])
-            except Exception as e:
-                logger.error(f"Error removing file {file_to_remove['filename']}: {str(e)}")
+            # uploads are shared by content hash, so the file itself stays on the server
+            stored_data.pop(index)
 
     upload_list = create_upload_list(stored_data)
     return stored_data, upload_list
@@ -319,44 +326,3 @@ def create_upload_list(stored_data):
 
 def truncate_string(string, max_length):
     return string[:max_length] + '...' if len(string) > max_length else string
-
-def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selection, sort_order):
-    results = {
-        'urls': [],
-        'domains': [],
-        'subdomains': []
-    }
-    
-    for i, item in enumerate(stored_data):
-        # Use the server-side file path directly
-        apk_path = item['server_path']
-        features = extract_apk_features(apk_path, parser_selection)
-        
-        version = item['filename'] if sort_order == 'ui' else item['version_code']
-        ui_index = i
-        
-        for data_type in ['urls', 'domains', 'subdomains']:
-            results[data_type].extend([
-                {'Data': feature, 'version': version, 'ui_order': ui_index}
-                for feature in features[data_type]
-            ])
-    
-    # Generate plots for each data type
-    plot_results = {}
-    for data_type in ['urls', 'domains', 'subdomains']:
-        if results[data_type]:
-            plot_result = plot_data(results[data_type], "User Uploaded APKs", highlight_config, data_type, sort_order)
-            plot_results[data_type] = plot_result
-        else:
-            plot_results[data_type] = None
-    
-    return plot_results
-
-def save_uploaded_file(item, temp_dir):
-    content_type, content_string = item['content'].split(',')
-    decoded = base64.b64decode(content_string)
-    file_path = os.path.join(temp_dir, item['filename'])
-    with open(file_path, 'wb') as f:
-        f.write(decoded)
-    return file_path
-
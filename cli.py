@@ -0,0 +1,85 @@
+"""Headless corpus extraction.
+
+Example:
+    python cli.py connectivity --package-file packages.txt --start 2015-01-01 --end 2024-12-31 --versions 10
+    python cli.py export --analysis connectivity --parquet connectivity.parquet
+
+Results are written per APK to the results database (results.db, or $JANUS_RESULTS_DB).
+APKs that already have a result are skipped, so an interrupted run can simply be started again.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from utils.batch_analysis import parse_package_list
+from utils.corpus_analysis import ANALYSES, run_analysis
+from utils.results_store import RESULTS_DB_PATH, use_results_store
+
+
+def read_packages(args):
+    text = '\n'.join(args.packages or [])
+    if args.package_file:
+        with open(args.package_file, 'r', encoding='utf-8') as f:
+            text += '\n' + f.read()
+    return parse_package_list(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Janus headless APK analysis")
+    parser.add_argument('--results-db', default=RESULTS_DB_PATH, help="results database path")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for analysis in ANALYSES:
+        sub = subparsers.add_parser(analysis, help=f"run the {analysis} analysis")
+        sub.add_argument('packages', nargs='*', help="package names")
+        sub.add_argument('--package-file', help="file with one package name per line")
+        sub.add_argument('--start', default='2013-01-01', help="start date, YYYY-MM-DD")
+        sub.add_argument('--end', default=datetime.now().strftime('%Y-%m-%d'), help="end date, YYYY-MM-DD")
+        sub.add_argument('--api-key', default=os.environ.get('ANDROZOO_API_KEY'), help="AndroZoo API key (default: $ANDROZOO_API_KEY)")
+        sub.add_argument('--db', default='androzoo.db', help="AndroZoo catalogue database")
+        sub.add_argument('--cache-dir', default=None, help="APK cache directory (default: ./apk_cache)")
+        sub.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores but one)")
+        sub.add_argument('--parquet', default=None, help="also export this analysis' results to a Parquet file")
+        if analysis == 'connectivity':
+            sub.add_argument('--versions', type=int, default=10, help="versions sampled per package")
+            sub.add_argument('--parser', default='digisilk', choices=['digisilk', 'androguard'])
+        else:
+            sub.add_argument('--samples-per-year', type=int, default=4, help="APKs sampled per year")
+
+    export = subparsers.add_parser('export', help="export stored results to Parquet")
+    export.add_argument('--analysis', choices=ANALYSES, default=None)
+    export.add_argument('--parquet', required=True)
+
+    args = parser.parse_args(argv)
+    store = use_results_store(args.results_db)
+
+    if args.command == 'export':
+        path = store.export_parquet(args.parquet, args.analysis)
+        if path:
+            print(f"Wrote {path}")
+        return 0 if path else 1
+
+    packages = read_packages(args)
+    if not packages:
+        parser.error("no packages given")
+
+    analysed = run_analysis(
+        args.command, packages, args.api_key, args.start, args.end,
+        db_path=args.db,
+        cache_dir=args.cache_dir,
+        desired_versions=getattr(args, 'versions', 10),
+        samples_per_year=getattr(args, 'samples_per_year', 4),
+        parser_selection=getattr(args, 'parser', 'digisilk'),
+        workers=args.workers,
+        store=store,
+    )
+    print(f"{args.command}: analysed {analysed} APKs, results in {args.results_db}")
+
+    if args.parquet:
+        store.export_parquet(args.parquet, args.command)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
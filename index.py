@@ -6,6 +6,8 @@ import dash_bootstrap_components as dbc
 import layouts.home_layout as home
 import layouts.apk_historical_analysis_layout as apk_historical_analysis
 import layouts.historical_connectivity_layout as historical_connectivity
+import layouts.batch_connectivity_layout as batch_connectivity
+import layouts.endpoint_search_layout as endpoint_search
 import layouts.other_layout as other
 import layouts.svm_layout as svm_analysis
 import layouts.apk_upload_layout as apk_upload
@@ -20,9 +22,12 @@ import callbacks.svm_callbacks
 import callbacks.apk_upload_callbacks
 import callbacks.apk_upload_dragdrop_callbacks
 import callbacks.historical_connectivity_callbacks
+import callbacks.batch_connectivity_callbacks
+import callbacks.endpoint_search_callbacks
 import callbacks.sdk_presence_callbacks
 import callbacks.string_presence_callbacks
 import callbacks.user_apk_analysis_callbacks
+import callbacks.upload_routes
 
 import dash_bootstrap_components as dbc
 
@@ -40,6 +45,7 @@ import site
 
 import sqlite3
 import json
+import uuid
 
 
 
@@ -50,6 +56,8 @@ navbar = dbc.NavbarSimple(
         dbc.DropdownMenu(
             children=[
                 dbc.DropdownMenuItem("Connectivity", href="/historical-connectivity"),
+                dbc.DropdownMenuItem("Batch Connectivity", href="/batch-connectivity"),
+                dbc.DropdownMenuItem("Endpoint Search", href="/endpoint-search"),
                 dbc.DropdownMenuItem("SDK Presence", href="/sdk-presence"),
                 dbc.DropdownMenuItem("String Pattern Presence", href="/string-presence"),
                 dbc.DropdownMenuItem("User APK Analysis", href="/user-apk-analysis"),
@@ -71,6 +79,7 @@ navbar = dbc.NavbarSimple(
 # Define the app structure with a navigation bar
 app.layout = dbc.Container([
     dcc.Location(id='url', refresh=False), 
+    dcc.Store(id='session-id', storage_type='session'),
     navbar,
     html.Div(id='page-content')
 ], fluid=True)
@@ -82,6 +91,10 @@ def display_page(pathname):
         return apk_historical_analysis.layout
     elif pathname == '/historical-connectivity':
         return historical_connectivity.layout
+    elif pathname == '/batch-connectivity':
+        return batch_connectivity.layout
+    elif pathname == '/endpoint-search':
+        return endpoint_search.layout
     #elif pathname == '/sdk-presence': WORK IN PROGRESS
         #return sdk_presence.layout
     elif pathname == '/string-presence':
@@ -95,6 +108,13 @@ def display_page(pathname):
     else:
         return home.layout
 
+# Give each browser tab its own id so jobs, progress and logs are kept per user
+@app.callback(Output('session-id', 'data'), [Input('url', 'pathname')], [State('session-id', 'data')])
+def ensure_session_id(pathname, session_id):
+    if session_id:
+        return no_update
+    return uuid.uuid4().hex
+
 def extract_package_ids_with_counts(conn, min_count=10):
     cursor = conn.cursor()
     cursor.execute("""
@@ -1,70 +1,24 @@
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
+from layouts.chunked_upload import chunked_upload
+from layouts.string_table import string_table
+
+# rows are coloured by which other slots share the string
+MATCH_STYLES = [
+    {'if': {'filter_query': '{match} = "1 & 2"'}, 'color': 'red'},
+    {'if': {'filter_query': '{match} = "2 & 3"'}, 'color': 'orange'},
+    {'if': {'filter_query': '{match} = "1 & 3"'}, 'color': 'blue'},
+    {'if': {'filter_query': '{match} = "all"'}, 'color': 'green'},
+]
+
 layout = dbc.Container([
     dbc.Row([
         dbc.Col([
-            dcc.Upload(
-                id='upload-data-1',
-                children=html.Div([
-                    'Drag and Drop or ',
-                    html.A('Select File 1')
-                ]),
-                style={
-                    'width': '100%',
-                    'height': '60px',
-                    'lineHeight': '60px',
-                    'borderWidth': '1px',
-                    'borderStyle': 'dashed',
-                    'borderRadius': '5px',
-                    'textAlign': 'center',
-                    'margin': '10px'
-                },
-                multiple=True
-            ),
-            html.Div(id='output-data-upload-1')
-        ], width=4),
-        dbc.Col([
-            dcc.Upload(
-                id='upload-data-2',
-                children=html.Div([
-                    'Drag and Drop or ',
-                    html.A('Select File 2')
-                ]),
-                style={
-                    'width': '100%',
-                    'height': '60px',
-                    'lineHeight': '60px',
-                    'borderWidth': '1px',
-                    'borderStyle': 'dashed',
-                    'borderRadius': '5px',
-                    'textAlign': 'center',
-                    'margin': '10px'
-                },
-                multiple=True
-            ),
-            html.Div(id='output-data-upload-2')
-        ], width=4),
-        dbc.Col([
-            dcc.Upload(
-                id='upload-data-3',
-                children=html.Div([
-                    'Drag and Drop or ',
-                    html.A('Select File 3')
-                ]),
-                style={
-                    'width': '100%',
-                    'height': '60px',
-                    'lineHeight': '60px',
-                    'borderWidth': '1px',
-                    'borderStyle': 'dashed',
-                    'borderRadius': '5px',
-                    'textAlign': 'center',
-                    'margin': '10px'
-                },
-                multiple=True
-            ),
-            html.Div(id='output-data-upload-3')
-        ], width=4),
+            chunked_upload(f'upload-data-{slot}', f'Select File {slot}'),
+            html.Div(id=f'output-data-upload-{slot}'),
+            string_table(f'dragdrop-strings-{slot}', [('string', 'String'), ('match', 'Shared with')], MATCH_STYLES),
+        ], width=4)
+        for slot in (1, 2, 3)
     ]),
-])
\ No newline at end of file
+])
@@ -1,21 +1,13 @@
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
+from layouts.chunked_upload import chunked_upload
+from layouts.string_table import string_table
+
 layout = dbc.Container([
-    dcc.Upload(
-        id='upload-apk',
-        children=html.Div(['Drag and Drop or ', html.A('Select an APK File')]),
-        style={
-            'width': '100%',
-            'height': '60px',
-            'lineHeight': '60px',
-            'borderWidth': '1px',
-            'borderStyle': 'dashed',
-            'borderRadius': '5px',
-            'textAlign': 'center',
-            'margin': '10px'
-        },
-        multiple=False
-    ),
-    html.Div(id='apk-upload-output')
+    chunked_upload('upload-apk', 'Select an APK File'),
+    html.Div(id='apk-upload-output'),
+    # refreshes the view while DEX files are still being parsed
+    dcc.Interval(id='apk-upload-interval', interval=500, disabled=True),
+    string_table('apk-upload-strings', [('string', 'String')])
 ], fluid=True)
\ No newline at end of file
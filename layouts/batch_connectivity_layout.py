@@ -0,0 +1,90 @@
+from dash import dcc, html
+import dash_bootstrap_components as dbc
+from datetime import datetime
+
+from layouts.historical_connectivity_layout import preset_configs
+
+layout = dbc.Container([
+    dbc.Row([
+        dbc.Col([
+            dbc.Form([
+                html.H4("Batch Connectivity Analysis", className="mb-3"),
+                dbc.Label("AndroZoo API Key"),
+                dbc.Input(id="batch-api-key", type="text", value=""),
+                dbc.Label("Start Date"),
+                dbc.Input(id="batch-start-date", type="date", value="2013-01-01"),
+                dbc.Label("End Date"),
+                dbc.Input(id="batch-end-date", type="date", value=datetime.now().strftime("%Y-%m-%d")),
+                dbc.Label("Package Names (one per line)"),
+                dbc.Textarea(id="batch-package-list", placeholder="com.example.app\ncom.example.other", style={'height': '150px'}),
+                dcc.Upload(
+                    id="batch-package-file",
+                    children=html.Div(["Or drop a package list file here"]),
+                    style={'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px', 'textAlign': 'center', 'padding': '10px', 'marginTop': '5px'},
+                    multiple=False
+                ),
+                dbc.Label("Desired Number of Versions (per package)"),
+                dbc.Input(id="batch-desired-versions", type="number", value=3),
+                dbc.Label("Highlight Configuration"),
+                dcc.Dropdown(
+                    id='batch-highlight-dropdown',
+                    options=[{'label': k, 'value': k} for k in preset_configs.keys()],
+                    multi=True,
+                    placeholder="Select preset highlight patterns",
+                    style={'marginBottom': '10px'}
+                ),
+                dbc.Label("Number of Cores"),
+                dcc.Slider(
+                    id="batch-num-cores-slider",
+                    min=1,
+                    max=4,
+                    step=1,
+                    value=2,
+                    marks={i: str(i) for i in range(1, 5)},
+                ),
+                dbc.Label("Parser Selection"),
+                dcc.Dropdown(
+                    id="batch-parser-selection",
+                    options=[
+                        {"label": "DigiSilk Custom Parser", "value": "digisilk"},
+                        {"label": "Androguard Parser", "value": "androguard"}
+                    ],
+                    value="digisilk",
+                    clearable=False
+                ),
+                dbc.Label("Export Summaries"),
+                dcc.Checklist(
+                    id="batch-summary-export-formats",
+                    options=[
+                        {"label": " Text", "value": "txt"},
+                        {"label": " CSV", "value": "csv"},
+                        {"label": " Parquet", "value": "parquet"}
+                    ],
+                    value=[],
+                    inline=True,
+                    inputStyle={"marginRight": "5px"},
+                    labelStyle={"marginRight": "15px"}
+                ),
+                dbc.Button("Submit", id="batch-submit-button", color="primary", size="md", className="mt-3", style={'width': '100%'}),
+                dbc.Button("Cancel", id="batch-cancel-button", color="secondary", size="md", className="mt-2", style={'width': '100%'}),
+                html.Small("Resubmitting the same packages and settings resumes an interrupted batch.", className="text-muted d-block mt-2"),
+                html.Div(id="batch-job-status", className="text-muted mt-2"),
+                html.Div(id="batch-error-message", className="text-danger"),
+            ])
+        ], width=3),
+        dbc.Col([
+            html.H4("Progress"),
+            html.Small("Downloaded", className="text-muted"),
+            dbc.Progress(id='batch-download-progress', value=0, label="", className="mb-2"),
+            html.Small("Parsed", className="text-muted"),
+            dbc.Progress(id='batch-parse-progress', value=0, label="", className="mb-2"),
+            html.Pre(id='batch-progress-log', children=[], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-word', 'maxHeight': '300px', 'overflowY': 'scroll'}),
+            dcc.Interval(id='batch-progress-interval', interval=1000, n_intervals=0),
+            html.H4("Results"),
+            dcc.Dropdown(id="batch-result-package", options=[], placeholder="Select the combined view or a package", className="mb-2"),
+            dcc.Loading(html.Div(id="batch-results"), type="default"),
+        ], width=9)
+    ]),
+    dcc.Store(id='batch-connectivity-progress'),
+    dcc.Store(id='batch-connectivity-job'),
+], fluid=True)
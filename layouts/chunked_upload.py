@@ -0,0 +1,31 @@
+# layouts/chunked_upload.py
+# drop zone for assets/chunked_upload.js; uploaded file handles and metadata land in the '<id>-files' store
+from dash import dcc, html
+
+UPLOAD_STYLE = {
+    'width': '100%',
+    'minHeight': '60px',
+    'lineHeight': '60px',
+    'borderWidth': '1px',
+    'borderStyle': 'dashed',
+    'borderRadius': '5px',
+    'textAlign': 'center',
+    'margin': '10px',
+    'cursor': 'pointer',
+}
+
+
+def chunked_upload(upload_id, label, multiple=False, style=None):
+    return html.Div([
+        html.Div(
+            [
+                html.Div(['Drag and Drop or ', html.A(label)]),
+                html.Div(className='chunked-upload-status', style={'lineHeight': '20px'}),
+            ],
+            id=upload_id,
+            className='chunked-upload',
+            style=dict(UPLOAD_STYLE, **(style or {})),
+            **{'data-store': f"{upload_id}-files", 'data-multiple': 'true' if multiple else 'false'}
+        ),
+        dcc.Store(id=f"{upload_id}-files"),
+    ])
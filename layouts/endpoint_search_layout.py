@@ -0,0 +1,36 @@
+from dash import dcc, html
+import dash_bootstrap_components as dbc
+
+layout = dbc.Container([
+    dbc.Row([
+        dbc.Col([
+            html.H4("Endpoint Search", className="mb-3"),
+            html.P("Find every analysed app and version that embeds a domain, subdomain or URL.", className="text-muted"),
+            dbc.InputGroup([
+                dbc.Input(id="endpoint-search-term", type="text", placeholder="e.g. graph.facebook.com", debounce=True),
+                dbc.Button("Search", id="endpoint-search-button", color="primary"),
+            ], className="mb-2"),
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(
+                    id="endpoint-search-type",
+                    options=[
+                        {"label": "Any type", "value": "any"},
+                        {"label": "Domains", "value": "domains"},
+                        {"label": "Subdomains", "value": "subdomains"},
+                        {"label": "URLs", "value": "urls"},
+                    ],
+                    value="any",
+                    clearable=False
+                ), width=4),
+                dbc.Col(dcc.Checklist(
+                    id="endpoint-search-prefix",
+                    options=[{"label": " Prefix match", "value": "prefix"}],
+                    value=[],
+                    inputStyle={"marginRight": "5px"}
+                ), width=4),
+            ], className="mb-3"),
+            html.Div(id="endpoint-search-stats", className="text-muted mb-2"),
+            dcc.Loading(html.Div(id="endpoint-search-results"), type="default"),
+        ], width=12)
+    ])
+], fluid=True)
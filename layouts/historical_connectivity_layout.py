@@ -95,13 +95,32 @@ layout = dbc.Container([
                     value="digisilk",  # Default to DigiSilk parser
                     clearable=False
                 ),
+                dbc.Label("Export Summaries"),
+                dcc.Checklist(
+                    id="summary-export-formats",
+                    options=[
+                        {"label": " Text", "value": "txt"},
+                        {"label": " CSV", "value": "csv"},
+                        {"label": " Parquet", "value": "parquet"}
+                    ],
+                    value=[],
+                    inline=True,
+                    inputStyle={"marginRight": "5px"},
+                    labelStyle={"marginRight": "15px"}
+                ),
                 dbc.Button("Submit", id="submit-button", color="primary", size="md", className="mt-3", style={'width': '100%'}),
+                dbc.Button("Cancel", id="cancel-button", color="secondary", size="md", className="mt-2", style={'width': '100%'}),
+                html.Div(id="job-status", className="text-muted mt-2"),
                 html.Div(id="error-message", className="text-danger"),
             ])
         ], width=3),
         dbc.Col([
             html.H4("Progress"),
-            html.Pre(id='progress-historical-connectivity', style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-word', 'maxHeight': '300px', 'overflowY': 'scroll'}),
+            html.Small("Downloaded", className="text-muted"),
+            dbc.Progress(id='download-progress', value=0, label="", className="mb-2"),
+            html.Small("Parsed", className="text-muted"),
+            dbc.Progress(id='parse-progress', value=0, label="", className="mb-2"),
+            html.Pre(id='progress-historical-connectivity', children=[], style={'whiteSpace': 'pre-wrap', 'wordBreak': 'break-word', 'maxHeight': '300px', 'overflowY': 'scroll'}),
             dcc.Interval(id='progress-interval', interval=1000, n_intervals=0),
             html.H4("Results"),
             html.Div([  # New container for loading and results
@@ -115,5 +134,6 @@ layout = dbc.Container([
         ], width=9)
     ]),
     dcc.Store(id='historical-connectivity-progress'),
+    dcc.Store(id='historical-connectivity-job'),
     dcc.Store(id='highlight-config-store'),
 ], fluid=True)
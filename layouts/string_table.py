@@ -0,0 +1,30 @@
+# layouts/string_table.py
+# paged string table with a search box; pages are served by a callback (page_action='custom')
+from dash import dash_table, dcc, html
+
+PAGE_SIZE = 100
+
+
+def string_table(table_id, columns, style_data_conditional=None):
+    # columns: (column id, header) pairs
+    return html.Div([
+        dcc.Input(
+            id=f"{table_id}-search",
+            type='text',
+            debounce=True,
+            placeholder='Search strings',
+            style={'width': '100%', 'marginBottom': '5px'}
+        ),
+        dash_table.DataTable(
+            id=table_id,
+            columns=[{'name': name, 'id': column} for column, name in columns],
+            data=[],
+            page_current=0,
+            page_size=PAGE_SIZE,
+            page_count=1,
+            page_action='custom',
+            style_cell={'textAlign': 'left', 'fontFamily': 'monospace', 'whiteSpace': 'normal', 'wordBreak': 'break-all'},
+            style_header={'fontWeight': 'bold'},
+            style_data_conditional=style_data_conditional or [],
+        ),
+    ])
@@ -2,6 +2,8 @@ from dash import dcc, html
 import dash_bootstrap_components as dbc
 import multiprocessing as mp
 
+from layouts.chunked_upload import chunked_upload
+
 ascii_logo = """
      ██  █████  ███    ██ ██    ██ ███████ 
      ██ ██   ██ ████   ██ ██    ██ ██      
@@ -43,24 +45,7 @@ layout = dbc.Container([
         dbc.Col([
             dbc.Form([
                 html.H4("User APK Analysis", className="mb-3"),
-                dcc.Upload(
-                    id='user-apk-upload',
-                    children=html.Div([
-                        'Drag and Drop or ',
-                        html.A('Select APK Files')
-                    ]),
-                    style={
-                        'width': '100%',
-                        'height': '60px',
-                        'lineHeight': '60px',
-                        'borderWidth': '1px',
-                        'borderStyle': 'dashed',
-                        'borderRadius': '5px',
-                        'textAlign': 'center',
-                        'margin': '10px 0'
-                    },
-                    multiple=True
-                ),
+                chunked_upload('user-apk-upload', 'Select APK Files', multiple=True, style={'margin': '10px 0'}),
                 html.Div(id='user-apk-upload-list', style={'marginTop': '10px', 'marginBottom': '10px'}),
                 
                 # Highlight configuration dropdown
@@ -139,4 +124,5 @@ layout = dbc.Container([
     dcc.Store(id='user-apk-upload-store'),
     dcc.Store(id='user-apk-highlight-config-store'),
     dcc.Store(id='user-apk-feature-info-store'),
+    dcc.Store(id='user-apk-progress-store'),
 ], fluid=True)
@@ -0,0 +1,93 @@
+"""Benchmark the SVM comparison: dense dataframe + SVC against sparse matrix + LinearSVC.
+
+Example:
+    python svm_benchmark.py --apks 400 --features 20000
+    python svm_benchmark.py --features-file features_labels.pkl
+
+Reports build and fit time for both paths and how closely their feature rankings agree.
+Without --features-file, synthetic feature sets are generated: a Zipf-like popularity over
+the features, with a few features more likely in one sample than the other.
+"""
+import argparse
+import pickle
+import sys
+import time
+
+import numpy as np
+from scipy.stats import spearmanr
+
+from utils import svm_utils
+
+
+def synthetic_features(n_apks, n_features, per_apk, seed):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_features + 1)
+    popularity /= popularity.sum()
+    # the first 1% of features lean towards Sample2, the next 1% towards Sample1
+    signal = max(1, n_features // 100)
+    features_list = []
+    labels_list = []
+    for i in range(n_apks):
+        label = 'Sample1' if i % 2 == 0 else 'Sample2'
+        chosen = set(rng.choice(n_features, size=per_apk, replace=False, p=popularity).tolist())
+        biased = rng.integers(0, signal, size=per_apk // 10) + (signal if label == 'Sample1' else 0)
+        chosen.update(biased.tolist())
+        features_list.append({f"feature{j}" for j in chosen})
+        labels_list.append(label)
+    return features_list, labels_list
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def agreement(dense_ranking, sparse_ranking, top_k):
+    dense = dict(dense_ranking)
+    sparse = dict(sparse_ranking)
+    features = sorted(dense)
+    rho = spearmanr([dense[f] for f in features], [sparse[f] for f in features]).correlation
+    by_magnitude = lambda ranking: {f for f, _ in sorted(ranking, key=lambda item: -abs(item[1]))[:top_k]}
+    overlap = len(by_magnitude(dense_ranking) & by_magnitude(sparse_ranking)) / max(1, min(top_k, len(features)))
+    signs = np.mean([np.sign(dense[f]) == np.sign(sparse[f]) for f in features if dense[f] and sparse[f]])
+    return rho, overlap, signs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Janus SVM comparison benchmark")
+    parser.add_argument('--features-file', help="features_labels.pkl written by the SVM page")
+    parser.add_argument('--apks', type=int, default=200, help="synthetic APKs (half per sample)")
+    parser.add_argument('--features', type=int, default=5000, help="synthetic feature vocabulary size")
+    parser.add_argument('--per-apk', type=int, default=300, help="synthetic features per APK")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top-k', type=int, default=50, help="top features compared for overlap")
+    parser.add_argument('--skip-dense', action='store_true', help="only time the sparse path (for sizes the dense path can't handle)")
+    args = parser.parse_args(argv)
+
+    if args.features_file:
+        with open(args.features_file, 'rb') as f:
+            features_list, labels_list = pickle.load(f)
+    else:
+        features_list, labels_list = synthetic_features(args.apks, args.features, args.per_apk, args.seed)
+    vocabulary = len(set().union(*features_list))
+    print(f"{len(features_list)} APKs, {vocabulary} distinct features")
+
+    (X, feature_names, y), sparse_build = timed(svm_utils.prepare_feature_matrix, features_list, labels_list)
+    sparse_ranking, sparse_fit = timed(svm_utils.rank_features, X, y, feature_names)
+    print(f"sparse + LinearSVC: build {sparse_build:.3f}s, fit {sparse_fit:.3f}s")
+
+    if args.skip_dense:
+        return 0
+    df, dense_build = timed(svm_utils.prepare_dataframe, features_list, labels_list)
+    dense_ranking, dense_fit = timed(svm_utils.perform_svm_analysis, df)
+    print(f"dense + SVC:        build {dense_build:.3f}s, fit {dense_fit:.3f}s")
+    print(f"speedup: build {dense_build / max(sparse_build, 1e-9):.1f}x, fit {dense_fit / max(sparse_fit, 1e-9):.1f}x")
+
+    rho, overlap, signs = agreement(dense_ranking, sparse_ranking, args.top_k)
+    print(f"ranking agreement: spearman {rho:.3f}, top-{args.top_k} overlap {overlap:.0%}, sign agreement {signs:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# tests/apk_fixtures.py
+# builds small but well-formed APKs (binary manifest + one DEX string table) for the tests
+import struct
+import zipfile
+
+ANDROID_NS = 'http://schemas.android.com/apk/res/android'
+ATTRIBUTE_IDS = {'name': 0x01010003, 'versionCode': 0x0101021B, 'versionName': 0x0101021C}
+NO_INDEX = 0xFFFFFFFF
+
+
+def _string_pool(strings):
+    offsets = []
+    body = b''
+    for s in strings:
+        offsets.append(len(body))
+        body += struct.pack('<H', len(s)) + s.encode('utf-16-le') + b'\0\0'
+    while len(body) % 4:
+        body += b'\0'
+    start = 28 + 4 * len(strings)
+    header = struct.pack('<HHIIIIII', 0x0001, 28, start + len(body), len(strings), 0, 0, start, 0)
+    return header + struct.pack(f'<{len(strings)}I', *offsets) + body
+
+
+def build_manifest(elements):
+    # elements: (tag, [(attribute, value)]) in document order; int values are written as decimals
+    strings = list(ATTRIBUTE_IDS)
+
+    def index(s):
+        if s not in strings:
+            strings.append(s)
+        return strings.index(s)
+
+    namespace = index(ANDROID_NS)
+    body = struct.pack('<HHIII', 0x0100, 16, 24, 1, NO_INDEX) + struct.pack('<II', index('android'), namespace)
+    for tag, attributes in elements:
+        packed = b''
+        for name, value in attributes:
+            ns = namespace if name in ATTRIBUTE_IDS else NO_INDEX
+            if isinstance(value, int):
+                packed += struct.pack('<IIIHBBI', ns, index(name), NO_INDEX, 8, 0, 0x10, value)
+            else:
+                packed += struct.pack('<IIIHBBI', ns, index(name), index(value), 8, 0, 0x03, index(value))
+        node = struct.pack('<IIHHHHHH', NO_INDEX, index(tag), 20, 20, len(attributes), 0, 0, 0) + packed
+        body += struct.pack('<HHIII', 0x0102, 16, 16 + len(node), 1, NO_INDEX) + node
+    resource_map = struct.pack('<HHI', 0x0180, 8, 8 + 4 * len(ATTRIBUTE_IDS)) + struct.pack(f'<{len(ATTRIBUTE_IDS)}I', *ATTRIBUTE_IDS.values())
+    content = _string_pool(strings) + resource_map + body
+    return struct.pack('<HHI', 0x0003, 8, 8 + len(content)) + content
+
+
+def _uleb128(n):
+    out = b''
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if not n:
+            return out + bytes([byte])
+        out += bytes([byte | 0x80])
+
+
+def build_dex(strings):
+    # a DEX with only a header, the string table and a map list
+    strings = sorted(set(strings))
+    ids_offset = 0x70
+    data_offset = ids_offset + 4 * len(strings)
+    data = b''
+    offsets = []
+    for s in strings:
+        offsets.append(data_offset + len(data))
+        data += _uleb128(len(s)) + s.encode() + b'\0'
+    while (data_offset + len(data)) % 4:
+        data += b'\0'
+    map_offset = data_offset + len(data)
+    items = [(0x0000, 1, 0), (0x0001, len(strings), ids_offset), (0x2002, len(strings), data_offset), (0x1000, 1, map_offset)]
+    map_list = struct.pack('<I', len(items)) + b''.join(struct.pack('<HHII', t, 0, count, offset) for t, count, offset in items)
+    size = map_offset + len(map_list)
+    header = b'dex\n035\0' + struct.pack('<I', 0) + bytes(range(1, 21))
+    header += struct.pack('<20I', size, 0x70, 0x12345678, 0, 0, map_offset, len(strings), ids_offset,
+                          0, 0, 0, 0, 0, 0, 0, 0, 0, 0, size - data_offset, data_offset)
+    return header + struct.pack(f'<{len(strings)}I', *offsets) + data + map_list
+
+
+def build_apk(path, package, permissions=(), strings=(), version_code=1):
+    elements = [('manifest', [('versionCode', version_code), ('versionName', '1.0'), ('package', package)])]
+    elements += [('uses-permission', [('name', permission)]) for permission in permissions]
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('AndroidManifest.xml', build_manifest(elements))
+        z.writestr('classes.dex', build_dex(list(strings) + [package]))
+    return str(path)
@@ -0,0 +1,8 @@
+# lets plain `pytest` import the app's modules (utils, callbacks, ...) and the test fixtures
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.dirname(TESTS_DIR), TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
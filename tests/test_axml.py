@@ -0,0 +1,16 @@
+from apk_fixtures import build_manifest
+from utils.axml import parse_manifest
+
+
+def test_activity_aliases_are_not_activities():
+    # androguard's get_activities() leaves <activity-alias> out, and so does parse_manifest
+    manifest = parse_manifest(build_manifest([
+        ('manifest', [('versionCode', 7), ('versionName', '1.0'), ('package', 'com.example.app')]),
+        ('activity', [('name', '.MainActivity')]),
+        ('activity-alias', [('name', '.Launcher')]),
+        ('service', [('name', 'com.example.app.SyncService')]),
+    ]))
+    assert manifest['package_name'] == 'com.example.app'
+    assert manifest['version_code'] == '7'
+    assert manifest['activities'] == ['com.example.app.MainActivity']
+    assert manifest['services'] == ['com.example.app.SyncService']
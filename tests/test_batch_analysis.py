@@ -0,0 +1,18 @@
+from utils import batch_analysis
+
+
+def test_checkpoint_keeps_only_processed_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_analysis, 'BATCH_ROOT', str(tmp_path))
+    first, second = 'a' * 64, 'b' * 64
+    checkpoint = batch_analysis.BatchCheckpoint('key')
+    checkpoint.mark_processed([first])
+    checkpoint.mark_processed([first, second])
+    # an interrupted append leaves a partial line behind
+    with open(checkpoint.processed_path, 'a') as f:
+        f.write('c' * 10)
+
+    resumed = batch_analysis.BatchCheckpoint('key')
+    assert resumed.processed == {first, second}
+    assert sorted(p.name for p in tmp_path.joinpath('key').iterdir()) == ['processed.txt']
+    resumed.mark_processed(['d' * 64])
+    assert batch_analysis.BatchCheckpoint('key').processed == {first, second, 'd' * 64}
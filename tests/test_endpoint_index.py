@@ -0,0 +1,49 @@
+from utils.results_store import ResultsStore
+
+FIRST, SECOND = 'a' * 64, 'b' * 64
+
+
+def stored_results(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.db'))
+    store.save_result('connectivity', FIRST, 'digisilk', 'com.example.first', 1, '2021-01-05 10:00:00', {}, [
+        ('urls', 'https://api.example.com/v1', 3), ('domains', 'example.com', 3), ('subdomains', 'api.example.com', 3)])
+    store.save_result('connectivity', SECOND, 'digisilk', 'com.example.second', 7, '2022-03-01 10:00:00', {}, [
+        ('urls', 'https://api.example.com/v2', 1), ('domains', 'example.com', 1), ('domains', 'example.org', 2)])
+    # other analyses are not endpoints
+    store.save_result('sdk', FIRST, 'sdks', 'com.example.first', 1, '2021-01-05 10:00:00', [], [('sdks', 'example.com', 1)])
+    return store
+
+
+def matches(index, term, data_type=None, prefix=False):
+    rows, _ = index.lookup(term, data_type, prefix)
+    return [(row['term'], row['data_type'], row['package'], row['version'], row['count']) for row in rows]
+
+
+def test_exact_and_prefix_lookups(tmp_path):
+    index = stored_results(tmp_path).endpoint_index
+    assert matches(index, 'example.com') == [('example.com', 'domains', 'com.example.first', '1', 3),
+                                             ('example.com', 'domains', 'com.example.second', '7', 1)]
+    assert matches(index, ' example.org ', 'domains') == [('example.org', 'domains', 'com.example.second', '7', 2)]
+    assert matches(index, 'example.org', 'urls') == []
+    assert matches(index, 'https://api.example.com/') == []
+    assert matches(index, 'https://api.example.com/', prefix=True) == [
+        ('https://api.example.com/v1', 'urls', 'com.example.first', '1', 3),
+        ('https://api.example.com/v2', 'urls', 'com.example.second', '7', 1)]
+    assert sorted(row[0] for row in matches(index, 'example.', 'domains', prefix=True)) == ['example.com', 'example.com', 'example.org']
+    assert matches(index, '') == []
+
+
+def test_backfill_is_idempotent(tmp_path):
+    store = stored_results(tmp_path)
+    index = store.endpoint_index
+    before = matches(index, 'example', prefix=True)
+    conn = index.connect()
+    with conn:
+        for table in ('endpoint_postings', 'endpoint_apks', 'endpoint_terms'):
+            conn.execute(f'DELETE FROM {table}')
+    conn.close()
+
+    assert index.update_from_results() == 2
+    assert index.update_from_results() == 0
+    assert matches(index, 'example', prefix=True) == before
+    assert index.stats() == {'endpoint_terms': 5, 'endpoint_apks': 2, 'endpoint_postings': 6, 'packages': 2}
@@ -0,0 +1,50 @@
+from utils.feature_matrix import FeatureCounts, batch_rows, encode_batch
+from utils.historical_connectivity_logic import MAX_STRING_LENGTH, truncate_string
+
+LONG = 'https://api.example.com/' + 'x' * 120
+
+
+def worker_batch(version, vtscandate, urls):
+    # the same truncation process_file applies before encoding
+    return encode_batch(version, vtscandate, {'urls': [truncate_string(url, MAX_STRING_LENGTH) for url in urls]})
+
+
+def dense(counts, data_type):
+    matrix, features, versions = counts.matrix(data_type)
+    return {(feature, version): int(matrix[i, j]) for i, feature in enumerate(features)
+            for j, version in enumerate(versions) if matrix[i, j]}
+
+
+def test_batches_merge_into_feature_by_version_counts():
+    truncated = truncate_string(LONG, MAX_STRING_LENGTH)
+    batches = [
+        # two URLs that only differ past the cut-off count as one feature
+        worker_batch(1, '2021-01-05 10:00:00', ['https://a.example.com', LONG, LONG + '/other', 'https://a.example.com']),
+        worker_batch(2, '2021-02-05 10:00:00', ['https://b.example.com', LONG]),
+        # a second APK of version 2, scanned earlier
+        worker_batch(2, '2021-01-20 10:00:00', ['https://a.example.com', 'https://b.example.com']),
+    ]
+    assert sorted(batch_rows(batches[0])) == [('urls', 'https://a.example.com', 2), ('urls', truncated, 2)]
+
+    counts = FeatureCounts()
+    for batch in batches:
+        counts.add(batch)
+    assert len(counts) == 3
+    assert counts.version_dates == {'1': '2021-01-05', '2': '2021-01-20'}
+    assert dense(counts, 'urls') == {
+        ('https://a.example.com', '1'): 2,
+        (truncated, '1'): 2,
+        ('https://a.example.com', '2'): 1,
+        ('https://b.example.com', '2'): 2,
+        (truncated, '2'): 1,
+    }
+
+    combined = FeatureCounts()
+    for batch in batches:
+        combined.add(batch, column='com.example.app', presence=True)
+    assert dense(combined, 'urls') == {
+        ('https://a.example.com', 'com.example.app'): 2,
+        (truncated, 'com.example.app'): 2,
+        ('https://b.example.com', 'com.example.app'): 2,
+    }
+    assert counts.matrix('domains') == (None, [], [])
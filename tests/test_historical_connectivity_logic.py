@@ -0,0 +1,17 @@
+import zipfile
+
+from apk_fixtures import build_dex, build_manifest
+from utils.historical_connectivity_logic import dex_entry_names, extract_apk_dex_files
+
+
+def test_only_root_classes_dex_files_are_app_code(tmp_path):
+    path = tmp_path / 'app.apk'
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('AndroidManifest.xml', build_manifest([('manifest', [('package', 'com.example.app')])]))
+        z.writestr('classes.dex', build_dex(['https://a.example.com']))
+        z.writestr('assets/plugin.dex', build_dex(['https://plugin.example.com']))
+        z.writestr('classes2.dex', build_dex(['https://b.example.com']))
+        z.writestr('res/raw/classes3.dex', build_dex(['https://res.example.com']))
+
+    assert dex_entry_names(str(path)) == ['classes.dex', 'classes2.dex']
+    assert len(extract_apk_dex_files(str(path))) == 2
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from utils.sampling import EPOCH, bucket_index, stable_sample
+
+FIRST_WEEK = 2800  # a multiple of 16 weeks after the epoch, so 2- and 4-week buckets start on week 0 below
+
+
+def weekly_apks(weeks):
+    # one APK in each given week, on its Wednesday, counted from FIRST_WEEK
+    apks = []
+    for week in weeks:
+        date = EPOCH + timedelta(days=7 * (FIRST_WEEK + week) + 2)
+        apks.append((f"{week:064d}", week, date.strftime('%Y-%m-%d 12:00:00')))
+    return apks
+
+
+def test_buckets_are_fixed_calendar_weeks():
+    assert bucket_index('1970-01-05', 0) == 0
+    assert bucket_index('1970-01-11 23:59:59', 0) == 0
+    assert bucket_index('1970-01-12', 0) == 1
+    assert bucket_index('1970-01-18', 1) == 0
+    assert bucket_index('1970-01-19', 1) == 1
+    assert bucket_index('1970-01-04', 0) == -1
+
+
+def test_latest_apk_is_always_first():
+    apks = weekly_apks(range(32))
+    for desired_versions in (2, 9, 40):
+        sample = stable_sample(list(reversed(apks)), desired_versions)
+        assert sample[0] == apks[-1]
+        assert len(sample) == min(desired_versions, len(apks))
+
+
+def test_extending_the_range_keeps_earlier_samples():
+    first_half = stable_sample(weekly_apks(range(16)), 9)
+    second_half = stable_sample(weekly_apks(range(16, 32)), 9)
+    both = stable_sample(weekly_apks(range(32)), 9)
+
+    # 2-week buckets over either half, 4-week buckets over the whole range
+    assert [apk[1] for apk in first_half] == [15] + list(range(0, 16, 2))
+    assert [apk[1] for apk in second_half] == [31] + list(range(16, 32, 2))
+    assert [apk[1] for apk in both] == [31] + list(range(0, 32, 4))
+    # widening either end only drops samples, it never swaps one for a neighbour
+    assert {apk for apk in both if apk[1] < 16} <= set(first_half)
+    assert {apk for apk in both if apk[1] >= 16} <= set(second_half)
+
+
+def test_clustered_releases_are_topped_up():
+    # eight releases in one week fill a single bucket, so the rest of the sample comes from that week's other APKs
+    day = EPOCH + timedelta(days=7 * FIRST_WEEK + 2)
+    apks = [(f"{n:064d}", n, (day + timedelta(hours=n)).strftime('%Y-%m-%d %H:00:00')) for n in range(8)]
+    sample = stable_sample(apks, 4)
+    assert len(sample) == 4 and len(set(sample)) == 4
+    assert sample[0] == apks[-1]
+    # the bucket representative is kept
+    assert apks[0] in sample
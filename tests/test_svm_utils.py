@@ -0,0 +1,53 @@
+import pytest
+
+from apk_fixtures import build_apk
+from utils import svm_utils
+from utils.results_store import ResultsStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultsStore(str(tmp_path / 'results.db'))
+    monkeypatch.setattr(svm_utils, 'get_results_store', lambda: store)
+    return store
+
+
+def test_page_extractors_through_extract_features_and_labels(tmp_path, store):
+    first = build_apk(tmp_path / 'first.apk', 'com.example.first', ['android.permission.INTERNET'],
+                      ['https://api.example.com/v1', 'hello'])
+    second = build_apk(tmp_path / 'second.apk', 'com.example.second', ['android.permission.CAMERA'],
+                       ['http://cdn.example.org/img.png'])
+
+    features_list, labels_list = svm_utils.extract_features_and_labels(
+        [(first, 'Sample1'), (second, 'Sample2')], svm_utils.SVM_FEATURE_EXTRACTORS)
+
+    assert labels_list == ['Sample1', 'Sample2']
+    assert features_list == [{'https://api.example.com/v1', 'android.permission.INTERNET'},
+                             {'http://cdn.example.org/img.png', 'android.permission.CAMERA'}]
+    X, feature_names, y = svm_utils.prepare_feature_matrix(features_list, labels_list)
+    assert X.shape == (2, 4) and list(y) == [0, 1]
+
+
+def test_features_are_served_from_the_store(tmp_path, store, monkeypatch):
+    apk = build_apk(tmp_path / 'app.apk', 'com.example.app', ['android.permission.INTERNET'])
+    first, _ = svm_utils.extract_features_and_labels([(apk, 'Sample1')], svm_utils.SVM_FEATURE_EXTRACTORS)
+
+    def fail(*args):
+        raise AssertionError("cached APK extracted again")
+    monkeypatch.setattr(svm_utils, 'get_worker_pool', fail)
+    second, _ = svm_utils.extract_features_and_labels([(apk, 'Sample1')], svm_utils.SVM_FEATURE_EXTRACTORS)
+    assert first == second == [{'android.permission.INTERNET'}]
+
+
+def test_failed_extraction_drops_the_sample(tmp_path, store):
+    good = build_apk(tmp_path / 'good.apk', 'com.example.good', ['android.permission.INTERNET'])
+    broken = tmp_path / 'broken.apk'
+    broken.write_bytes(b'not a zip file')
+
+    features_list, labels_list = svm_utils.extract_features_and_labels(
+        [(str(broken), 'Sample1'), (good, 'Sample2')], svm_utils.SVM_FEATURE_EXTRACTORS)
+
+    assert labels_list == ['Sample2']
+    assert features_list == [{'android.permission.INTERNET'}]
+    broken_sha = svm_utils.apk_sha256(str(broken))
+    assert store.get_payload(svm_utils.SVM_ANALYSIS, broken_sha, 'extract_permissions') is None
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+from dash import html
+
+import callbacks.upload_routes  # noqa: F401  registers the /upload routes
+from app import app, server
+from utils import uploads
+
+CONTENT = os.urandom(3000) + b'tail'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOAD_DIR', str(tmp_path))
+    monkeypatch.setattr(uploads, 'PARTIAL_DIR', str(tmp_path / 'partial'))
+    monkeypatch.setattr(uploads, '_uploads', {})
+    # dash checks for a layout on the first request; the pages themselves aren't needed here
+    if app.layout is None:
+        app.layout = html.Div()
+    return server.test_client()
+
+
+def put_chunk(client, upload_id, offset, data):
+    return client.put(f'/upload/{upload_id}?offset={offset}', data=data, content_type='application/octet-stream')
+
+
+def test_out_of_order_chunk_is_rejected_with_the_current_offset(client):
+    upload_id = client.post('/upload', json={'filename': 'app.apk', 'size': len(CONTENT)}).get_json()['upload_id']
+    assert put_chunk(client, upload_id, 0, CONTENT[:1000]).get_json() == {'upload_id': upload_id, 'offset': 1000}
+
+    response = put_chunk(client, upload_id, 2000, CONTENT[2000:])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 1000
+    # a repeated chunk is refused too, nothing is appended twice
+    assert put_chunk(client, upload_id, 0, CONTENT[:1000]).status_code == 409
+
+    response = client.post(f'/upload/{upload_id}/finish')
+    assert response.status_code == 409 and response.get_json()['offset'] == 1000
+
+
+def test_resume_after_restart_and_finish(client):
+    upload_id = client.post('/upload', json={'filename': 'dir/app.apk', 'size': len(CONTENT)}).get_json()['upload_id']
+    put_chunk(client, upload_id, 0, CONTENT[:1200])
+
+    # a restarted server only has the partial file on disk
+    uploads._uploads.clear()
+    status = client.get(f'/upload/{upload_id}').get_json()
+    assert status == {'upload_id': upload_id, 'offset': 1200, 'size': len(CONTENT)}
+    assert put_chunk(client, upload_id, status['offset'], CONTENT[1200:]).get_json()['offset'] == len(CONTENT)
+
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    assert client.post(f'/upload/{upload_id}/finish').get_json() == {
+        'handle': sha256, 'filename': 'app.apk', 'size': len(CONTENT), 'sha256': sha256}
+    with open(uploads.upload_path(sha256), 'rb') as f:
+        assert f.read() == CONTENT
+    assert os.listdir(uploads.PARTIAL_DIR) == []
+    assert client.get(f'/upload/{upload_id}').status_code == 404
+    assert client.get(f'/upload/known/{sha256.upper()}').get_json()['handle'] == sha256
+
+
+def test_chunk_past_the_declared_size_is_rejected(client):
+    upload_id = client.post('/upload', json={'filename': 'app.apk', 'size': 10}).get_json()['upload_id']
+    assert put_chunk(client, upload_id, 0, b'x' * 11).status_code == 400
+    assert client.post('/upload', json={'filename': 'app.apk', 'size': 0}).status_code == 400
+    assert client.get('/upload/not-an-id').status_code == 404
+
+
+def test_stored_uploads_are_swept_by_age_and_size(client, monkeypatch):
+    now = 1_000_000_000
+    ages = {'a': 8 * 24, 'b': 30, 'c': 20, 'd': 0.5}  # hours since last use
+    for name, hours in ages.items():
+        path = uploads.upload_path(name * 64)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        os.utime(path, (now - hours * 3600, now - hours * 3600))
+    os.makedirs(uploads.PARTIAL_DIR)
+    # only 'a' is past the age limit; one file fits the size cap, so 'b' and 'c' go and the recent 'd' stays
+    monkeypatch.setattr(uploads, 'MAX_STORED_UPLOAD_BYTES', 150)
+    uploads.cleanup_finished_uploads(now)
+    assert sorted(os.listdir(uploads.UPLOAD_DIR)) == ['d' * 64 + '.apk', 'partial']
@@ -0,0 +1,18 @@
+from utils.worker_pool import SharedWorkerPool
+
+
+def test_recycling_drains_the_old_pool_first():
+    pool = SharedWorkerPool(processes=2, max_rss_mb=0)
+    retired = []
+    retire = pool._retire
+
+    def track(old_pool):
+        retire(old_pool)
+        # the old pool has fully exited before its replacement is created
+        retired.append(all(not worker.is_alive() for worker in old_pool._pool))
+    pool._retire = track
+    try:
+        assert pool.starmap(pow, [(n, 2) for n in range(6)]) == [n * n for n in range(6)]
+    finally:
+        pool.shutdown()
+    assert retired and all(retired)
@@ -0,0 +1,80 @@
+# utils/apk_features.py
+# manifest and class-level APK features without androguard's AnalyzeAPK: permissions and components come
+# from the binary manifest, class names from each DEX's class_defs table. neither needs bytecode analysis.
+import logging
+import zipfile
+
+from utils.axml import read_manifest
+from utils.dex_parser import dex_class_names, is_code_dex
+
+MANIFEST_FEATURES = ('permissions', 'services', 'activities', 'providers', 'receivers', 'libraries')
+SCOPED_FEATURES = MANIFEST_FEATURES + ('java_classes',)
+
+
+class ScopedAPK:
+    # the subset of androguard's APK interface the extractors use, each part read only when first asked for
+    def __init__(self, apk_path):
+        self.apk_path = apk_path
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = read_manifest(self.apk_path)
+        return self._manifest
+
+    def get_package(self):
+        return self.manifest['package_name']
+
+    def get_androidversion_code(self):
+        return self.manifest['version_code']
+
+    def get_androidversion_name(self):
+        return self.manifest['version_name']
+
+    def get_permissions(self):
+        return list(self.manifest['permissions'])
+
+    def get_services(self):
+        return list(self.manifest['services'])
+
+    def get_activities(self):
+        return list(self.manifest['activities'])
+
+    def get_providers(self):
+        return list(self.manifest['providers'])
+
+    def get_receivers(self):
+        return list(self.manifest['receivers'])
+
+    def get_libraries(self):
+        return list(self.manifest['libraries'])
+
+    def get_all_dex(self):
+        with zipfile.ZipFile(self.apk_path, 'r') as z:
+            for name in z.namelist():
+                if is_code_dex(name):
+                    yield z.read(name)
+
+    def get_class_names(self):
+        names = []
+        for dex_data in self.get_all_dex():
+            names.extend(dex_class_names(dex_data))
+        return names
+
+
+def needs_scoped_features(data_type):
+    return any(feature in data_type for feature in SCOPED_FEATURES)
+
+
+def scoped_apk_features(apk_path, data_type):
+    # the manifest/class feature families named in data_type, in the order the extractors used to emit them
+    apk = ScopedAPK(apk_path)
+    data = []
+    for feature in MANIFEST_FEATURES:
+        if feature in data_type:
+            data.extend(getattr(apk, f"get_{feature}")())
+    if 'java_classes' in data_type:
+        data.extend(apk.get_class_names())
+    logging.info(f"Read {len(data)} manifest/class features from {apk_path}")
+    return data
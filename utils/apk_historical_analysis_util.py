@@ -3,7 +3,6 @@ import base64
 import csv
 import gc
 import json
-import multiprocessing as mp
 import os
 import re
 import shutil
@@ -22,10 +21,17 @@ from androguard.misc import AnalyzeAPK
 from dash import dcc, html
 from tqdm import tqdm
 
+from utils.apk_features import needs_scoped_features, scoped_apk_features
 from utils.plotting import plot_data, generate_download_link
+from utils.historical_connectivity_logic import initialize_database, load_sampling_plan, sampling_plan_id, save_sampling_plan
+from utils.worker_pool import get_download_executor, get_worker_pool
 
 from .dex_parser import DEXParser
 
+# sampling plans are kept in the catalogue's sampling_plans table, keyed by package and date range
+PLAN_DB_PATH = 'androzoo.db'
+PLAN_KIND = 'apk-analysis'
+
 #  variable to track progress
 progress = {
     'current_task': '',
@@ -218,10 +224,8 @@ def download_apk_worker(sha256, vercode, vtscandate, package_name, apikey, unive
 
 
 def download_apks(package_names, apikey, universal_cache_dir, csv_path, start_date, end_date, desired_versions,
-                  core_count):
-    pool = mp.Pool(min(core_count, mp.cpu_count() - 1))
+                  core_count, plan_db_path=PLAN_DB_PATH):
     download_tasks = []
-    apk_log = {}
     for package_name in package_names:
         sha256_vercode_vtscandate_list = find_sha256_vercode_vtscandate(package_name, csv_path, start_date, end_date)
         if not sha256_vercode_vtscandate_list:
@@ -233,18 +237,11 @@ def download_apks(package_names, apikey, universal_cache_dir, csv_path, start_da
         for sha256, vercode, vtscandate in sampled_apps:
             download_tasks.append((sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir))
 
-        apk_log[package_name] = [
-            {"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate}
-            for sha256, vercode, vtscandate in [latest_app] + sampled_apps
-        ]
-
-    results = pool.starmap(download_apk_worker, download_tasks)
-    pool.close()
-    pool.join()
+        plan_id = sampling_plan_id(PLAN_KIND, start_date, end_date, desired_versions)
+        save_sampling_plan(plan_db_path, plan_id, package_name, [latest_app] + sampled_apps)
 
-    # Save the APK log as JSON
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'w') as f:
-        json.dump(apk_log, f, indent=2)
+    # downloads share one thread pool across all requests
+    results = list(get_download_executor().map(lambda task: download_apk_worker(*task), download_tasks))
 
     return [result for result in results if result is not None]
 
@@ -390,27 +387,8 @@ def extract_apk_features(file_path, data_type, use_cache_json):
                                         domain = '.'.join([parsed_url.domain, parsed_url.suffix]).strip('.')
                                         if "." in domain:
                                             data.append(domain)
-            if 'permissions' or 'services' or 'activities' or 'providers' or 'receivers' or 'libraries' or 'java_classes' in data_type:
-                a, _, _ = AnalyzeAPK(file_path)
-
-            if 'permissions' in data_type:
-                data.extend(a.get_permissions())
-            if 'services' in data_type:
-                data.extend(a.get_services())
-            if 'activities' in data_type:
-                data.extend(a.get_activities())
-            if 'providers' in data_type:
-                data.extend(a.get_providers())
-            if 'receivers' in data_type:
-                data.extend(a.get_receivers())
-            if 'libraries' in data_type:
-                data.extend(a.get_libraries())
-            if 'java_classes' in data_type:
-                for dex in a.get_all_dex():
-                    dv = dvm.DalvikVMFormat(dex)
-                    for clazz in dv.get_classes():
-                        class_name = clazz.get_name()[1:-1].replace('/', '.')
-                        data.append(class_name)
+            if needs_scoped_features(data_type):
+                data.extend(scoped_apk_features(file_path, data_type))
         except Exception as e:
             print(f'Error while extracting {data_type} from {file_path}: {str(e)}')
         with open(json_file_path, 'w') as json_file:
@@ -423,20 +401,19 @@ def process_package(package_name, base_directory, apikey, csv_path, start_date,
     universal_cache_dir = os.path.join(base_directory, "apk_cache")
     os.makedirs(universal_cache_dir, exist_ok=True)
 
+    initialize_database(PLAN_DB_PATH)
+    plan_id = sampling_plan_id(PLAN_KIND, start_date, end_date, desired_versions)
     if download:
         downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, csv_path, start_date, end_date,
                                         desired_versions, core_count)
-    '''else:
-        # Load APK log and get the relevant APKs for this package
-        with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'r') as f:
-            apk_log = json.load(f)
-        downloaded_apks = [find_apk_by_partial_sha256(universal_cache_dir, apk['sha256']) for apk in
-                           apk_log.get(package_name, [])]
-        downloaded_apks = [apk for apk in downloaded_apks if apk is not None]'''
+    else:
+        # reuse the stored plan for this range, analysing whichever of its APKs are already cached
+        downloaded_apks = [apk for apk in load_sampling_plan(PLAN_DB_PATH, plan_id, package_name)
+                           if check_apk_in_cache(apk['sha256'], universal_cache_dir)]
 
     if downloaded_apks:
         version_vtscandate_subdomains = process_package_apks(universal_cache_dir, package_name, data_type,
-                                                             use_cache_json, core_count)
+                                                             use_cache_json, core_count, plan_id)
         print(version_vtscandate_subdomains)
 
         # Plot the existing data
@@ -449,18 +426,15 @@ def process_package(package_name, base_directory, apikey, csv_path, start_date,
         return None
 
 
-def process_package_apks(universal_cache_dir, package_name, data_type, use_cache_json, core_count):
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'r') as f:
-        apk_log = json.load(f)
-
-    relevant_apks = apk_log.get(package_name, [])
+def process_package_apks(universal_cache_dir, package_name, data_type, use_cache_json, core_count, plan_id,
+                         plan_db_path=PLAN_DB_PATH):
+    relevant_apks = load_sampling_plan(plan_db_path, plan_id, package_name)
 
-    pool = mp.Pool(min(core_count, mp.cpu_count() - 1), maxtasksperchild=4)
-    results = pool.starmap(process_file, [
+    # extraction runs on the shared worker pool (workers are recycled by memory use there); core_count caps
+    # this request's share of it
+    results = get_worker_pool().starmap(process_file, [
         (apk['sha256'], universal_cache_dir, data_type, use_cache_json, apk['vercode'], apk['vtscandate']) for apk in
-        relevant_apks])
-    pool.close()
-    pool.join()
+        relevant_apks], max_parallel=core_count)
 
     version_vtscandate_subdomains_counts = []
     for result in results:
@@ -479,15 +453,12 @@ def process_file(sha256, folder_path, data_type, use_cache_json, vercode, vtscan
         return None
 
     try:
-        a, _, _ = AnalyzeAPK(file_path)
-        version = vercode  # Use the vercode from apk_log instead of extracting it again
+        version = vercode  # Use the vercode from the sampling plan instead of extracting it again
 
         subdomains = extract_apk_features(file_path, data_type, use_cache_json)
         subdomain_counts = defaultdict(int)
         for subdomain in subdomains:
             subdomain_counts[subdomain] += 1
-        del a
-        gc.collect()
         return [(version, vtscandate, subdomain, count) for subdomain, count in subdomain_counts.items()]
     except Exception as e:
         print(f"Error processing file {sha256}.apk: {str(e)}")
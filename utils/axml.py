@@ -0,0 +1,163 @@
+# utils/axml.py
+# minimal reader for the binary XML (AXML) AndroidManifest.xml inside an APK.
+#
+# only the string pool, the resource map and start-element chunks are decoded, which is all that package,
+# version, permissions and component names need; nothing else in the APK is opened.
+import struct
+import zipfile
+
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+UTF8_FLAG = 0x100
+
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+NO_ENTRY = 0xFFFFFFFF
+
+# android: attribute names by resource id, for manifests whose attribute name strings have been stripped
+ATTRIBUTE_IDS = {
+    0x01010003: 'name',
+    0x0101021B: 'versionCode',
+    0x0101021C: 'versionName',
+}
+
+COMPONENT_TAGS = {
+    'activity': 'activities',
+    'service': 'services',
+    'receiver': 'receivers',
+    'provider': 'providers',
+}
+PERMISSION_TAGS = ('uses-permission', 'uses-permission-sdk-23', 'uses-permission-sdk-m')
+
+
+class AXMLError(Exception):
+    pass
+
+
+def _decode_length(data, offset, utf8):
+    # string lengths are 1-2 bytes (utf-8) or 1-2 shorts (utf-16), the high bit marking the long form
+    if utf8:
+        length = data[offset]
+        if length & 0x80:
+            return ((length & 0x7F) << 8) | data[offset + 1], offset + 2
+        return length, offset + 1
+    length = struct.unpack_from('<H', data, offset)[0]
+    if length & 0x8000:
+        return ((length & 0x7FFF) << 16) | struct.unpack_from('<H', data, offset + 2)[0], offset + 4
+    return length, offset + 2
+
+
+def parse_string_pool(data, offset):
+    string_count, _, flags, strings_start = struct.unpack_from('<IIII', data, offset + 8)
+    utf8 = bool(flags & UTF8_FLAG)
+    offsets = struct.unpack_from(f'<{string_count}I', data, offset + 28)
+    base = offset + strings_start
+    strings = []
+    for string_offset in offsets:
+        position = base + string_offset
+        if utf8:
+            _, position = _decode_length(data, position, True)  # length in characters
+            length, position = _decode_length(data, position, True)  # length in bytes
+            strings.append(data[position:position + length].decode('utf-8', errors='replace'))
+        else:
+            length, position = _decode_length(data, position, False)
+            strings.append(data[position:position + length * 2].decode('utf-16-le', errors='replace'))
+    return strings
+
+
+def iter_start_elements(data):
+    # yields (tag, {attribute name: value}) for every start element, in document order
+    if len(data) < 8 or struct.unpack_from('<H', data, 0)[0] != RES_XML_TYPE:
+        raise AXMLError("not a binary XML file")
+    strings = []
+    resource_ids = []
+    offset = struct.unpack_from('<H', data, 2)[0]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from('<HHI', data, offset)
+        if chunk_size < 8:
+            raise AXMLError(f"bad chunk size at offset {offset}")
+        if chunk_type == RES_STRING_POOL_TYPE:
+            strings = parse_string_pool(data, offset)
+        elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+            count = (chunk_size - header_size) // 4
+            resource_ids = struct.unpack_from(f'<{count}I', data, offset + header_size)
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+            ext = offset + header_size
+            _, name, attribute_start, attribute_size, attribute_count = struct.unpack_from('<IIHHH', data, ext)
+            attributes = {}
+            for i in range(attribute_count):
+                position = ext + attribute_start + i * attribute_size
+                _, attribute_name, raw_value, _, _, data_type, value = struct.unpack_from('<IIIHBBI', data, position)
+                key = strings[attribute_name] if attribute_name < len(strings) else ''
+                if not key and attribute_name < len(resource_ids):
+                    key = ATTRIBUTE_IDS.get(resource_ids[attribute_name], '')
+                attributes[key] = _attribute_value(strings, raw_value, data_type, value)
+            yield strings[name] if name < len(strings) else '', attributes
+        offset += chunk_size
+
+
+def _attribute_value(strings, raw_value, data_type, value):
+    if data_type == TYPE_STRING or (raw_value != NO_ENTRY and raw_value < len(strings)):
+        return strings[value if data_type == TYPE_STRING else raw_value]
+    if data_type == TYPE_INT_BOOLEAN:
+        return value != 0
+    if data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+        return value
+    if data_type == TYPE_REFERENCE:
+        return f"@{value:08x}"
+    return value
+
+
+def _class_name(package, name):
+    # component names may be relative to the package
+    if not name:
+        return name
+    if name.startswith('.'):
+        return package + name
+    if '.' not in name:
+        return f"{package}.{name}"
+    return name
+
+
+def parse_manifest(data):
+    manifest = {
+        'package_name': None,
+        'version_code': None,
+        'version_name': None,
+        'permissions': [],
+        'activities': [],
+        'services': [],
+        'receivers': [],
+        'providers': [],
+        'libraries': [],
+    }
+    for tag, attributes in iter_start_elements(data):
+        if tag == 'manifest':
+            manifest['package_name'] = attributes.get('package')
+            version_code = attributes.get('versionCode')
+            manifest['version_code'] = str(version_code) if version_code is not None else None
+            version_name = attributes.get('versionName')
+            manifest['version_name'] = str(version_name) if version_name is not None else None
+        elif tag in PERMISSION_TAGS:
+            if attributes.get('name'):
+                manifest['permissions'].append(attributes['name'])
+        elif tag in COMPONENT_TAGS:
+            if attributes.get('name'):
+                manifest[COMPONENT_TAGS[tag]].append(_class_name(manifest['package_name'] or '', attributes['name']))
+        elif tag == 'uses-library':
+            if attributes.get('name'):
+                manifest['libraries'].append(attributes['name'])
+    return manifest
+
+
+def read_manifest(apk_path):
+    # package, version and declared permissions/components straight from the APK's AndroidManifest.xml
+    with zipfile.ZipFile(apk_path, 'r') as z:
+        data = z.read('AndroidManifest.xml')
+    return parse_manifest(data)
@@ -0,0 +1,196 @@
+# utils/batch_analysis.py
+import base64
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from utils.feature_matrix import FeatureCounts, batch_rows
+from utils.historical_connectivity_logic import (build_figures, initialize_database, load_sampling_plan, process_file,
+                                                 run_downloads, sample_package_apks, save_sampling_plan, ui_logger,
+                                                 validate_and_clean_apks)
+from utils.results_store import get_results_store
+from utils.jobs import CancelCheck, current_job_id, emit_progress, job_output_dir, register_job_kind
+from utils.summary_export import OUTPUT_ROOT
+from utils.worker_pool import get_worker_pool
+
+base_dir = Path(__file__).parent.parent.absolute()
+BATCH_ROOT = os.path.join(OUTPUT_ROOT, "batches")
+
+MAX_BATCH_PACKAGES = 500
+
+
+def parse_package_list(text):
+    # one package per line, or separated by commas/whitespace; '#' starts a comment
+    packages = []
+    for line in (text or '').splitlines():
+        line = line.split('#', 1)[0]
+        for package_name in re.split(r'[\s,;]+', line):
+            if package_name and package_name not in packages:
+                packages.append(package_name)
+    return packages
+
+
+def batch_key(packages, start_date, end_date, desired_versions, parser_selection):
+    # the same inputs map to the same checkpoint, so resubmitting an interrupted batch resumes it
+    key = json.dumps([sorted(packages), start_date, end_date, int(desired_versions), parser_selection])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class BatchCheckpoint:
+    # only the ids of the APKs this batch has processed are kept here; their payloads live in the results store
+    def __init__(self, key):
+        self.batch_dir = os.path.join(BATCH_ROOT, key)
+        os.makedirs(self.batch_dir, exist_ok=True)
+        self.processed_path = os.path.join(self.batch_dir, "processed.txt")
+        # sampling plans live in the catalogue's sampling_plans table under this id
+        self.plan_id = f"batch-{key}"
+        self.processed = set()
+        self._partial_line = False
+        if os.path.exists(self.processed_path):
+            with open(self.processed_path) as f:
+                content = f.read()
+            # a line cut short by an interruption is ignored, and that APK is picked up again
+            self.processed = {line.strip() for line in content.splitlines() if len(line.strip()) == 64}
+            self._partial_line = bool(content) and not content.endswith('\n')
+
+    def is_processed(self, sha256):
+        return sha256 in self.processed
+
+    def mark_processed(self, sha256s):
+        new = [sha256 for sha256 in sha256s if sha256 not in self.processed]
+        if not new:
+            return
+        with open(self.processed_path, 'a') as f:
+            f.write(('\n' if self._partial_line else '') + ''.join(f"{sha256}\n" for sha256 in new))
+        self._partial_line = False
+        self.processed.update(new)
+
+
+def plan_batch(packages, db_path, plan_id, start_date, end_date, desired_versions):
+    # packages planned by an earlier attempt keep their plan, the rest are sampled now
+    plan = {}
+    resumed = 0
+    for package_name in packages:
+        stored = load_sampling_plan(db_path, plan_id, package_name)
+        if stored:
+            plan[package_name] = [(apk['sha256'], apk['vercode'], apk['vtscandate']) for apk in stored]
+            resumed += 1
+            continue
+        plan[package_name] = sample_package_apks(package_name, db_path, start_date, end_date, desired_versions)
+        if plan[package_name]:
+            save_sampling_plan(db_path, plan_id, package_name, plan[package_name])
+        else:
+            ui_logger.logger.warning(f"No APKs found for {package_name} in the selected date range")
+    if resumed:
+        ui_logger.logger.info(f"Resuming: reused the sampling plan of {resumed} packages")
+    return plan
+
+
+def unique_apks(plan):
+    # an APK listed under several packages is downloaded and parsed once
+    apks = {}
+    for package_name, package_apks in plan.items():
+        for sha256, vercode, vtscandate in package_apks:
+            apks.setdefault(sha256, (vercode, vtscandate, package_name))
+    return apks
+
+
+def batch_output_dir(output_dir, name):
+    if not output_dir:
+        return None
+    path = os.path.join(output_dir, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def process_batch(job_id, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection, summary_formats=None):
+    if not api_key:
+        raise ValueError("An AndroZoo API key is required (jobs queued before a server restart must be resubmitted)")
+
+    packages = parse_package_list(package_list_input)
+    if not packages:
+        raise ValueError("No package names given")
+    if len(packages) > MAX_BATCH_PACKAGES:
+        raise ValueError(f"A batch is limited to {MAX_BATCH_PACKAGES} packages, got {len(packages)}")
+
+    start_date_str = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
+    end_date_str = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
+    db_path = 'androzoo.db'
+    universal_cache_dir = os.path.join(os.getcwd(), "apk_cache")
+    os.makedirs(universal_cache_dir, exist_ok=True)
+    validate_and_clean_apks(universal_cache_dir, os.path.join(base_dir, "trash"))
+    initialize_database(db_path)
+
+    cancel_check = CancelCheck(current_job_id())
+    checkpoint = BatchCheckpoint(batch_key(packages, start_date, end_date, desired_versions, parser_selection))
+    ui_logger.logger.info(f"Batch of {len(packages)} packages, checkpoint in {checkpoint.batch_dir}")
+
+    plan = plan_batch(packages, db_path, checkpoint.plan_id, start_date_str, end_date_str, int(desired_versions))
+
+    apks = unique_apks(plan)
+    store = get_results_store()
+    # resume from the results store: anything already extracted with these settings, by this batch or any other run,
+    # is not downloaded or parsed again
+    done = store.completed('connectivity', parser_selection, apks)
+    checkpoint.mark_processed(done)
+    pending = {sha256: apk for sha256, apk in apks.items() if sha256 not in done}
+    ui_logger.logger.info(f"{len(apks)} distinct APKs planned, {len(apks) - len(pending)} already extracted")
+
+    # one global download plan across every package
+    run_downloads([(sha256, vercode, vtscandate, package_name, api_key, universal_cache_dir, cancel_check)
+                   for sha256, (vercode, vtscandate, package_name) in pending.items()])
+    cancel_check.raise_if_cancelled()
+
+    # and one extraction pass across every package; each result is stored and checkpointed as soon as it arrives
+    tasks = [(sha256, universal_cache_dir, vercode, vtscandate, parser_selection, cancel_check)
+             for sha256, (vercode, vtscandate, package_name) in pending.items()
+             if os.path.exists(os.path.join(universal_cache_dir, f"{sha256}.apk"))]
+    emit_progress('parse', 0, len(tasks))
+    for parsed, (index, batch) in enumerate(get_worker_pool().imap_unordered(process_file, tasks, max_parallel=num_cores), 1):
+        if batch is not None:
+            sha256 = tasks[index][0]
+            vercode, vtscandate, package_name = pending[sha256]
+            store.save_result('connectivity', sha256, parser_selection, package_name, vercode, vtscandate, batch, batch_rows(batch))
+            checkpoint.mark_processed([sha256])
+        emit_progress('parse', parsed, len(tasks))
+    cancel_check.raise_if_cancelled()
+
+    output_dir = job_output_dir(job_id) if summary_formats else None
+    results = {'packages': {}, 'combined': None, 'batch_dir': checkpoint.batch_dir}
+    combined = FeatureCounts()
+    for package_name, package_apks in plan.items():
+        feature_counts = FeatureCounts()
+        for sha256, vercode, vtscandate in package_apks:
+            if not checkpoint.is_processed(sha256):
+                continue
+            batch = store.get_payload('connectivity', sha256, parser_selection)
+            if batch is None:
+                continue
+            feature_counts.add(batch, source=sha256)
+            # cross-package matrix: cells count the sampled versions of a package that contain the feature
+            combined.add(batch, column=package_name, presence=True)
+        if not feature_counts:
+            ui_logger.logger.warning(f"No data extracted for {package_name}")
+            continue
+        results['packages'][package_name] = build_figures(feature_counts, package_name, highlight_config, summary_formats,
+                                                          batch_output_dir(output_dir, package_name), params=parser_selection)
+        cancel_check.raise_if_cancelled()
+
+    if combined:
+        results['combined'] = build_figures(combined, f"{len(results['packages'])} packages", highlight_config, summary_formats,
+                                            batch_output_dir(output_dir, 'combined'), changes=False)
+
+    ui_logger.logger.info(f"Batch complete: {len(results['packages'])} of {len(packages)} packages produced figures")
+    return results
+
+
+def load_package_file(contents):
+    # contents of a dcc.Upload, a text file with one package per line
+    content_type, content_string = contents.split(',', 1)
+    return base64.b64decode(content_string).decode('utf-8', errors='ignore')
+
+
+register_job_kind('historical_connectivity_batch', process_batch)
@@ -0,0 +1,134 @@
+# utils/corpus_analysis.py
+# offline, corpus-scale runs of the per-APK analyses; results go to the results store (see cli.py)
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from tqdm import tqdm
+
+from utils.feature_matrix import batch_rows
+from utils.historical_connectivity_logic import (download_apk_worker, initialize_database, process_file,
+                                                 sample_package_apks)
+from utils.results_store import get_results_store, use_results_store
+from utils.worker_pool import SharedWorkerPool, get_download_executor
+import utils.sdk_presence_utils as sdk_presence
+import utils.string_presence_utils as string_presence
+
+ANALYSES = ['connectivity', 'sdk', 'strings']
+
+
+def connectivity_params(parser_selection):
+    return parser_selection
+
+
+def strings_params(string_patterns):
+    # results depend on the pattern set, so it is part of the key
+    return hashlib.sha1(json.dumps(string_patterns, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def connectivity_worker(sha256, cache_dir, vercode, vtscandate, parser_selection, results_db):
+    # the DEX cache inside process_file goes to the run's results database, not the default one
+    use_results_store(results_db)
+    batch = process_file(sha256, cache_dir, vercode, vtscandate, parser_selection)
+    if batch is None:
+        return None
+    return batch, list(batch_rows(batch))
+
+
+def sdk_worker(sha256, cache_dir, vercode, vtscandate, params, results_db):
+    apk_path = os.path.join(cache_dir, f"{sha256}.apk")
+    try:
+        found = [sdk for sdk, present in sdk_presence.analyze_sdks(apk_path, sdk_presence.sdk_patterns).items() if present]
+    except Exception as e:
+        logging.error(f"Error analysing SDKs in {sha256}.apk: {str(e)}")
+        return None
+    return found, [('sdks', sdk, 1) for sdk in found]
+
+
+def strings_worker(sha256, cache_dir, vercode, vtscandate, params, results_db):
+    apk_path = os.path.join(cache_dir, f"{sha256}.apk")
+    try:
+        matches = string_presence.analyze_strings(apk_path, string_presence.DEFAULT_STRING_PATTERNS)
+    except Exception as e:
+        logging.error(f"Error analysing strings in {sha256}.apk: {str(e)}")
+        return None
+    return matches, [('strings', pattern, len(found)) for pattern, found in matches.items()]
+
+
+WORKERS = {
+    'connectivity': connectivity_worker,
+    'sdk': sdk_worker,
+    'strings': strings_worker,
+}
+
+
+def analysis_params(analysis, parser_selection):
+    if analysis == 'connectivity':
+        return connectivity_params(parser_selection)
+    if analysis == 'strings':
+        return strings_params(string_presence.DEFAULT_STRING_PATTERNS)
+    return 'default'
+
+
+def plan_apks(analysis, package_names, db_path, start_date, end_date, desired_versions, samples_per_year):
+    plan = []
+    for package_name in package_names:
+        if analysis == 'connectivity':
+            apks = sample_package_apks(package_name, db_path, start_date, end_date, desired_versions)
+        else:
+            apks = string_presence.sample_apks(string_presence.fetch_apks(db_path, package_name, start_date, end_date), samples_per_year)
+        plan.extend((package_name, sha256, vercode, vtscandate) for sha256, vercode, vtscandate in apks)
+    return plan
+
+
+def run_analysis(analysis, package_names, api_key, start_date, end_date, db_path='androzoo.db', cache_dir=None,
+                 desired_versions=10, samples_per_year=4, parser_selection='digisilk', workers=None, store=None):
+    store = store or get_results_store()
+    cache_dir = cache_dir or os.path.join(os.getcwd(), "apk_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    initialize_database(db_path)
+
+    start_date_str = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
+    end_date_str = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
+    params = analysis_params(analysis, parser_selection)
+
+    plan = plan_apks(analysis, package_names, db_path, start_date_str, end_date_str, desired_versions, samples_per_year)
+    # the checkpoint is the results store itself: APKs with a stored result are skipped
+    done = store.completed(analysis, params, [sha256 for _, sha256, _, _ in plan])
+    pending = {}
+    for package_name, sha256, vercode, vtscandate in plan:
+        if sha256 not in done:
+            pending.setdefault(sha256, (package_name, vercode, vtscandate))
+    print(f"{analysis}: {len(plan)} APKs planned across {len(package_names)} packages, {len(pending)} left to analyse")
+    if not pending:
+        return 0
+
+    to_download = [sha256 for sha256 in pending if not os.path.exists(os.path.join(cache_dir, f"{sha256}.apk"))]
+    if to_download:
+        if not api_key:
+            raise ValueError("An AndroZoo API key is required to download missing APKs")
+        executor = get_download_executor()
+        futures = [executor.submit(download_apk_worker, sha256, pending[sha256][1], pending[sha256][2], pending[sha256][0], api_key, cache_dir)
+                   for sha256 in to_download]
+        for future in tqdm(futures, desc="Downloading", unit="apk"):
+            future.result()
+
+    tasks = [(sha256, cache_dir, vercode, vtscandate, params, store.db_path) for sha256, (package_name, vercode, vtscandate) in pending.items()
+             if os.path.exists(os.path.join(cache_dir, f"{sha256}.apk"))]
+    pool = SharedWorkerPool(processes=workers) if workers else SharedWorkerPool()
+    analysed = 0
+    try:
+        for index, result in tqdm(pool.imap_unordered(WORKERS[analysis], tasks), total=len(tasks), desc="Analysing", unit="apk"):
+            sha256 = tasks[index][0]
+            package_name, vercode, vtscandate = pending[sha256]
+            if result is None:
+                store.save_failure(analysis, sha256, params, package_name, vercode, vtscandate)
+                continue
+            payload, rows = result
+            store.save_result(analysis, sha256, params, package_name, vercode, vtscandate, payload, rows)
+            analysed += 1
+    finally:
+        pool.shutdown()
+    return analysed
@@ -1,5 +1,6 @@
 import struct
 import re
+import zipfile
 
 class DEXParser:
     def __init__(self, dex_data_or_path):
@@ -75,4 +76,37 @@ class DEXParser:
         return result, offset
 
     def get_strings(self):
-        return self.strings
\ No newline at end of file
+        return self.strings
+
+
+def is_code_dex(name):
+    # classes.dex, classes2.dex, ... at the archive root; DEX files under assets/ or res/ are not the app's code
+    return name.startswith('classes') and name.endswith('.dex')
+
+
+def parse_dex_entry(apk_path, dex_name):
+    # worker task: URL-bearing strings of one DEX inside an APK
+    with zipfile.ZipFile(apk_path, 'r') as z:
+        parser = DEXParser(z.read(dex_name))
+    parser.parse()
+    return parser.get_strings()
+
+
+def dex_class_names(dex_data):
+    # names of the classes defined in a DEX, from the class_defs, type_ids and string_ids tables only
+    (string_ids_size, string_ids_off, type_ids_size, type_ids_off) = struct.unpack_from('<IIII', dex_data, 56)
+    class_defs_size, class_defs_off = struct.unpack_from('<II', dex_data, 96)
+    parser = DEXParser(dex_data)
+    names = []
+    for i in range(class_defs_size):
+        class_idx = struct.unpack_from('<I', dex_data, class_defs_off + i * 32)[0]
+        if class_idx >= type_ids_size:
+            continue
+        descriptor_idx = struct.unpack_from('<I', dex_data, type_ids_off + class_idx * 4)[0]
+        if descriptor_idx >= string_ids_size:
+            continue
+        size, offset = parser.read_uleb128(struct.unpack_from('<I', dex_data, string_ids_off + descriptor_idx * 4)[0])
+        descriptor = dex_data[offset:offset + size].decode('utf-8', errors='replace')
+        # Lcom/example/Foo; -> com.example.Foo
+        names.append(descriptor[1:-1].replace('/', '.'))
+    return names
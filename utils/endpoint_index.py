@@ -0,0 +1,162 @@
+# utils/endpoint_index.py
+# inverted index over everything the connectivity extractor has analysed: endpoint -> (package, version, date)
+#
+# terms and APKs are dictionary-encoded to integer ids; postings are (term_id, apk_id) pairs in a WITHOUT ROWID
+# table, i.e. stored clustered and sorted by term, so a lookup is one index seek plus a range scan.
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DATA_TYPES = ('domains', 'subdomains', 'urls')
+# how often results written by other processes (e.g. cli.py) are backfilled into the index
+BACKFILL_INTERVAL_S = int(os.environ.get('JANUS_ENDPOINT_INDEX_REFRESH_S', 300))
+
+
+class EndpointIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._backfill_thread = None
+        self.initialize()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def initialize(self):
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS endpoint_terms (
+            term_id INTEGER PRIMARY KEY,
+            data_type TEXT NOT NULL,
+            term TEXT NOT NULL,
+            UNIQUE (term, data_type)
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS endpoint_apks (
+            apk_id INTEGER PRIMARY KEY,
+            sha256 TEXT NOT NULL UNIQUE,
+            pkg_name TEXT,
+            vercode TEXT,
+            vt_scan_date TEXT
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS endpoint_postings (
+            term_id INTEGER NOT NULL,
+            apk_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (term_id, apk_id)
+        ) WITHOUT ROWID
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _term_ids(self, conn, keys):
+        # keys: set of (term, data_type); returns {(term, data_type): term_id}, creating missing terms
+        conn.executemany('INSERT OR IGNORE INTO endpoint_terms (term, data_type) VALUES (?, ?)', keys)
+        ids = {}
+        for term, data_type in keys:
+            row = conn.execute('SELECT term_id FROM endpoint_terms WHERE term = ? AND data_type = ?', (term, data_type)).fetchone()
+            ids[(term, data_type)] = row[0]
+        return ids
+
+    def add_apk(self, sha256, pkg_name, vercode, vt_scan_date, rows, conn=None):
+        # rows: (data_type, feature, count); re-adding an indexed APK is a no-op
+        rows = [(data_type, feature, count) for data_type, feature, count in rows if data_type in DATA_TYPES]
+        own_conn = conn is None
+        conn = conn or self.connect()
+        try:
+            with self._lock, conn:
+                if conn.execute('SELECT 1 FROM endpoint_apks WHERE sha256 = ?', (sha256,)).fetchone():
+                    return False
+                apk_id = conn.execute('INSERT INTO endpoint_apks (sha256, pkg_name, vercode, vt_scan_date) VALUES (?, ?, ?, ?)',
+                                      (sha256, pkg_name, str(vercode), vt_scan_date)).lastrowid
+                term_ids = self._term_ids(conn, {(feature, data_type) for data_type, feature, _ in rows})
+                conn.executemany('INSERT OR REPLACE INTO endpoint_postings (term_id, apk_id, count) VALUES (?, ?, ?)',
+                                 [(term_ids[(feature, data_type)], apk_id, int(count)) for data_type, feature, count in rows])
+            return True
+        finally:
+            if own_conn:
+                conn.close()
+
+    def update_from_results(self, analysis='connectivity'):
+        # incremental backfill: index stored results whose APK is not in the index yet
+        conn = self.connect()
+        try:
+            pending = conn.execute('''
+            SELECT r.sha256, r.params, r.pkg_name, r.vercode, r.vt_scan_date FROM apk_results r
+            LEFT JOIN endpoint_apks e ON e.sha256 = r.sha256
+            WHERE r.analysis = ? AND r.status = 'done' AND e.apk_id IS NULL
+            ''', (analysis,)).fetchall()
+            added = 0
+            for apk in pending:
+                rows = conn.execute('SELECT data_type, feature, count FROM apk_features WHERE analysis = ? AND sha256 = ? AND params = ?',
+                                    (analysis, apk['sha256'], apk['params'])).fetchall()
+                if self.add_apk(apk['sha256'], apk['pkg_name'], apk['vercode'], apk['vt_scan_date'], [tuple(row) for row in rows], conn):
+                    added += 1
+            return added
+        finally:
+            conn.close()
+
+    def ensure_backfill(self, interval=BACKFILL_INTERVAL_S):
+        # started lazily from the serving process: one backfill now, then one every interval seconds, so searches
+        # never scan the results store themselves
+        with self._lock:
+            if self._backfill_thread is not None:
+                return
+            self._backfill_thread = threading.Thread(target=self._backfill_loop, args=(interval,),
+                                                     name='endpoint-index-backfill', daemon=True)
+            self._backfill_thread.start()
+
+    def _backfill_loop(self, interval):
+        while True:
+            try:
+                added = self.update_from_results()
+                if added:
+                    logging.info(f"Endpoint index: backfilled {added} APKs")
+            except Exception as e:
+                logging.error(f"Endpoint index backfill failed: {str(e)}")
+            time.sleep(interval)
+
+    def lookup(self, term, data_type=None, prefix=False, limit=5000):
+        # returns (rows, elapsed_ms); rows are dicts of term, data_type, package, version, date, count, sha256
+        term = (term or '').strip()
+        if not term:
+            return [], 0.0
+        started = time.perf_counter()
+        if prefix:
+            # a range on the unique (term, data_type) index rather than LIKE, which would scan
+            condition, args = 't.term >= ? AND t.term < ?', [term, term + '\U0010ffff']
+        else:
+            condition, args = 't.term = ?', [term]
+        if data_type:
+            condition += ' AND t.data_type = ?'
+            args.append(data_type)
+        conn = self.connect()
+        rows = conn.execute(f'''
+        SELECT t.term, t.data_type, a.pkg_name, a.vercode, a.vt_scan_date, p.count, a.sha256
+        FROM endpoint_terms t
+        JOIN endpoint_postings p ON p.term_id = t.term_id
+        JOIN endpoint_apks a ON a.apk_id = p.apk_id
+        WHERE {condition}
+        ORDER BY a.pkg_name, a.vt_scan_date
+        LIMIT ?
+        ''', (*args, limit)).fetchall()
+        conn.close()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return [{'term': row[0], 'data_type': row[1], 'package': row[2], 'version': row[3], 'date': row[4],
+                 'count': row[5], 'sha256': row[6]} for row in rows], elapsed_ms
+
+    def stats(self):
+        conn = self.connect()
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('endpoint_terms', 'endpoint_apks', 'endpoint_postings')}
+        counts['packages'] = conn.execute('SELECT COUNT(DISTINCT pkg_name) FROM endpoint_apks').fetchone()[0]
+        conn.close()
+        return counts
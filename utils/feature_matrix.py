@@ -0,0 +1,108 @@
+# utils/feature_matrix.py
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def encode_batch(version, vtscandate, columns):
+    # columns: data_type -> list of feature strings found in one APK
+    # returned as one string table plus (ids, counts) per data type, so each string is pickled once per APK
+    strings = {}
+    encoded = {}
+    for data_type, values in columns.items():
+        counts = Counter(values)
+        ids = np.fromiter((strings.setdefault(value, len(strings)) for value in counts), dtype=np.int32, count=len(counts))
+        encoded[data_type] = (ids, np.fromiter(counts.values(), dtype=np.int32, count=len(counts)))
+    return {
+        'version': str(version),
+        'vtscandate': vtscandate,
+        'strings': list(strings),
+        'columns': encoded,
+    }
+
+
+def format_scan_date(vtscandate):
+    try:
+        return pd.to_datetime(vtscandate).strftime('%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+
+class FeatureCounts:
+    # merges worker batches into one feature x version count matrix per data type
+    def __init__(self):
+        self.feature_ids = {}
+        self.features = []
+        self.version_ids = {}
+        self.versions = []
+        self.version_dates = {}
+        # version -> sha256s of the stored APK results merged into it, lets the diff stage reuse stored deltas
+        self.version_sources = {}
+        self._rows = {}
+        self._cols = {}
+        self._counts = {}
+        self.batch_count = 0
+
+    def __len__(self):
+        return self.batch_count
+
+    def _version_id(self, version, vtscandate):
+        if version not in self.version_ids:
+            self.version_ids[version] = len(self.versions)
+            self.versions.append(version)
+        date = format_scan_date(vtscandate)
+        if date and (version not in self.version_dates or date < self.version_dates[version]):
+            self.version_dates[version] = date
+        return self.version_ids[version]
+
+    def add(self, batch, column=None, presence=False, source=None):
+        # column puts the batch under another label than its version (e.g. its package),
+        # presence counts each batch once per feature instead of by occurrences,
+        # source is the sha256 of the APK the batch was extracted from
+        if not batch:
+            return
+        col = self._version_id(column or batch['version'], batch['vtscandate'])
+        if source:
+            self.version_sources.setdefault(column or batch['version'], set()).add(source)
+        # map the batch's local string ids onto the shared feature ids
+        local_to_global = np.empty(len(batch['strings']), dtype=np.int64)
+        for local_id, value in enumerate(batch['strings']):
+            if value not in self.feature_ids:
+                self.feature_ids[value] = len(self.features)
+                self.features.append(value)
+            local_to_global[local_id] = self.feature_ids[value]
+
+        for data_type, (ids, counts) in batch['columns'].items():
+            if not len(ids):
+                continue
+            self._rows.setdefault(data_type, []).append(local_to_global[ids])
+            self._cols.setdefault(data_type, []).append(np.full(len(ids), col, dtype=np.int64))
+            self._counts.setdefault(data_type, []).append(np.ones_like(counts) if presence else counts)
+        self.batch_count += 1
+
+    def data_types(self):
+        return list(self._rows)
+
+    def matrix(self, data_type):
+        # returns (csr count matrix, row feature names, column versions) with only the rows this data type uses
+        if data_type not in self._rows:
+            return None, [], []
+        rows = np.concatenate(self._rows[data_type])
+        cols = np.concatenate(self._cols[data_type])
+        counts = np.concatenate(self._counts[data_type])
+        used, rows = np.unique(rows, return_inverse=True)
+        matrix = sparse.coo_matrix((counts, (rows, cols)), shape=(len(used), len(self.versions))).tocsr()
+        matrix.sum_duplicates()
+        return matrix, [self.features[i] for i in used], list(self.versions)
+
+
+def batch_rows(batch):
+    # (data_type, feature, count) rows of one encoded batch
+    if not batch:
+        return
+    strings = batch['strings']
+    for data_type, (ids, counts) in batch['columns'].items():
+        for feature_id, count in zip(ids, counts):
+            yield data_type, strings[feature_id], int(count)
@@ -2,6 +2,7 @@
 import base64
 import csv
 import gc
+import hashlib
 import json
 import logging
 import multiprocessing as mp
@@ -10,11 +11,14 @@ import re
 import shutil
 import struct
 import time
+import uuid
 import zipfile
 from collections import defaultdict
+from concurrent.futures import as_completed
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import requests
 import tldextract
@@ -23,17 +27,16 @@ from androguard.misc import AnalyzeAPK
 from dash import dcc, html
 from tqdm import tqdm
 
-import threading
-
-from .dex_parser import DEXParser
+from .dex_parser import DEXParser, is_code_dex
 from utils.string_presence_utils import DEXParser, extract_apk_dex_files
-
-# variable to track progress
-progress = {
-    'current_task': '',
-    'total_tasks': 0,
-    'completed_tasks': 0
-}
+from utils.worker_pool import get_download_executor, get_worker_pool
+from utils.summary_export import export_summaries
+from utils.apk_features import needs_scoped_features, scoped_apk_features
+from utils.feature_matrix import FeatureCounts, batch_rows, encode_batch
+from utils.results_store import get_results_store
+from utils.sampling import plan_increment, stable_sample
+from utils.version_diff import changes_timeline
+from utils.jobs import CancelCheck, JobCancelled, JobLogHandler, current_job_id, emit_progress, get_job_events, is_cancelled, job_output_dir, register_job_kind
 
 import sqlite3
 import plotly.io as pio
@@ -41,13 +44,20 @@ from dash.exceptions import PreventUpdate
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-#  track of the current process
-current_process = None
+URL_PATTERN = re.compile(r'https?://\S+')
+
+MAX_STRING_LENGTH = 100
+
+
+def truncate_string(s, max_length=100):
+    return s if len(s) <= max_length else s[:max_length] + "..."
 
 
 def initialize_database(db_path):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    # several jobs read the catalogue and write sampling plans at once
+    cursor.execute('PRAGMA journal_mode=WAL')
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS apks (
         sha256 TEXT PRIMARY KEY,
@@ -56,16 +66,53 @@ def initialize_database(db_path):
         vt_scan_date TEXT
     )
     ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sampling_plans (
+        plan_id TEXT NOT NULL,
+        pkg_name TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        vercode TEXT,
+        vt_scan_date TEXT,
+        created TEXT NOT NULL,
+        PRIMARY KEY (plan_id, pkg_name, position)
+    )
+    ''')
     conn.commit()
     conn.close()
 
 
-def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection):
-    global current_process
-    current_process = threading.current_thread()
+def save_sampling_plan(db_path, plan_id, package_name, apks):
+    # one plan per (job, package); replacing it is a single transaction so readers never see half a plan
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            conn.execute('DELETE FROM sampling_plans WHERE plan_id = ? AND pkg_name = ?', (plan_id, package_name))
+            conn.executemany('INSERT INTO sampling_plans (plan_id, pkg_name, position, sha256, vercode, vt_scan_date, created) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             [(plan_id, package_name, position, sha256, vercode, vtscandate, datetime.now().isoformat())
+                              for position, (sha256, vercode, vtscandate) in enumerate(apks)])
+    finally:
+        conn.close()
+
+
+def sampling_plan_id(kind, start_date, end_date, desired_versions):
+    # plan id for pages that don't run as jobs: the same package, range and version count always samples the
+    # same APKs, so concurrent requests for it write identical plans and never clobber another package's
+    return f"{kind}:{start_date}:{end_date}:{desired_versions}"
+
+
+def load_sampling_plan(db_path, plan_id, package_name):
+    conn = sqlite3.connect(db_path, timeout=30)
+    rows = conn.execute('SELECT sha256, vercode, vt_scan_date FROM sampling_plans WHERE plan_id = ? AND pkg_name = ? ORDER BY position',
+                        (plan_id, package_name)).fetchall()
+    conn.close()
+    return [{"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate} for sha256, vercode, vtscandate in rows]
+
 
-    if n_clicks is None:
-        raise PreventUpdate
+def process_apks(job_id, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection, summary_formats=None):
+    # runs on the job runner thread, see utils/jobs.py
+    if not api_key:
+        raise ValueError("An AndroZoo API key is required (jobs queued before a server restart must be resubmitted)")
 
     package_list = [package_list_input.strip()]  # Only accept one package
     
@@ -81,6 +128,9 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
     validate_and_clean_apks(universal_cache_dir, trash_dir)
     ui_logger.logger.info("APK cache validated and cleaned")
 
+    # summaries are only written when asked for, into the job's own directory
+    output_dir = job_output_dir(job_id) if summary_formats else None
+
     results = {}
 
     for package_name in package_list:
@@ -99,19 +149,23 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
                     int(desired_versions),
                     highlight_config,
                     num_cores,
-                    parser_selection
+                    parser_selection,
+                    summary_formats,
+                    output_dir
                 )
 
                 # Check for cancellation after each major step
-                if current_process != threading.current_thread():
+                if should_cancel():
                     ui_logger.logger.info("Process cancelled")
-                    return None
+                    raise JobCancelled(job_id)
 
                 if figs:
                     results.update(figs)
                     ui_logger.logger.info(f"Figures generated for {package_name}")
                 else:
                     ui_logger.logger.warning(f"No figures generated for package {package_name}")
+            except JobCancelled:
+                raise
             except Exception as e:
                 ui_logger.logger.error(f"Error processing package {package_name}: {str(e)}")
 
@@ -189,78 +243,107 @@ def calculate_sampling_frequency(total_versions, desired_versions):
 
 
 def download_apk(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir, max_retries=20,
-                  retry_cycles=4):
+                  retry_cycles=4, cancel_check=None):
     apk_path = os.path.join(universal_cache_dir, f"{sha256}.apk")
     if check_apk_in_cache(sha256, universal_cache_dir):
         print(f"APK {sha256} found in cache.")
         return apk_path
 
     os.makedirs(universal_cache_dir, exist_ok=True)
+    # download to a .part file so a cancelled or broken transfer never lands in the cache
+    part_path = apk_path + '.part'
     url = f"https://androzoo.uni.lu/api/download?apikey={apikey}&sha256={sha256}"
-    for cycle in range(retry_cycles):
-        attempts = 0
-        while attempts < max_retries:
-            response = requests.get(url, stream=True)
-            if response.status_code == 200:
-                with open(apk_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if chunk:
-                            f.write(chunk)
-                if os.path.getsize(apk_path) > 1000:
-                    return apk_path
+    try:
+        for cycle in range(retry_cycles):
+            attempts = 0
+            while attempts < max_retries:
+                if cancel_check:
+                    cancel_check.raise_if_cancelled()
+                response = requests.get(url, stream=True)
+                if response.status_code == 200:
+                    with open(part_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=1024):
+                            if cancel_check:
+                                cancel_check.raise_if_cancelled()
+                            if chunk:
+                                f.write(chunk)
+                    if os.path.getsize(part_path) > 1000:
+                        os.replace(part_path, apk_path)
+                        return apk_path
+                    else:
+                        attempts += 1
                 else:
                     attempts += 1
-            else:
-                attempts += 1
-            if attempts >= max_retries:
-                time.sleep(200)
+                if attempts >= max_retries:
+                    # back off, but keep listening for cancellation
+                    for _ in range(200):
+                        if cancel_check:
+                            cancel_check.raise_if_cancelled()
+                        time.sleep(1)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
     return None
 
 
-def download_apk_worker(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir):
+def download_apk_worker(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir, cancel_check=None):
     try:
-        return download_apk(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir)
+        return download_apk(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir, cancel_check=cancel_check)
+    except JobCancelled:
+        print(f"Download of APK {sha256} cancelled")
+        return None
     except Exception as e:
         print(f"Error in downloading APK with SHA256: {sha256}. Error: {str(e)}")
         return None
 
 
-def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions):
-    pool = mp.Pool(min(mp.cpu_count() - 1, mp.cpu_count()))
+def sample_package_apks(package_name, db_path, start_date, end_date, desired_versions):
+    # the latest APK plus date-bucketed earlier ones; see utils/sampling.py for why the buckets are anchored
+    sha256_vercode_vtscandate_list = find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date)
+    return stable_sample(sha256_vercode_vtscandate_list, desired_versions)
+
+
+def run_downloads(download_tasks):
+    # downloads share one thread pool across all requests
+    executor = get_download_executor()
+    futures = [executor.submit(download_apk_worker, *task) for task in download_tasks]
+    emit_progress('download', 0, len(futures))
+    for done, _ in enumerate(as_completed(futures), 1):
+        emit_progress('download', done, len(futures))
+    return [future.result() for future in futures]
+
+
+def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, cancel_check=None, parser_selection=None, plan_id=None):
     download_tasks = []
-    apk_log = {}
+    available = []
     for package_name in package_names:
-        sha256_vercode_vtscandate_list = find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date)
-        if not sha256_vercode_vtscandate_list:
+        sampled_apps = sample_package_apks(package_name, db_path, start_date, end_date, desired_versions)
+        if not sampled_apps:
             continue
-        latest_app = sha256_vercode_vtscandate_list[-1]
-        download_tasks.append((*latest_app, package_name, apikey, universal_cache_dir))
-        sampling_frequency = calculate_sampling_frequency(len(sha256_vercode_vtscandate_list) - 1, desired_versions - 1)
-        sampled_apps = sha256_vercode_vtscandate_list[:-1][::sampling_frequency]
-        for sha256, vercode, vtscandate in sampled_apps:
-            download_tasks.append((sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir))
+        # versions analysed by an earlier run are merged from the results store, only new ones are downloaded
+        analysed = get_results_store().completed('connectivity', parser_selection, [apk[0] for apk in sampled_apps]) if parser_selection else set()
+        new_apps = plan_increment(sampled_apps, analysed)
+        ui_logger.logger.info(f"{package_name}: {len(sampled_apps)} versions sampled, {len(sampled_apps) - len(new_apps)} already analysed")
+        if len(sampled_apps) < desired_versions:
+            ui_logger.logger.warning(f"{package_name}: only {len(sampled_apps)} of the {desired_versions} requested versions exist in the selected date range")
+        available.extend(apk[0] for apk in sampled_apps if apk[0] in analysed)
+        for sha256, vercode, vtscandate in new_apps:
+            download_tasks.append((sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir, cancel_check))
 
-        apk_log[package_name] = [
-            {"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate}
-            for sha256, vercode, vtscandate in [latest_app] + sampled_apps
-        ]
+        if plan_id:
+            save_sampling_plan(db_path, plan_id, package_name, sampled_apps)
 
-    results = pool.starmap(download_apk_worker, download_tasks)
-    pool.close()
-    pool.join()
+    results = run_downloads(download_tasks)
 
-    # Save the APK log as JSON
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'w') as f:
-        json.dump(apk_log, f, indent=2)
-
-    return [result for result in results if result is not None]
+    # sha256s of the planned APKs that are ready: already analysed, or now in the cache
+    return available + [task[0] for task, result in zip(download_tasks, results) if result is not None]
 
 
 def extract_apk_dex_files(apk_path):
     dex_files = []
     with zipfile.ZipFile(apk_path, 'r') as z:
         for filename in z.namelist():
-            if filename.endswith('.dex'):
+            if is_code_dex(filename):
                 dex_data = z.read(filename)
                 dex_files.append(dex_data)
     return dex_files
@@ -270,7 +353,95 @@ def sanitize_string(input_string):
     return input_string.replace('\u0000', '')
 
 
-def extract_apk_features(file_path, data_type, use_cache_json, parser_selection):
+def dex_signature(dex_data):
+    # header signature (SHA-1 of everything after it) plus checksum and size, or None if this isn't a DEX
+    if len(dex_data) < 112 or not dex_data.startswith(b'dex\n'):
+        return None
+    signature = dex_data[12:32]
+    if not any(signature):
+        # unsigned DEX (hand-built or stripped header), hash what the signature would have covered
+        signature = hashlib.sha1(dex_data[32:]).digest()
+    return f"{signature.hex()}-{struct.unpack('<I', dex_data[8:12])[0]:08x}-{len(dex_data)}"
+
+
+def dex_strings(dex_data, parser_selection):
+    if parser_selection == "digisilk":
+        parser = DEXParser(dex_data)
+        parser.parse()
+        return parser.strings
+    return dvm.DalvikVMFormat(dex_data).get_strings()
+
+
+def extract_dex_features(dex_data, data_type, parser_selection):
+    data = []
+    for string in dex_strings(dex_data, parser_selection):
+        sanitized_string = sanitize_string(string)
+        if 'urls' in data_type:
+            urls = URL_PATTERN.findall(sanitized_string)
+            data.extend(urls)
+        elif 'subdomains' in data_type or 'domains' in data_type:
+            urls = URL_PATTERN.findall(sanitized_string)
+            for url in urls:
+                parsed_url = tldextract.extract(url)
+                subdomain_full = '.'.join(
+                    [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]).strip('.')
+                if "%s" not in subdomain_full:
+                    if "." in subdomain_full:
+                        if 'subdomains' in data_type:
+                            data.append(subdomain_full)
+                        if 'domains' in data_type:
+                            domain = '.'.join([parsed_url.domain, parsed_url.suffix]).strip('.')
+                            if "." in domain:
+                                data.append(domain)
+    return data
+
+
+def cached_dex_features(dex_data, data_type, parser_selection):
+    # byte-identical DEX files (e.g. a bundled library's classes2.dex) recur across versions,
+    # so results are cached by the DEX header's SHA-1 signature and reused instead of reparsed
+    store = get_results_store()
+    signature = dex_signature(dex_data)
+    data = store.get_dex_result(signature, parser_selection, data_type) if signature else None
+    if data is not None:
+        return data, True
+    data = extract_dex_features(dex_data, data_type, parser_selection)
+    if signature:
+        store.save_dex_result(signature, parser_selection, data_type, data)
+    return data, False
+
+
+def dex_entry_names(apk_path):
+    with zipfile.ZipFile(apk_path, 'r') as z:
+        return [name for name in z.namelist() if is_code_dex(name)]
+
+
+def extract_dex_entry(apk_path, dex_name, data_type, parser_selection):
+    # worker task: one DEX of one APK, read from the archive in the worker so only the path is pickled
+    with zipfile.ZipFile(apk_path, 'r') as z:
+        dex_data = z.read(dex_name)
+    return cached_dex_features(dex_data, data_type, parser_selection)[0]
+
+
+def extract_apk_features_parallel(file_path, data_type, parser_selection, max_parallel=None):
+    # fans a single APK out per DEX over the shared pool, for pages that handle one APK at a time.
+    # pool workers are daemonic and can't start their own pool, so inside one this stays serial
+    if mp.current_process().daemon:
+        return extract_apk_features(file_path, data_type, False, parser_selection)
+    try:
+        dex_names = dex_entry_names(file_path)
+    except (zipfile.BadZipFile, OSError) as e:
+        logging.error(f"Error reading {file_path}: {str(e)}")
+        return []
+    if len(dex_names) < 2:
+        return extract_apk_features(file_path, data_type, False, parser_selection)
+    results = get_worker_pool().starmap(extract_dex_entry, [
+        (file_path, dex_name, data_type, parser_selection) for dex_name in dex_names], max_parallel=max_parallel)
+    logging.info(f"Extracted {len(dex_names)} DEX files of {file_path} in parallel")
+    # starmap keeps classes.dex, classes2.dex, ... order
+    return [item for result in results for item in result]
+
+
+def extract_apk_features(file_path, data_type, use_cache_json, parser_selection, cancel_check=None):
     json_file_path = f"{file_path}.{data_type}.json"
     if os.path.exists(json_file_path) and use_cache_json:
         logging.info(f"Using cached data for {file_path}")
@@ -280,85 +451,28 @@ def extract_apk_features(file_path, data_type, use_cache_json, parser_selection)
     else:
         data = []
         try:
-            if parser_selection == "digisilk":
-                logging.info(f"Using DigiSilk custom parser for {file_path}")
+            if parser_selection in ("digisilk", "androguard"):
+                logging.info(f"Using {parser_selection} parser for {file_path}")
+                reused = 0
                 dex_files = extract_apk_dex_files(file_path)
                 for dex_data in dex_files:
-                    parser = DEXParser(dex_data)
-                    parser.parse()
-                    for string in parser.strings:
-                        sanitized_string = sanitize_string(string)
-                        if 'urls' in data_type:
-                            urls = re.findall(r'https?://\S+', sanitized_string)
-                            data.extend(urls)
-                        elif 'subdomains' in data_type or 'domains' in data_type:
-                            urls = re.findall(r'https?://\S+', sanitized_string)
-                            for url in urls:
-                                parsed_url = tldextract.extract(url)
-                                subdomain_full = '.'.join(
-                                    [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]).strip('.')
-                                if "%s" not in subdomain_full:
-                                    if "." in subdomain_full:
-                                        if 'subdomains' in data_type:
-                                            data.append(subdomain_full)
-                                        if 'domains' in data_type:
-                                            domain = '.'.join([parsed_url.domain, parsed_url.suffix]).strip('.')
-                                            if "." in domain:
-                                                data.append(domain)
-            else:  # Androguard parser
-                logging.info(f"Using Androguard parser for {file_path}")
-                a, d, dx = AnalyzeAPK(file_path)
-                logging.info(f"Androguard analysis complete for {file_path}")
-                logging.info(f"APK Package name: {a.get_package()}")
-                logging.info(f"APK Version name: {a.get_androidversion_name()}")
-                logging.info(f"APK Version code: {a.get_androidversion_code()}")
-                
-                for dex in a.get_all_dex():
-                    dv = dvm.DalvikVMFormat(dex)
-                    for string in dv.get_strings():
-                        sanitized_string = sanitize_string(string)
-                        if 'urls' in data_type:
-                            urls = re.findall(r'https?://\S+', sanitized_string)
-                            data.extend(urls)
-                        elif 'subdomains' in data_type or 'domains' in data_type:
-                            urls = re.findall(r'https?://\S+', sanitized_string)
-                            for url in urls:
-                                parsed_url = tldextract.extract(url)
-                                subdomain_full = '.'.join([parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]).strip('.')
-                                if "%s" not in subdomain_full:
-                                    if "." in subdomain_full:
-                                        if 'subdomains' in data_type:
-                                            data.append(subdomain_full)
-                                        if 'domains' in data_type:
-                                            domain = '.'.join([parsed_url.domain, parsed_url.suffix]).strip('.')
-                                            if "." in domain:
-                                                data.append(domain)
-
-            if any(dt in data_type for dt in ['permissions', 'services', 'activities', 'providers', 'receivers', 'libraries', 'java_classes']):
+                    if cancel_check:
+                        cancel_check.raise_if_cancelled()
+                    dex_data_list, hit = cached_dex_features(dex_data, data_type, parser_selection)
+                    reused += hit
+                    data.extend(dex_data_list)
+                if reused:
+                    logging.info(f"Reused cached results for {reused} of {len(dex_files)} DEX files in {file_path}")
+
+            if needs_scoped_features(data_type):
                 logging.info(f"Extracting additional APK features for {file_path}")
-                a, _, _ = AnalyzeAPK(file_path)
-
-                if 'permissions' in data_type:
-                    data.extend(a.get_permissions())
-                if 'services' in data_type:
-                    data.extend(a.get_services())
-                if 'activities' in data_type:
-                    data.extend(a.get_activities())
-                if 'providers' in data_type:
-                    data.extend(a.get_providers())
-                if 'receivers' in data_type:
-                    data.extend(a.get_receivers())
-                if 'libraries' in data_type:
-                    data.extend(a.get_libraries())
-                if 'java_classes' in data_type:
-                    for dex in a.get_all_dex():
-                        dv = dvm.DalvikVMFormat(dex)
-                        for clazz in dv.get_classes():
-                            class_name = clazz.get_name()[1:-1].replace('/', '.')
-                            data.append(class_name)
+                data.extend(scoped_apk_features(file_path, data_type))
 
             logging.info(f"Extracted {len(data)} items of type {data_type} from {file_path}")
 
+        except JobCancelled:
+            # don't cache a partial extraction
+            raise
         except Exception as e:
             logging.error(f'Error while extracting {data_type} from {file_path}: {str(e)}')
 
@@ -367,90 +481,114 @@ def extract_apk_features(file_path, data_type, use_cache_json, parser_selection)
         return data
 
 
-def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection):
+def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection, summary_formats=None, output_dir=None):
     initialize_database(db_path)
     universal_cache_dir = os.path.join(base_directory, "apk_cache")
     os.makedirs(universal_cache_dir, exist_ok=True)
 
-    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions)
+    cancel_check = CancelCheck(current_job_id())
+    plan_id = current_job_id() or uuid.uuid4().hex
+    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, cancel_check, parser_selection, plan_id)
 
     if should_cancel():
         return None
 
     if downloaded_apks:
-        all_data = process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection)
+        feature_counts = process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection, cancel_check, db_path, plan_id)
 
         if should_cancel():
             return None
 
-        figs = {}
-        for data_type in ['urls', 'subdomains', 'domains']:
-            # Convert highlight_config to the format for plot_data
-            formatted_highlight_config = {item['regex']: item['color'] for item in highlight_config}
-            fig = plot_data(all_data, package_name, formatted_highlight_config, data_type)
-            figs[data_type] = fig
-
-            if should_cancel():
-                return None
-
-        return figs
+        return build_figures(feature_counts, package_name, highlight_config, summary_formats, output_dir, params=parser_selection)
     else:
         return None
 
 
-def process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection):
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'r') as f:
-        apk_log = json.load(f)
+def build_figures(feature_counts, package_name, highlight_config, summary_formats=None, output_dir=None, params=None, changes=True):
+    figs = {}
+    for data_type in ['urls', 'subdomains', 'domains']:
+        # Convert highlight_config to the format for plot_data
+        formatted_highlight_config = {item['regex']: item['color'] for item in highlight_config}
+        fig = plot_data(feature_counts, package_name, formatted_highlight_config, data_type)
+        if fig is not None:
+            if summary_formats and output_dir:
+                written = export_summaries(fig, package_name, data_type, formatted_highlight_config, output_dir, summary_formats)
+                fig['summary_files'] = written
+                ui_logger.logger.info(f"Wrote {len(written)} {data_type} summary files to {output_dir}")
+            if changes:
+                fig['changes'] = changes_timeline(fig['count_matrix'], fig['versions'], fig['version_dates'], package_name, data_type, params,
+                                                  feature_counts.version_sources)
+            # the matrices are only needed for the export and the diff
+            for key in ('count_matrix', 'date_matrix', 'versions', 'version_dates'):
+                fig.pop(key, None)
+        figs[data_type] = fig
+
+        if should_cancel():
+            return None
+
+    return figs
+
 
-    relevant_apks = apk_log.get(package_name, [])
+def process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection, cancel_check=None, db_path='androzoo.db', plan_id=None):
+    relevant_apks = load_sampling_plan(db_path, plan_id, package_name)
 
     if not relevant_apks:
         print(f"No relevant APKs found for {package_name}")
         return []
 
-    pool = mp.Pool(num_cores, maxtasksperchild=4)
-    results = pool.starmap(process_file, [
-        (apk['sha256'], universal_cache_dir, apk['vercode'], apk['vtscandate'], parser_selection) for apk in relevant_apks])
-    pool.close()
-    pool.join()
+    feature_counts = FeatureCounts()
+    # APKs already analysed (by an earlier run or the command line tool) are read from the results store
+    store = get_results_store()
+    tasks = []
+    for apk in relevant_apks:
+        stored = store.get_payload('connectivity', apk['sha256'], parser_selection)
+        if stored is not None:
+            feature_counts.add(stored, source=apk['sha256'])
+        else:
+            tasks.append((apk['sha256'], universal_cache_dir, apk['vercode'], apk['vtscandate'], parser_selection, cancel_check))
 
-    all_data = []
-    for result in results:
+    # extraction runs on the shared, pre-warmed worker pool; num_cores caps this request's share of it
+    emit_progress('parse', 0, len(tasks))
+    # batches are merged as they arrive, so only one per-APK result is held at a time
+    for done, (index, result) in enumerate(get_worker_pool().imap_unordered(process_file, tasks, max_parallel=num_cores), 1):
+        sha256, _, vercode, vtscandate = tasks[index][:4]
         if result is not None:
-            all_data.extend(result)
+            store.save_result('connectivity', sha256, parser_selection, package_name, vercode, vtscandate, result, batch_rows(result))
+        feature_counts.add(result, source=sha256)
+        emit_progress('parse', done, len(tasks))
 
-    if not all_data:
+    if not feature_counts:
         print(f"No data extracted from APKs for {package_name}")
 
-    del results
-    gc.collect()
-    return all_data
+    return feature_counts
 
 
-def process_file(sha256, folder_path, vercode, vtscandate, parser_selection):
+def process_file(sha256, folder_path, vercode, vtscandate, parser_selection, cancel_check=None):
     file_path = os.path.join(folder_path, f"{sha256}.apk")
     if not os.path.exists(file_path):
         logging.warning(f"Warning: APK file not found for SHA256 {sha256}")
         return None
 
     try:
+        if cancel_check:
+            cancel_check.raise_if_cancelled()
         logging.info(f"Processing file {sha256}.apk with {parser_selection} parser")
-        urls = extract_apk_features(file_path, 'urls', True, parser_selection)
-        
-        processed_data = []
+        urls = extract_apk_features(file_path, 'urls', True, parser_selection, cancel_check)
+
+        columns = {'urls': [], 'subdomains': [], 'domains': []}
         for url in urls:
             parsed_url = tldextract.extract(url)
             subdomain = '.'.join(filter(None, [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]))
             domain = '.'.join(filter(None, [parsed_url.domain, parsed_url.suffix]))
-            processed_data.append({
-                'version': vercode,
-                'vtscandate': vtscandate,
-                'urls': url,
-                'subdomains': subdomain,
-                'domains': domain
-            })
-        logging.info(f"Processed {len(processed_data)} items for {sha256}.apk")
-        return processed_data
+            columns['urls'].append(truncate_string(url, MAX_STRING_LENGTH))
+            columns['subdomains'].append(truncate_string(subdomain, MAX_STRING_LENGTH))
+            columns['domains'].append(truncate_string(domain, MAX_STRING_LENGTH))
+        logging.info(f"Processed {len(urls)} items for {sha256}.apk")
+        # counts per distinct feature rather than one record per occurrence, see utils/feature_matrix.py
+        return encode_batch(vercode, vtscandate, columns)
+    except JobCancelled:
+        logging.info(f"Processing of {sha256}.apk cancelled")
+        return None
     except Exception as e:
         logging.error(f"Error processing file {sha256}.apk: {str(e)}")
         return None
@@ -503,68 +641,46 @@ from datetime import datetime
 import base64
 import gc
 
-def truncate_string(s, max_length=100):
-    return s if len(s) <= max_length else s[:max_length] + "..."
-
-def plot_data(all_data, package_name, highlight_config, data_type):
+def plot_data(feature_counts, package_name, highlight_config, data_type):
     print(f"Preparing data for plotting {data_type}...")
-    
-    MAX_STRING_LENGTH = 100
 
-    if not all_data:
+    if not feature_counts:
         print(f"No data available for {package_name}")
         return None
 
-    df = pd.DataFrame(all_data)
-    
-    if data_type not in df.columns:
-        print(f"Error: '{data_type}' not found in the data. Available columns: {df.columns.tolist()}")
-        return None
-
-    df = df[['version', 'vtscandate', data_type]].rename(columns={data_type: 'Data'})
-    df['Data'] = df['Data'].apply(lambda x: truncate_string(x, MAX_STRING_LENGTH))
-    df['Count'] = 1
-    df = df.groupby(['version', 'vtscandate', 'Data']).sum().reset_index()
-
-    if df.empty:
+    if data_type not in feature_counts.data_types():
         print(f"No data to plot for {data_type}.")
         return None
 
-    # convert date to datetime and format it as a string
-    df['vtscandate'] = pd.to_datetime(df['vtscandate']).dt.strftime('%Y-%m-%d')
-    df['version'] = df['version'].astype(str)
+    matrix, features, versions = feature_counts.matrix(data_type)
 
-    # pivot the count and date data
-    df_count_pivot = df.pivot_table(index='Data', columns='version', values='Count', aggfunc='sum', fill_value=0)
-    df_date_pivot = df.pivot_table(index='Data', columns='version', values='vtscandate', aggfunc='first')
+    sorted_versions = sorted(versions,
+                             key=lambda x: [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', x)])
+    # drop versions that have none of this data type
+    present = np.asarray(matrix.getnnz(axis=0)).ravel() > 0
+    sorted_versions = [version for version in sorted_versions if present[versions.index(version)]]
+    matrix = matrix[:, [versions.index(version) for version in sorted_versions]]
 
-    sorted_versions = sorted(df_count_pivot.columns,
-                             key=lambda s: [int(u) if u.isdigit() else u for u in re.split('(\d+)', s)])
-    df_count_pivot = df_count_pivot[sorted_versions]
-    df_date_pivot = df_date_pivot[sorted_versions]
+    # dense feature x version view, the same shape the pivot tables had
+    df_count_pivot = pd.DataFrame(matrix.toarray(), index=features, columns=sorted_versions)
+    presence = df_count_pivot.values > 0
 
-    # create a new list for x-axis labels combining version and date
-    sorted_versions_with_dates = []
-    for version in sorted_versions:
-        #find the earliest date for this version
-        earliest_date = df[df['version'] == version]['vtscandate'].min()
-        label = f"{version} ({earliest_date})"
-        sorted_versions_with_dates.append(label)
+    # earliest date for each version, used for the axis labels and exported summaries
+    version_dates = {version: feature_counts.version_dates.get(version) for version in sorted_versions}
+    df_date_pivot = pd.DataFrame(np.where(presence, np.array([version_dates[version] for version in sorted_versions], dtype=object), None),
+                                 index=features, columns=sorted_versions)
 
-    sorted_versions = sorted(df['version'].unique(),
-                             key=lambda x: [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', x)])
+    # create a new list for x-axis labels combining version and date
+    sorted_versions_with_dates = [f"{version} ({version_dates[version]})" for version in sorted_versions]
 
     #evolutionary sorting logic
     # 1: count appearances of each domain across all versions
-    data_appearances = {}
-    for version in sorted_versions:
-        for item in df[df['version'] == version]['Data'].unique():
-            data_appearances[item] = data_appearances.get(item, 0) + 1
+    data_appearances = dict(zip(features, presence.sum(axis=1)))
 
     # 2: sort domains within each version based on appearances and re-addition
     version_sorted_data = {}
-    for version in sorted_versions:
-        current_version_data = df[df['version'] == version]['Data'].unique().tolist()
+    for j, version in enumerate(sorted_versions):
+        current_version_data = [features[i] for i in presence[:, j].nonzero()[0]]
         # sort domains within the current version based on their total appearances (descending)
         sorted_data = sorted(current_version_data, key=lambda x: (-data_appearances[x], x))
         version_sorted_data[version] = sorted_data
@@ -599,49 +715,6 @@ def plot_data(all_data, package_name, highlight_config, data_type):
             hover_text_row.append(hover_text_data)
         hover_text.append(hover_text_row)
 
-    #prepare text summary
-    text_summary = "Feature Analysis Summary:\n"
-    for item in df_count_pivot.index:
-        highlighted = False
-        highlight_details = ""
-        # check for regex matches and prepare highlighting
-        for pattern, color in highlight_config_items:
-            if re.search(pattern, item, re.IGNORECASE):
-                highlighted = True
-                highlight_details = f"Highlight: {pattern} (Color: {color})\n"
-
-        text_summary += f"\nFeature: {item}\n"
-        if highlighted:
-            text_summary += f"  {highlight_details}"
-
-        for version in sorted_versions:
-            count = df_count_pivot.at[item, version]
-            date = df_date_pivot.at[item, version] if df_date_pivot.at[item, version] is not None else "nan"
-            text_summary += f"  Version {version} ({date}): Count = {count}\n"
-
-    # save summary to a text file
-    with open(f"{package_name}_data_summary.txt", 'w', encoding='utf-8') as file:
-        file.write(text_summary)
-
-    text_summary = "Feature Analysis Summary by Version:\n"
-    # Iterate through each version
-    for version in sorted_versions:
-        date = df[df['version'] == version]['vtscandate'].min()  # Get the date for the version
-        text_summary += f"\nVersion {version} ({date if date != 'nan' else 'No Date Available'}):\n"
-        # Check each subdomain for the current version
-        for item in df_count_pivot.index:
-            count = df_count_pivot.at[item, version]
-            if count > 0:  # Only list subdomains that have a count greater than 0
-                text_summary += f" {item}   Count: {count}\n"
-                # Check for regex matches and add them
-                for pattern, color in highlight_config_items:
-                    if re.search(pattern, item, re.IGNORECASE):
-                        text_summary += f" MATCH: {pattern} (Color: {color})\n"
-
-    # Save the condensed summary to a text file
-    with open(f"{package_name}_condensed_summary.txt", 'w', encoding='utf-8') as file:
-        file.write(text_summary)
-
     # Create a list of dictionaries containing feature info
     feature_info = []
     for item in sorted_data:
@@ -711,7 +784,11 @@ def plot_data(all_data, package_name, highlight_config, data_type):
             'figure': fig,
             'feature_info': feature_info,
             'too_large_to_display': True,
-            'feature_count': len(sorted_data)
+            'feature_count': len(sorted_data),
+            'count_matrix': df_count_pivot,
+            'date_matrix': df_date_pivot,
+            'versions': sorted_versions,
+            'version_dates': version_dates
         }
     else:
         # Create heatmap
@@ -763,7 +840,11 @@ def plot_data(all_data, package_name, highlight_config, data_type):
             'figure': fig,
             'feature_info': feature_info,
             'too_large_to_display': False,
-            'feature_count': len(sorted_data)
+            'feature_count': len(sorted_data),
+            'count_matrix': df_count_pivot,
+            'date_matrix': df_date_pivot,
+            'versions': sorted_versions,
+            'version_dates': version_dates
         }
 
 def create_pie_charts(version_vtscandate_subdomains_counts):
@@ -844,12 +925,11 @@ def plot_locations(locations):
     return fig
 
 import logging
-from io import StringIO
 
 class UILogger:
+    # messages logged while a job runs are kept with that job, so each user only sees their own progress
     def __init__(self):
-        self.log_capture_string = StringIO()
-        self.ch = logging.StreamHandler(self.log_capture_string)
+        self.ch = JobLogHandler()
         self.ch.setLevel(logging.INFO)
         self.formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         self.ch.setFormatter(self.formatter)
@@ -858,13 +938,16 @@ class UILogger:
         self.logger.setLevel(logging.INFO)
         self.logger.addHandler(self.ch)
 
-    def get_logs(self):
-        return self.log_capture_string.getvalue()
+    def get_events(self, job_id, after_seq=0):
+        return get_job_events(job_id, after_seq)
 
 ui_logger = UILogger()
 
 def should_cancel():
-    return current_process != threading.current_thread()
+    return is_cancelled(current_job_id())
+
+
+register_job_kind('historical_connectivity', process_apks)
 
 
 
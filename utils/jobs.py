@@ -0,0 +1,341 @@
+# utils/jobs.py
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+
+from utils.summary_export import get_output_dir
+
+base_dir = Path(__file__).parent.parent.absolute()
+JOBS_DB_PATH = os.path.join(base_dir, "jobs.db")
+
+# params that are never written to the jobs database
+SECRET_PARAMS = {'api_key'}
+
+# how many analyses may run at the same time, across all users
+MAX_CONCURRENT_JOBS = int(os.environ.get('JANUS_MAX_CONCURRENT_JOBS', 2))
+
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled', 'interrupted')
+
+# job kind -> function(job_id, **params)
+job_kinds = {}
+
+_job_secrets = {}
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+_RESULT_CACHE_SIZE = 8
+
+# events per job are kept in a bounded ring buffer, and only for the most recent jobs
+JOB_EVENTS_PER_JOB = int(os.environ.get('JANUS_JOB_EVENTS_PER_JOB', 1000))
+_job_events = OrderedDict()
+_job_events_lock = threading.Lock()
+_JOB_EVENTS_JOBS_KEPT = 50
+
+_runner_lock = threading.Lock()
+_runner_threads = []
+_job_available = threading.Condition()
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def connect(db_path=JOBS_DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def initialize_jobs_db(db_path=JOBS_DB_PATH):
+    conn = connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        session_id TEXT,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created TEXT NOT NULL,
+        started TEXT,
+        finished TEXT,
+        error TEXT,
+        result_path TEXT
+    )
+    ''')
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(jobs)')]
+    if 'session_id' not in columns:
+        conn.execute('ALTER TABLE jobs ADD COLUMN session_id TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session_id, kind, status)')
+    conn.commit()
+    conn.close()
+
+
+def register_job_kind(kind, func):
+    job_kinds[kind] = func
+
+
+def current_job_id():
+    return getattr(_local, 'job_id', None)
+
+
+def submit_job(kind, params, session_id=None):
+    ensure_job_runner()
+    job_id = uuid.uuid4().hex
+    stored_params = {k: v for k, v in params.items() if k not in SECRET_PARAMS}
+    secrets = {k: v for k, v in params.items() if k in SECRET_PARAMS}
+    if secrets:
+        _job_secrets[job_id] = secrets
+
+    conn = connect()
+    with conn:
+        conn.execute('INSERT INTO jobs (job_id, kind, session_id, params, status, created) VALUES (?, ?, ?, ?, ?, ?)',
+                     (job_id, kind, session_id, json.dumps(stored_params), 'queued', datetime.now().isoformat()))
+    conn.close()
+    with _job_available:
+        _job_available.notify()
+    return job_id
+
+
+def cancel_job(job_id):
+    if not job_id:
+        return
+    conn = connect()
+    with conn:
+        # a queued job never starts, a running one is asked to stop at its next check
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE job_id = ? AND status = 'queued'",
+                     (datetime.now().isoformat(), job_id))
+        conn.execute("UPDATE jobs SET status = 'cancelling' WHERE job_id = ? AND status = 'running'", (job_id,))
+    conn.close()
+    _job_secrets.pop(job_id, None)
+
+
+def cancel_session_jobs(session_id, kind):
+    # a new submission replaces the same session's earlier run of that analysis, other sessions are untouched
+    if not session_id:
+        return []
+    conn = connect()
+    rows = conn.execute(f"SELECT job_id FROM jobs WHERE session_id = ? AND kind = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+                        (session_id, kind, *ACTIVE_STATUSES)).fetchall()
+    conn.close()
+    for row in rows:
+        cancel_job(row['job_id'])
+    return [row['job_id'] for row in rows]
+
+
+def append_job_event(job_id, event_type, **fields):
+    # every event gets a per-job sequence number so pollers can ask for only what they haven't seen
+    with _job_events_lock:
+        if job_id not in _job_events:
+            _job_events[job_id] = {'seq': 0, 'events': deque(maxlen=JOB_EVENTS_PER_JOB)}
+            while len(_job_events) > _JOB_EVENTS_JOBS_KEPT:
+                _job_events.popitem(last=False)
+        entry = _job_events[job_id]
+        entry['seq'] += 1
+        entry['events'].append(dict(fields, seq=entry['seq'], type=event_type))
+        return entry['seq']
+
+
+def append_job_log(job_id, line):
+    return append_job_event(job_id, 'log', message=line)
+
+
+def emit_progress(stage, done, total, job_id=None):
+    # typed progress, e.g. stage='download' done=3 total=10
+    job_id = job_id or current_job_id()
+    if job_id is None:
+        return None
+    return append_job_event(job_id, 'progress', stage=stage, done=done, total=total)
+
+
+def get_job_events(job_id, after_seq=0):
+    # returns (events newer than after_seq, latest seq, whether older events were dropped from the buffer)
+    with _job_events_lock:
+        entry = _job_events.get(job_id)
+        if entry is None:
+            return [], 0, False
+        events = entry['events']
+        truncated = bool(events) and events[0]['seq'] > after_seq + 1
+        if entry['seq'] <= after_seq:
+            return [], entry['seq'], False
+        return [event for event in events if event['seq'] > after_seq], entry['seq'], truncated
+
+
+class JobLogHandler(logging.Handler):
+    # routes records to the log of the job running on the current thread
+    def emit(self, record):
+        job_id = current_job_id()
+        if job_id is None:
+            return
+        try:
+            append_job_log(job_id, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def get_job(job_id, db_path=JOBS_DB_PATH):
+    if not job_id:
+        return None
+    conn = connect(db_path)
+    row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    return job
+
+
+def is_cancelled(job_id, db_path=JOBS_DB_PATH):
+    if not job_id:
+        return False
+    conn = sqlite3.connect(db_path, timeout=30)
+    row = conn.execute('SELECT status FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+    conn.close()
+    return row is not None and row[0] in ('cancelling', 'cancelled')
+
+
+class CancelCheck:
+    # picklable cancellation flag for pool workers, reads the job row at most once per interval
+    def __init__(self, job_id, interval=1.0, db_path=JOBS_DB_PATH):
+        self.job_id = job_id
+        self.interval = interval
+        self.db_path = db_path
+        self._last_check = 0.0
+        self._cancelled = False
+
+    def __call__(self):
+        if self.job_id is None:
+            return False
+        if self._cancelled:
+            return True
+        now = time.monotonic()
+        if now - self._last_check >= self.interval:
+            self._last_check = now
+            try:
+                self._cancelled = is_cancelled(self.job_id, self.db_path)
+            except sqlite3.Error as e:
+                logging.warning(f"Could not read cancellation state for job {self.job_id}: {str(e)}")
+        return self._cancelled
+
+    def raise_if_cancelled(self):
+        if self():
+            raise JobCancelled(self.job_id)
+
+
+def job_output_dir(job_id):
+    return get_output_dir(job_id)
+
+
+def get_job_result(job_id):
+    with _result_cache_lock:
+        if job_id in _result_cache:
+            _result_cache.move_to_end(job_id)
+            return _result_cache[job_id]
+
+    job = get_job(job_id)
+    if job is None or job['status'] != 'completed' or not job['result_path']:
+        return None
+    if not os.path.exists(job['result_path']):
+        return None
+    with open(job['result_path'], 'rb') as f:
+        result = pickle.load(f)
+
+    with _result_cache_lock:
+        _result_cache[job_id] = result
+        while len(_result_cache) > _RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return result
+
+
+def _set_status(job_id, status, **fields):
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    conn = connect()
+    with conn:
+        conn.execute(f"UPDATE jobs SET status = ?{', ' + columns if columns else ''} WHERE job_id = ?",
+                     (status, *fields.values(), job_id))
+    conn.close()
+
+
+def _claim_next_job():
+    conn = connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE job_id = ?",
+                     (datetime.now().isoformat(), row['job_id']))
+        conn.commit()
+        return row['job_id']
+    finally:
+        conn.close()
+
+
+def _run_job(job_id):
+    job = get_job(job_id)
+    func = job_kinds.get(job['kind'])
+    if func is None:
+        _set_status(job_id, 'failed', finished=datetime.now().isoformat(), error=f"Unknown job kind {job['kind']}")
+        return
+
+    params = dict(job['params'])
+    params.update(_job_secrets.pop(job_id, {}))
+
+    _local.job_id = job_id
+    try:
+        result = func(job_id, **params)
+        if is_cancelled(job_id):
+            raise JobCancelled(job_id)
+        result_path = os.path.join(job_output_dir(job_id), 'result.pkl')
+        with open(result_path, 'wb') as f:
+            pickle.dump(result, f)
+        _set_status(job_id, 'completed', finished=datetime.now().isoformat(), result_path=result_path)
+    except JobCancelled:
+        logging.info(f"Job {job_id} cancelled")
+        _set_status(job_id, 'cancelled', finished=datetime.now().isoformat())
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {traceback.format_exc()}")
+        _set_status(job_id, 'failed', finished=datetime.now().isoformat(), error=str(e))
+    finally:
+        _local.job_id = None
+
+
+def _runner_loop():
+    while True:
+        job_id = _claim_next_job()
+        if job_id is None:
+            with _job_available:
+                _job_available.wait(timeout=5)
+            continue
+        _run_job(job_id)
+
+
+def ensure_job_runner():
+    # started lazily from the serving process, so the debug reloader's watcher never runs jobs
+    with _runner_lock:
+        if _runner_threads:
+            return
+        initialize_jobs_db()
+        conn = connect()
+        with conn:
+            # jobs that were running when the server stopped cannot be picked up mid-way
+            conn.execute("UPDATE jobs SET status = 'interrupted', finished = ? WHERE status IN ('running', 'cancelling')",
+                         (datetime.now().isoformat(),))
+        conn.close()
+        for i in range(max(1, MAX_CONCURRENT_JOBS)):
+            thread = threading.Thread(target=_runner_loop, name=f'job-runner-{i}', daemon=True)
+            thread.start()
+            _runner_threads.append(thread)
@@ -0,0 +1,265 @@
+# utils/results_store.py
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from utils.endpoint_index import EndpointIndex
+
+base_dir = Path(__file__).parent.parent.absolute()
+RESULTS_DB_PATH = os.environ.get('JANUS_RESULTS_DB', os.path.join(base_dir, "results.db"))
+
+# rows streamed per parquet row group
+PARQUET_BATCH_SIZE = 50000
+
+
+class ResultsStore:
+    # per-APK analysis results, keyed by (analysis, sha256, params); a row here is also the checkpoint for that APK
+    def __init__(self, db_path=RESULTS_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.initialize()
+        self.endpoint_index = EndpointIndex(db_path)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def initialize(self):
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS apk_results (
+            analysis TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            params TEXT NOT NULL,
+            pkg_name TEXT,
+            vercode TEXT,
+            vt_scan_date TEXT,
+            status TEXT NOT NULL,
+            payload BLOB,
+            created TEXT NOT NULL,
+            PRIMARY KEY (analysis, sha256, params)
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS apk_features (
+            analysis TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            params TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            feature TEXT NOT NULL,
+            count INTEGER NOT NULL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS version_deltas (
+            pkg_name TEXT NOT NULL,
+            params TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            from_version TEXT NOT NULL,
+            to_version TEXT NOT NULL,
+            added TEXT NOT NULL,
+            removed TEXT NOT NULL,
+            persisting INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL,
+            PRIMARY KEY (pkg_name, params, data_type, from_version, to_version)
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS dex_results (
+            signature TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created TEXT NOT NULL,
+            PRIMARY KEY (signature, parser, data_type)
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS apk_metadata (
+            sha256 TEXT PRIMARY KEY,
+            package_name TEXT,
+            version_code TEXT,
+            created TEXT NOT NULL
+        )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_pkg ON apk_results(analysis, pkg_name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_features_apk ON apk_features(analysis, sha256, params)')
+        conn.commit()
+        conn.close()
+
+    def completed(self, analysis, params, sha256s=None):
+        conn = self.connect()
+        rows = conn.execute("SELECT sha256 FROM apk_results WHERE analysis = ? AND params = ? AND status = 'done'",
+                            (analysis, params)).fetchall()
+        conn.close()
+        done = {row['sha256'] for row in rows}
+        return done if sha256s is None else done & set(sha256s)
+
+    def get_payload(self, analysis, sha256, params):
+        conn = self.connect()
+        row = conn.execute("SELECT payload FROM apk_results WHERE analysis = ? AND sha256 = ? AND params = ? AND status = 'done'",
+                           (analysis, sha256, params)).fetchone()
+        conn.close()
+        if row is None or row['payload'] is None:
+            return None
+        return pickle.loads(row['payload'])
+
+    def save_result(self, analysis, sha256, params, pkg_name, vercode, vt_scan_date, payload, rows, status='done'):
+        # rows: (data_type, feature, count) tuples, kept queryable for exports and the UI
+        rows = list(rows)
+        with self._lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.execute('DELETE FROM apk_features WHERE analysis = ? AND sha256 = ? AND params = ?', (analysis, sha256, params))
+                    conn.executemany('INSERT INTO apk_features (analysis, sha256, params, data_type, feature, count) VALUES (?, ?, ?, ?, ?, ?)',
+                                     ((analysis, sha256, params, data_type, feature, int(count)) for data_type, feature, count in rows))
+                    conn.execute('INSERT OR REPLACE INTO apk_results (analysis, sha256, params, pkg_name, vercode, vt_scan_date, status, payload, created) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (analysis, sha256, params, pkg_name, str(vercode), vt_scan_date, status,
+                                  pickle.dumps(payload) if payload is not None else None, datetime.now().isoformat()))
+            finally:
+                conn.close()
+        if analysis == 'connectivity' and status == 'done':
+            # keep the cross-package endpoint index current as APKs are analysed
+            self.endpoint_index.add_apk(sha256, pkg_name, vercode, vt_scan_date, rows)
+
+    def save_failure(self, analysis, sha256, params, pkg_name, vercode, vt_scan_date):
+        self.save_result(analysis, sha256, params, pkg_name, vercode, vt_scan_date, None, [], status='failed')
+
+    def get_dex_result(self, signature, parser, data_type):
+        conn = self.connect()
+        row = conn.execute('SELECT data FROM dex_results WHERE signature = ? AND parser = ? AND data_type = ?',
+                           (signature, parser, data_type)).fetchone()
+        conn.close()
+        return json.loads(row['data']) if row is not None else None
+
+    def save_dex_result(self, signature, parser, data_type, data):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO dex_results (signature, parser, data_type, data, created) VALUES (?, ?, ?, ?, ?)',
+                             (signature, parser, data_type, json.dumps(data), datetime.now().isoformat()))
+        finally:
+            conn.close()
+
+    def get_apk_metadata(self, sha256):
+        conn = self.connect()
+        row = conn.execute('SELECT package_name, version_code FROM apk_metadata WHERE sha256 = ?', (sha256,)).fetchone()
+        conn.close()
+        return dict(row) if row is not None else None
+
+    def save_apk_metadata(self, sha256, package_name, version_code):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO apk_metadata (sha256, package_name, version_code, created) VALUES (?, ?, ?, ?)',
+                             (sha256, package_name, version_code, datetime.now().isoformat()))
+        finally:
+            conn.close()
+
+    def get_deltas(self, pkg_name, params, data_type, pairs):
+        conn = self.connect()
+        rows = conn.execute('SELECT from_version, to_version, added, removed, persisting, fingerprint FROM version_deltas '
+                            'WHERE pkg_name = ? AND params = ? AND data_type = ?', (pkg_name, params, data_type)).fetchall()
+        conn.close()
+        wanted = set(pairs)
+        return {(row['from_version'], row['to_version']): {'added': json.loads(row['added']), 'removed': json.loads(row['removed']),
+                                                          'persisting': row['persisting'], 'fingerprint': row['fingerprint']}
+                for row in rows if (row['from_version'], row['to_version']) in wanted}
+
+    def save_deltas(self, pkg_name, params, data_type, deltas):
+        # deltas: (from_version, to_version, {'added', 'removed', 'persisting', 'fingerprint'})
+        with self._lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.executemany('INSERT OR REPLACE INTO version_deltas (pkg_name, params, data_type, from_version, to_version, added, removed, persisting, fingerprint) '
+                                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     [(pkg_name, params, data_type, from_version, to_version, json.dumps(delta['added']),
+                                       json.dumps(delta['removed']), delta['persisting'], delta['fingerprint'])
+                                      for from_version, to_version, delta in deltas])
+            finally:
+                conn.close()
+
+    def iter_feature_rows(self, analysis=None):
+        conn = self.connect()
+        query = '''
+        SELECT r.analysis, r.pkg_name, r.vercode, r.vt_scan_date, r.sha256, r.params, f.data_type, f.feature, f.count
+        FROM apk_features f
+        JOIN apk_results r ON r.analysis = f.analysis AND r.sha256 = f.sha256 AND r.params = f.params
+        WHERE r.status = 'done'
+        '''
+        args = ()
+        if analysis:
+            query += ' AND r.analysis = ?'
+            args = (analysis,)
+        try:
+            for row in conn.execute(query + ' ORDER BY r.pkg_name, r.vt_scan_date', args):
+                yield tuple(row)
+        finally:
+            conn.close()
+
+    def export_parquet(self, parquet_path, analysis=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            logging.warning("pyarrow is not installed, skipping parquet export")
+            return None
+
+        schema = pa.schema([
+            ('analysis', pa.string()),
+            ('pkg_name', pa.string()),
+            ('vercode', pa.string()),
+            ('vt_scan_date', pa.string()),
+            ('sha256', pa.string()),
+            ('params', pa.string()),
+            ('data_type', pa.string()),
+            ('feature', pa.string()),
+            ('count', pa.int64()),
+        ])
+
+        def flush(writer, batch):
+            writer.write_table(pa.Table.from_pydict(
+                {name: [row[k] for row in batch] for k, name in enumerate(schema.names)}, schema=schema))
+
+        with pq.ParquetWriter(parquet_path, schema) as writer:
+            batch = []
+            for row in self.iter_feature_rows(analysis):
+                batch.append(row)
+                if len(batch) >= PARQUET_BATCH_SIZE:
+                    flush(writer, batch)
+                    batch = []
+            if batch:
+                flush(writer, batch)
+        return parquet_path
+
+
+_results_store = None
+_init_lock = threading.Lock()
+
+
+def get_results_store():
+    global _results_store
+    with _init_lock:
+        if _results_store is None:
+            _results_store = ResultsStore()
+        return _results_store
+
+
+def use_results_store(db_path):
+    # points this process's default store (the one get_results_store() returns, e.g. for the DEX cache) at
+    # db_path; corpus workers call it so a run given --results-db writes everything to that one database
+    global _results_store
+    with _init_lock:
+        if _results_store is None or _results_store.db_path != db_path:
+            _results_store = ResultsStore(db_path)
+        return _results_store
@@ -0,0 +1,69 @@
+# utils/sampling.py
+# Version sampling that stays stable when the date range is extended.
+#
+# APKs are grouped into date buckets of 7 * 2^k days, anchored at a fixed epoch, and the earliest APK of each
+# non-empty bucket is taken. Buckets at level k+1 are exactly two buckets of level k, so the earliest APK of a
+# wider bucket was already the earliest of one of its halves: a coarser sample is always a subset of a finer one,
+# and extending the range never swaps an already-sampled APK for a neighbour.
+from datetime import datetime
+
+BASE_BUCKET_DAYS = 7
+EPOCH = datetime(1970, 1, 5)  # a Monday, so base buckets are calendar weeks
+MAX_LEVEL = 16
+
+
+def parse_scan_date(vtscandate):
+    return datetime.strptime(str(vtscandate)[:10], '%Y-%m-%d')
+
+
+def bucket_index(vtscandate, level):
+    return (parse_scan_date(vtscandate) - EPOCH).days // (BASE_BUCKET_DAYS << level)
+
+
+def sample_by_buckets(apks, level):
+    # apks: (sha256, vercode, vt_scan_date) sorted by date; first APK seen in each bucket wins
+    sampled = {}
+    for apk in apks:
+        sampled.setdefault(bucket_index(apk[2], level), apk)
+    return [sampled[key] for key in sorted(sampled)]
+
+
+def choose_level(apks, max_samples):
+    # the finest bucket width that yields no more than max_samples samples
+    for level in range(MAX_LEVEL + 1):
+        if len({bucket_index(apk[2], level) for apk in apks}) <= max_samples:
+            return level
+    return MAX_LEVEL
+
+
+def stable_sample(apks, desired_versions):
+    # the latest APK plus at most desired_versions - 1 bucket representatives of the earlier ones
+    apks = sorted(apks, key=lambda apk: (apk[2], apk[0]))
+    if not apks:
+        return []
+    latest, earlier = apks[-1], apks[:-1]
+    max_samples = max(1, desired_versions - 1)
+    sampled = sample_by_buckets(earlier, choose_level(earlier, max_samples)) if earlier else []
+    # a coarse top level can still leave too many buckets, thin those evenly
+    if len(sampled) > max_samples:
+        step = len(sampled) / max_samples
+        sampled = [sampled[int(i * step)] for i in range(max_samples)]
+    # releases clustered in a few buckets leave too few; top up evenly from the rest. the bucket representatives
+    # stay stable, only the top-ups can move when the range changes
+    elif len(sampled) < max_samples and len(earlier) > len(sampled):
+        return [latest] + top_up(earlier, sampled, max_samples)
+    return [latest] + sampled
+
+
+def top_up(apks, sampled, max_samples):
+    chosen = {apk[0] for apk in sampled}
+    remaining = [apk for apk in apks if apk[0] not in chosen]
+    needed = min(max_samples - len(sampled), len(remaining))
+    step = len(remaining) / needed
+    extra = [remaining[int(i * step)] for i in range(needed)]
+    return sorted(sampled + extra, key=lambda apk: (apk[2], apk[0]))
+
+
+def plan_increment(sampled_apks, analysed_sha256s):
+    # only APKs without a stored result still need to be fetched and parsed
+    return [apk for apk in sampled_apks if apk[0] not in analysed_sha256s]
@@ -0,0 +1,19 @@
+# utils/string_pages.py
+# server-side search and paging for the string tables, so only the visible page is sent to the browser
+import math
+
+
+def search_items(items, search, key=lambda item: item):
+    # case-insensitive substring search
+    if not search:
+        return items
+    needle = search.lower()
+    return [item for item in items if needle in key(item).lower()]
+
+
+def page_items(items, page_current, page_size):
+    # returns (page of items, page_count, page_current clamped to the available pages)
+    page_count = max(1, math.ceil(len(items) / page_size))
+    page_current = min(max(page_current or 0, 0), page_count - 1)
+    start = page_current * page_size
+    return items[start:start + page_size], page_count, page_current
@@ -0,0 +1,153 @@
+# utils/summary_export.py
+import csv
+import logging
+import os
+import re
+from pathlib import Path
+
+SUMMARY_FORMATS = ['txt', 'csv', 'parquet']
+
+# rows buffered per parquet row group
+PARQUET_BATCH_SIZE = 50000
+
+base_dir = Path(__file__).parent.parent.absolute()
+OUTPUT_ROOT = os.path.join(base_dir, "outputs")
+
+
+def get_output_dir(run_id):
+    output_dir = os.path.join(OUTPUT_ROOT, run_id)
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def compile_highlights(highlight_config):
+    # same precedence as the heatmap shapes: last configured pattern is checked first
+    return [(pattern, color, re.compile(pattern, re.IGNORECASE))
+            for pattern, color in list(highlight_config.items())[::-1]]
+
+
+def match_highlights(features, compiled_highlights):
+    # one regex pass per feature instead of one per feature x version
+    return {feature: [(pattern, color) for pattern, color, regex in compiled_highlights if regex.search(feature)]
+            for feature in features}
+
+
+def format_date(date):
+    if date is None or date != date:  # None or NaN
+        return "nan"
+    return str(date)
+
+
+def iter_count_rows(count_matrix, date_matrix, versions):
+    # walk only the non-zero cells of the feature x version matrix
+    values = count_matrix[versions].values
+    dates = date_matrix.reindex(index=count_matrix.index, columns=versions).values
+    for i, feature in enumerate(count_matrix.index):
+        row = values[i]
+        for j in row.nonzero()[0]:
+            yield feature, versions[j], format_date(dates[i, j]), int(row[j])
+
+
+def write_text_summaries(output_dir, package_name, data_type, count_matrix, date_matrix, versions, version_dates, matches):
+    values = count_matrix[versions].values
+    dates = date_matrix.reindex(index=count_matrix.index, columns=versions).values
+    features = list(count_matrix.index)
+
+    data_summary_path = os.path.join(output_dir, f"{package_name}_{data_type}_data_summary.txt")
+    with open(data_summary_path, 'w', encoding='utf-8') as file:
+        file.write("Feature Analysis Summary:\n")
+        for i, item in enumerate(features):
+            file.write(f"\nFeature: {item}\n")
+            if matches[item]:
+                pattern, color = matches[item][-1]
+                file.write(f"  Highlight: {pattern} (Color: {color})\n")
+            for j, version in enumerate(versions):
+                file.write(f"  Version {version} ({format_date(dates[i, j])}): Count = {values[i, j]}\n")
+
+    condensed_summary_path = os.path.join(output_dir, f"{package_name}_{data_type}_condensed_summary.txt")
+    with open(condensed_summary_path, 'w', encoding='utf-8') as file:
+        file.write("Feature Analysis Summary by Version:\n")
+        for j, version in enumerate(versions):
+            date = version_dates.get(version)
+            file.write(f"\nVersion {version} ({date if date else 'No Date Available'}):\n")
+            for i in values[:, j].nonzero()[0]:
+                item = features[i]
+                file.write(f" {item}   Count: {values[i, j]}\n")
+                for pattern, color in matches[item]:
+                    file.write(f" MATCH: {pattern} (Color: {color})\n")
+
+    return [data_summary_path, condensed_summary_path]
+
+
+def write_csv_summary(output_dir, package_name, data_type, rows, matches):
+    csv_path = os.path.join(output_dir, f"{package_name}_{data_type}_summary.csv")
+    with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['feature', 'version', 'date', 'count', 'highlight'])
+        for feature, version, date, count in rows:
+            highlight = matches[feature][-1][0] if matches[feature] else ''
+            writer.writerow([feature, version, date, count, highlight])
+    return [csv_path]
+
+
+def write_parquet_summary(output_dir, package_name, data_type, rows, matches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logging.warning("pyarrow is not installed, skipping parquet summary export")
+        return []
+
+    schema = pa.schema([
+        ('feature', pa.string()),
+        ('version', pa.string()),
+        ('date', pa.string()),
+        ('count', pa.int64()),
+        ('highlight', pa.string()),
+    ])
+    parquet_path = os.path.join(output_dir, f"{package_name}_{data_type}_summary.parquet")
+
+    def flush(writer, batch):
+        writer.write_table(pa.Table.from_pydict(
+            {name: [row[k] for row in batch] for k, name in enumerate(schema.names)}, schema=schema))
+
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        batch = []
+        for feature, version, date, count in rows:
+            highlight = matches[feature][-1][0] if matches[feature] else ''
+            batch.append((feature, str(version), date, count, highlight))
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                flush(writer, batch)
+                batch = []
+        if batch:
+            flush(writer, batch)
+    return [parquet_path]
+
+
+def export_summaries(result, package_name, data_type, highlight_config, output_dir, formats):
+    count_matrix = result.get('count_matrix')
+    if count_matrix is None or count_matrix.empty:
+        return []
+
+    date_matrix = result['date_matrix']
+    versions = result['versions']
+    version_dates = result['version_dates']
+    matches = match_highlights(count_matrix.index, compile_highlights(highlight_config))
+
+    written = []
+    for summary_format in formats or []:
+        try:
+            if summary_format == 'txt':
+                written.extend(write_text_summaries(output_dir, package_name, data_type, count_matrix, date_matrix,
+                                                    versions, version_dates, matches))
+            elif summary_format == 'csv':
+                written.extend(write_csv_summary(output_dir, package_name, data_type,
+                                                 iter_count_rows(count_matrix, date_matrix, versions), matches))
+            elif summary_format == 'parquet':
+                written.extend(write_parquet_summary(output_dir, package_name, data_type,
+                                                     iter_count_rows(count_matrix, date_matrix, versions), matches))
+            else:
+                logging.warning(f"Unknown summary format: {summary_format}")
+        except Exception as e:
+            logging.error(f"Error exporting {summary_format} summary for {package_name} {data_type}: {str(e)}")
+    return written
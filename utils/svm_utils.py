@@ -1,9 +1,10 @@
-import csv
+import hashlib
 import os
 import re
 import gc
 import pickle
 import requests
+from requests.adapters import HTTPAdapter
 import gzip
 import shutil
 from datetime import datetime
@@ -11,13 +12,29 @@ import pandas as pd
 import numpy as np
 from androguard.core.bytecodes import dvm
 from androguard.misc import AnalyzeAPK
-from sklearn.svm import SVC
+from utils.apk_features import ScopedAPK
+from utils.results_store import get_results_store
+from utils.worker_pool import DOWNLOAD_THREADS, get_download_executor, get_worker_pool
+from scipy.sparse import csr_matrix
+from sklearn.svm import SVC, LinearSVC
 from collections import defaultdict
 import tldextract
 import time
+import sqlite3
+import threading
+from concurrent.futures import as_completed
+from create_sql_db import create_sqlite_db
 API_KEY = None
 CSV_PATH = "latest_with-added-date.csv.gz"
+DB_PATH = "androzoo.db"
 BASE_DOWNLOAD_DIR = "downloaded_apks"
+LABELS = {'Sample1': 0, 'Sample2': 1}
+# results-store analysis name for per-APK SVM features, one entry per extractor
+SVM_ANALYSIS = 'svm_features'
+SHA256_IN_NAME = re.compile(r'_([0-9a-fA-F]{64})\.apk$')
+
+_session = None
+_session_lock = threading.Lock()
 
 
 
@@ -25,64 +42,122 @@ def set_api_key(key):
     global API_KEY
     API_KEY = key
 
+def get_session():
+    # one pooled session for all SVM downloads, sized to the shared download threads so connections to
+    # AndroZoo are kept alive and reused instead of a new TLS handshake per APK
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DOWNLOAD_THREADS, max_retries=3)
+            _session.mount('https://', adapter)
+        return _session
+
 def download_file_with_progress(url, filename):
-    response = requests.get(url, stream=True)
-    total = response.headers.get('content-length')
-    if total is None:
-        with open(filename, 'wb') as f:
-            f.write(response.content)
-    else:
-        downloaded = 0
-        total = int(total)
-        with open(filename, 'wb') as f:
-            for data in response.iter_content(chunk_size=4096):
-                downloaded += len(data)
-                f.write(data)
-                done = int(50 * downloaded / total)
-                print(f"\r[{'=' * done}{' ' * (50-done)}] {done * 2}%", end='')
+    # streams to a .part file in 1 MB chunks, so a failed transfer never leaves a truncated file behind
+    part_path = filename + '.part'
+    try:
+        with get_session().get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                for data in response.iter_content(chunk_size=1 << 20):
+                    f.write(data)
+        os.replace(part_path, filename)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
 
 def download_and_extract_csv():
     csv_file_path = "latest_with-added-date.csv"
     if not os.path.isfile(csv_file_path):
         print("Downloading Androzoo CSV...")
         download_file_with_progress("https://androzoo.uni.lu/static/lists/latest_with-added-date.csv.gz", CSV_PATH)
-        print("\nExtracting CSV...")
+        print("Extracting CSV...")
         with gzip.open(CSV_PATH, 'rb') as f_in, open(csv_file_path, 'wb') as f_out:
             shutil.copyfileobj(f_in, f_out)
     return csv_file_path
 
-def find_apks_metadata(package_names, start_date, end_date, csv_file):
+def ensure_catalogue(db_path=DB_PATH):
+    # the same androzoo.db catalogue the other pages use, built from the CSV once if it isn't there yet
+    if not os.path.exists(db_path):
+        create_sqlite_db(download_and_extract_csv(), db_path)
+    return db_path
+
+def find_apks_metadata(package_names, start_date, end_date, db_path=DB_PATH):
+    # one indexed query (idx_pkg_name) for all packages, instead of a full CSV scan per package
+    package_names = list(package_names)
+    if not package_names:
+        return []
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"""
+        SELECT pkg_name, sha256, vercode, vt_scan_date
+        FROM apks
+        WHERE pkg_name IN ({','.join('?' * len(package_names))}) AND vt_scan_date BETWEEN ? AND ?
+        """, (*package_names, start_date.strftime("%Y-%m-%d %H:%M:%S"), end_date.strftime("%Y-%m-%d %H:%M:%S"))).fetchall()
+    finally:
+        conn.close()
     metadata = []
-    with open(csv_file, mode='r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row['pkg_name'] in package_names and row['vt_scan_date']:
-                try:
-                    vt_scan_date = datetime.strptime(row['vt_scan_date'], "%Y-%m-%d %H:%M:%S")
-                    if start_date <= vt_scan_date <= end_date:
-                        metadata.append((row['pkg_name'], row['sha256'], row['vercode'], vt_scan_date))
-                except ValueError:
-                    continue  # Skip rows with parsing errors
+    for pkg_name, sha256, vercode, vt_scan_date in rows:
+        try:
+            metadata.append((pkg_name, sha256, vercode, datetime.strptime(vt_scan_date, "%Y-%m-%d %H:%M:%S")))
+        except (TypeError, ValueError):
+            continue  # Skip rows with parsing errors
     return metadata
 
+def plan_samples(samples, db_path=DB_PATH):
+    # every package of every sample in one pass over the catalogue: the latest desired_versions APKs per
+    # package within the sample's date range, as (sha256, pkg_name, vt_date, folder_name) download tasks
+    ensure_catalogue(db_path)
+    plan = []
+    for sample in samples:
+        by_package = defaultdict(list)
+        for pkg_name, sha256, _, vt_date in find_apks_metadata(sample['package_names'], sample['start_date'], sample['end_date'], db_path):
+            by_package[pkg_name].append((vt_date, sha256))
+        for pkg_name in sample['package_names']:
+            latest = sorted(by_package[pkg_name], reverse=True)[:sample['desired_versions']]
+            plan.extend((sha256, pkg_name, vt_date, sample['folder_name']) for vt_date, sha256 in latest)
+    return plan
+
 def download_apk(sha256, pkg_name, vt_date, download_dir):
     url = f"https://androzoo.uni.lu/api/download?apikey={API_KEY}&sha256={sha256}"
     date_str = vt_date.strftime("%Y%m%d")
     local_file_path = os.path.join(download_dir, f"{pkg_name}_{date_str}_{sha256}.apk")
-    print(f"\nDownloading APK: {sha256} for package {pkg_name} on {date_str}")
+    if os.path.exists(local_file_path):
+        return local_file_path
+    print(f"Downloading APK: {sha256} for package {pkg_name} on {date_str}")
     download_file_with_progress(url, local_file_path)
+    return local_file_path
+
+def download_apk_worker(sha256, pkg_name, vt_date, download_dir):
+    try:
+        return download_apk(sha256, pkg_name, vt_date, download_dir)
+    except Exception as e:
+        print(f"Error in downloading APK with SHA256: {sha256}. Error: {str(e)}")
+        return None
+
+def download_planned_apks(plan, progress=None):
+    # downloads run concurrently on the shared download threads; returns (apk_path, folder_name) for every
+    # APK that is now on disk, in plan order
+    executor = get_download_executor()
+    futures = []
+    for sha256, pkg_name, vt_date, folder_name in plan:
+        download_folder = os.path.join(BASE_DOWNLOAD_DIR, folder_name)
+        os.makedirs(download_folder, exist_ok=True)
+        futures.append(executor.submit(download_apk_worker, sha256, pkg_name, vt_date, download_folder))
+    for done, _ in enumerate(as_completed(futures), 1):
+        if progress:
+            progress(done, len(futures))
+    return [(future.result(), task[3]) for future, task in zip(futures, plan) if future.result()]
 
 def download_apks_for_config(package_names, start_date, end_date, desired_versions, folder_name):
-    download_folder = os.path.join(BASE_DOWNLOAD_DIR, folder_name)
-    os.makedirs(download_folder, exist_ok=True)
-    csv_file = download_and_extract_csv()
-    for package_name in package_names:
-        metadata = find_apks_metadata([package_name], start_date, end_date, csv_file)
-        metadata = sorted(metadata, key=lambda x: x[3], reverse=True)[:desired_versions]
-        for pkg_name, sha256, _, vt_date in metadata:
-            download_apk(sha256, pkg_name, vt_date, download_folder)
-
-# Define feature extractor functions for different types of features
+    # returns the local paths of this sample's APKs, so training uses exactly what was requested
+    sample = {'package_names': package_names, 'start_date': start_date, 'end_date': end_date,
+              'desired_versions': desired_versions, 'folder_name': folder_name}
+    return [apk_path for apk_path, _ in download_planned_apks(plan_samples([sample]))]
+
+# Define feature extractor functions for different types of features (module level, so they can be sent to
+# pool workers; results are cached under each function's name)
 def extract_full_urls_from_apk(a):
     full_urls = set()
     try:
@@ -91,8 +166,6 @@ def extract_full_urls_from_apk(a):
             for string in dv.get_strings():
                 urls = re.findall(r'https?://\S+', string)
                 full_urls.update(urls)
-    except Exception as e:
-        print(f'Error while extracting full URLs: {str(e)}')
     finally:
         gc.collect()
     return full_urls
@@ -109,8 +182,6 @@ def extract_subdomains_from_apk(a):
                     subdomain_full = '.'.join(part for part in [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix] if part).strip('.')
                     if subdomain_full and "%s" not in subdomain_full:
                         subdomains.add(subdomain_full)
-    except Exception as e:
-        print(f'Error while extracting subdomains: {str(e)}')
     finally:
         gc.collect()
     return subdomains
@@ -124,8 +195,12 @@ def extract_libraries(a):
 def extract_services(a):
     return set(a.get_services())
 
+# what the SVM page trains on
+SVM_FEATURE_EXTRACTORS = [extract_full_urls_from_apk, extract_permissions]
+
 def extract_features_from_apk(apk_path, feature_extractors):
-    a, d, dx = AnalyzeAPK(apk_path)
+    # the extractors only need the manifest and the DEX files, never AnalyzeAPK's cross-reference analysis
+    a = ScopedAPK(apk_path)
     features = set()
     for extractor in feature_extractors:
         extracted_features = extractor(a)
@@ -133,20 +208,70 @@ def extract_features_from_apk(apk_path, feature_extractors):
             features |= extracted_features
     return features
 
-def extract_features_and_labels(folder_paths, save_path, feature_extractors):
-    if os.path.exists(save_path):
-        with open(save_path, 'rb') as f:
-            features_list, labels_list = pickle.load(f)
-    else:
-        features_list = []
-        labels_list = []
-        for folder, label in folder_paths.items():
-            for apk in os.listdir(folder):
-                if apk.endswith('.apk'):
-                    apk_path = os.path.join(folder, apk)
-                    features = extract_features_from_apk(apk_path, feature_extractors)
-                    features_list.append(features)
-                    labels_list.append(label)
+def apk_sha256(apk_path):
+    # downloaded APKs are named <pkg>_<date>_<sha256>.apk; anything else is hashed
+    match = SHA256_IN_NAME.search(os.path.basename(apk_path))
+    if match:
+        return match.group(1).lower()
+    digest = hashlib.sha256()
+    with open(apk_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_apk_svm_features(apk_path, feature_extractors):
+    # worker task: {extractor name: sorted features} for one APK, sharing one ScopedAPK between extractors.
+    # a broken APK (or DEX) returns None rather than failing the whole batch; extractors let errors through so
+    # a partial result is never cached
+    try:
+        a = ScopedAPK(apk_path)
+        return {extractor.__name__: sorted(extractor(a)) for extractor in feature_extractors}
+    except Exception as e:
+        print(f"Error extracting features from {apk_path}: {str(e)}")
+        return None
+
+def extract_features_and_labels(apk_samples, feature_extractors, save_path=None, num_workers=None, progress=None):
+    # apk_samples: (apk_path, label) pairs. features are cached per APK sha256 and extractor in the results
+    # store, so only APKs or extractors not seen before are extracted, in parallel on the shared pool
+    store = get_results_store()
+    names = [extractor.__name__ for extractor in feature_extractors]
+    shas = [apk_sha256(apk_path) for apk_path, _ in apk_samples]
+    cached = {}
+    missing = []
+    for (apk_path, _), sha256 in zip(apk_samples, shas):
+        if sha256 in cached:
+            continue
+        entry = {name: store.get_payload(SVM_ANALYSIS, sha256, name) for name in names}
+        cached[sha256] = entry
+        todo = [extractor for extractor in feature_extractors if entry[extractor.__name__] is None]
+        if todo:
+            missing.append((sha256, apk_path, todo))
+    print(f"SVM features: {len(cached) - len(missing)} APKs cached, {len(missing)} to extract")
+
+    done = 0
+    tasks = [(apk_path, todo) for _, apk_path, todo in missing]
+    results = get_worker_pool().imap_unordered(extract_apk_svm_features, tasks, max_parallel=num_workers) if tasks else []
+    for index, result in results:
+        sha256 = missing[index][0]
+        for name, features in (result or {}).items():
+            store.save_result(SVM_ANALYSIS, sha256, name, None, None, None, features, [(name, feature, 1) for feature in features])
+            cached[sha256][name] = features
+        done += 1
+        if progress:
+            progress(done, len(missing))
+
+    # APKs whose extraction failed have nothing cached and are left out, rather than becoming all-zero rows
+    features_list = []
+    labels_list = []
+    for (apk_path, label), sha256 in zip(apk_samples, shas):
+        entry = cached[sha256]
+        if any(entry[name] is None for name in names):
+            print(f"Skipping {apk_path}: feature extraction failed")
+            continue
+        features_list.append(set().union(*(entry[name] for name in names)))
+        labels_list.append(label)
+    if save_path:
+        # snapshot of the assembled set for svm_benchmark.py; never read back, the store is the cache
         with open(save_path, 'wb') as f:
             pickle.dump((features_list, labels_list), f)
     return features_list, labels_list
@@ -161,9 +286,38 @@ def prepare_dataframe(features_list, labels_list):
     df['label'] = labels_list
     return df
 
+def prepare_feature_matrix(features_list, labels_list):
+    # sparse APK x feature presence matrix built from a feature -> column dictionary, one pass over the
+    # features each APK actually has (the dataframe above is features x APKs in Python)
+    vocabulary = {}
+    indices = []
+    indptr = [0]
+    for features in features_list:
+        for feature in features:
+            indices.append(vocabulary.setdefault(feature, len(vocabulary)))
+        indptr.append(len(indices))
+    X = csr_matrix((np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                   shape=(len(features_list), len(vocabulary)))
+    feature_names = np.empty(len(vocabulary), dtype=object)
+    for feature, column in vocabulary.items():
+        feature_names[column] = feature
+    y = np.array([LABELS[label] for label in labels_list])
+    return X, feature_names, y
+
+
+def rank_features(X, y, feature_names):
+    # linear SVM on the sparse matrix; liblinear scales to tens of thousands of features and thousands of
+    # APKs, and skips the probability calibration SVC(probability=True) ran but nobody read
+    model = LinearSVC(C=1.0, dual='auto', max_iter=10000)
+    model.fit(X, y)
+    feature_importance = model.coef_[0]
+    sorted_indices = np.argsort(feature_importance)
+    return [(feature_names[i], feature_importance[i]) for i in sorted_indices]
+
+
 def perform_svm_analysis(df):
     X = df.drop('label', axis=1)
-    y = df['label'].map({'Sample1': 0, 'Sample2': 1})
+    y = df['label'].map(LABELS)
     model = SVC(kernel='linear', probability=True)
     model.fit(X, y)
     feature_importance = model.coef_[0]
@@ -0,0 +1,218 @@
+# utils/uploads.py
+# chunked, resumable APK uploads: the browser sends raw chunks (no base64), each is appended to a
+# partial file on disk and fed to a running sha256, so no upload is ever held in memory whole.
+# finished uploads are stored by content hash, so the same APK uploaded twice is kept (and parsed) once
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+from androguard.core.bytecodes.apk import APK
+
+from utils.axml import AXMLError, read_manifest
+from utils.results_store import get_results_store
+
+UPLOAD_DIR = os.environ.get('JANUS_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'uploaded_apks'))
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, 'partial')
+MAX_UPLOAD_BYTES = int(os.environ.get('JANUS_MAX_UPLOAD_MB', 1024)) * 1024 * 1024
+# partial uploads untouched for this long are dropped
+PARTIAL_TTL_SECONDS = 24 * 3600
+# finished uploads are shared by every session (they are keyed by sha256), so they are swept by age and total size
+# rather than when one page removes them from its list; re-uploading or probing a file counts as using it
+UPLOAD_TTL_SECONDS = int(os.environ.get('JANUS_UPLOAD_TTL_HOURS', 7 * 24)) * 3600
+MAX_STORED_UPLOAD_BYTES = int(os.environ.get('JANUS_UPLOAD_STORE_MB', 10240)) * 1024 * 1024
+# the size cap never evicts files used this recently, they are likely part of an analysis being set up
+RECENT_UPLOAD_SECONDS = 3600
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+HANDLE_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# upload_id -> running state; the .part/.json files on disk are the durable copy, this only saves rehashing
+_uploads = {}
+_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _paths(upload_id):
+    if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+        raise UploadError("Invalid upload id", 404)
+    return os.path.join(PARTIAL_DIR, f"{upload_id}.part"), os.path.join(PARTIAL_DIR, f"{upload_id}.json")
+
+
+def _load(upload_id):
+    # state for an upload, rebuilt from disk (rehashing what was received) if this process hasn't seen it
+    state = _uploads.get(upload_id)
+    if state is not None:
+        return state
+    part_path, meta_path = _paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise UploadError("Unknown upload", 404)
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    digest = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part_path):
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+                offset += len(chunk)
+    state = dict(meta, offset=offset, digest=digest, lock=threading.Lock())
+    _uploads[upload_id] = state
+    return state
+
+
+def start_upload(filename, size):
+    size = int(size)
+    if size <= 0 or size > MAX_UPLOAD_BYTES:
+        raise UploadError(f"File size must be between 1 byte and {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    cleanup_partial_uploads()
+    cleanup_finished_uploads()
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(upload_id)
+    meta = {'upload_id': upload_id, 'filename': os.path.basename(filename or 'upload.apk'), 'size': size}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    open(part_path, 'wb').close()
+    with _lock:
+        _uploads[upload_id] = dict(meta, offset=0, digest=hashlib.sha256(), lock=threading.Lock())
+    return {'upload_id': upload_id, 'offset': 0}
+
+
+def upload_status(upload_id):
+    with _lock:
+        state = _load(upload_id)
+    return {'upload_id': upload_id, 'offset': state['offset'], 'size': state['size']}
+
+
+def append_chunk(upload_id, offset, stream, length):
+    # the chunk must start where the file currently ends; otherwise the client is told where to resume from
+    with _lock:
+        state = _load(upload_id)
+    part_path, _ = _paths(upload_id)
+    with state['lock']:
+        if int(offset) != state['offset']:
+            raise UploadError("Offset mismatch", 409, state['offset'])
+        if state['offset'] + length > state['size']:
+            raise UploadError("Chunk runs past the declared file size", 400, state['offset'])
+        received = 0
+        with open(part_path, 'ab') as f:
+            while received < length:
+                chunk = stream.read(min(1 << 20, length - received))
+                if not chunk:
+                    break
+                f.write(chunk)
+                state['digest'].update(chunk)
+                received += len(chunk)
+        state['offset'] += received
+        return {'upload_id': upload_id, 'offset': state['offset']}
+
+
+def finish_upload(upload_id):
+    with _lock:
+        state = _load(upload_id)
+    part_path, meta_path = _paths(upload_id)
+    with state['lock']:
+        if state['offset'] != state['size']:
+            raise UploadError("Upload incomplete", 409, state['offset'])
+        sha256 = state['digest'].hexdigest()
+        if os.path.exists(upload_path(sha256)):
+            os.remove(part_path)
+            os.utime(upload_path(sha256))
+        else:
+            os.replace(part_path, upload_path(sha256))
+        os.remove(meta_path)
+        with _lock:
+            _uploads.pop(upload_id, None)
+    logging.info(f"Upload {upload_id} complete: {state['filename']} ({state['size']} bytes, {sha256})")
+    return {'handle': sha256, 'filename': state['filename'], 'size': state['size'], 'sha256': sha256}
+
+
+def known_upload(sha256):
+    # lets the browser skip sending a file the server already has
+    path = upload_path(sha256.lower())
+    if not os.path.exists(path):
+        raise UploadError("Unknown file", 404)
+    os.utime(path)
+    return {'handle': sha256.lower(), 'size': os.path.getsize(path), 'sha256': sha256.lower()}
+
+
+def upload_path(handle):
+    # the server-side file behind a handle given to the browser; handles are the file's sha256
+    if not HANDLE_PATTERN.match(handle or ''):
+        raise UploadError("Invalid upload handle", 404)
+    return os.path.join(UPLOAD_DIR, f"{handle}.apk")
+
+
+def apk_metadata(handle, store=None):
+    # package name and version code, read once per distinct APK and then served from the results store
+    store = store or get_results_store()
+    metadata = store.get_apk_metadata(handle)
+    if metadata is None:
+        try:
+            manifest = read_manifest(upload_path(handle))
+            metadata = {'package_name': manifest['package_name'], 'version_code': manifest['version_code']}
+        except (AXMLError, KeyError, IndexError, struct.error) as e:
+            # unusual manifests still get androguard's full parser
+            logging.warning(f"Falling back to androguard for {handle}: {str(e)}")
+            apk = APK(upload_path(handle))
+            metadata = {'package_name': apk.get_package(), 'version_code': apk.get_androidversion_code()}
+        store.save_apk_metadata(handle, metadata['package_name'], metadata['version_code'])
+    return metadata
+
+
+def cleanup_partial_uploads():
+    cutoff = time.time() - PARTIAL_TTL_SECONDS
+    for name in os.listdir(PARTIAL_DIR):
+        path = os.path.join(PARTIAL_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                with _lock:
+                    _uploads.pop(name.split('.')[0], None)
+        except OSError:
+            pass
+
+
+def cleanup_finished_uploads(now=None):
+    # drops stored APKs unused for UPLOAD_TTL_SECONDS, then the least recently used ones while the total is over
+    # MAX_STORED_UPLOAD_BYTES
+    now = now or time.time()
+    stored = []
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        if not (name.endswith('.apk') and HANDLE_PATTERN.match(name[:-4])):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stored.append((stat.st_mtime, stat.st_size, path))
+    stored.sort()
+    total = sum(size for _, size, _ in stored)
+    removed = 0
+    for mtime, size, path in stored:
+        expired = mtime < now - UPLOAD_TTL_SECONDS
+        over_size = total > MAX_STORED_UPLOAD_BYTES and mtime < now - RECENT_UPLOAD_SECONDS
+        if not (expired or over_size):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logging.info(f"Removed {removed} stored uploads, {total // (1024 * 1024)} MB left in {UPLOAD_DIR}")
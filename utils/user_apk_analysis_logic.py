@@ -2,16 +2,16 @@
 import base64
 import csv
 import gc
+import hashlib
 import json
 import logging
-import multiprocessing as mp
 import os
 import re
 import shutil
 import struct
 import time
 import zipfile
-from collections import defaultdict, OrderedDict
+from collections import Counter, defaultdict, OrderedDict
 from datetime import datetime
 from pathlib import Path
 
@@ -23,20 +23,16 @@ from androguard.misc import AnalyzeAPK
 from dash import dcc, html
 from tqdm import tqdm
 
-import threading
-
 import logging
-from io import StringIO
-import os
-import base64
-import tempfile
-import base64
-import tempfile
-import os
-from multiprocessing import Pool
 
-from .dex_parser import DEXParser
+from .dex_parser import DEXParser, is_code_dex
 from utils.string_presence_utils import DEXParser, extract_apk_dex_files
+from utils.worker_pool import get_download_executor, get_worker_pool
+# ui_logger is the shared 'UILogger', whose records go to the running job's bounded event buffer
+from utils.historical_connectivity_logic import (dex_entry_names, extract_apk_features_parallel, extract_dex_entry, initialize_database,
+                                                 load_sampling_plan, sampling_plan_id, save_sampling_plan, ui_logger)
+from utils.jobs import append_job_log, emit_progress
+from utils.results_store import get_results_store
 
 #variable to track progress
 progress = {
@@ -52,83 +48,12 @@ from dash.exceptions import PreventUpdate
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# variable to keep track of the current process
-current_process = None
-
-
-def initialize_database(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS apks (
-        sha256 TEXT PRIMARY KEY,
-        pkg_name TEXT,
-        vercode TEXT,
-        vt_scan_date TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
-
-
-def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection):
-    global current_process
-    current_process = threading.current_thread()
-
-    if n_clicks is None:
-        raise PreventUpdate
-
-    package_list = [package_list_input.strip()]  # Only accept one package
-    
-    ui_logger.logger.info("Starting APK processing")
-
-    start_date_str = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
-    end_date_str = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
-
-    # Validate and clean APKs
-    base_dir = Path(__file__).parent.parent.absolute()
-    universal_cache_dir = os.path.join(base_dir, "apk_cache")
-    trash_dir = os.path.join(base_dir, "trash")
-    validate_and_clean_apks(universal_cache_dir, trash_dir)
-    ui_logger.logger.info("APK cache validated and cleaned")
-
-    results = {}
-
-    for package_name in package_list:
-        ui_logger.logger.info(f"Processing package: {package_name}")
-
-        if package_name:
-            try:
-                ui_logger.logger.info(f"Downloading APKs for {package_name}")
-                figs = process_package(
-                    package_name.strip(),
-                    os.getcwd(),
-                    api_key,
-                    'androzoo.db',
-                    start_date_str,
-                    end_date_str,
-                    int(desired_versions),
-                    highlight_config,
-                    num_cores,
-                    parser_selection
-                )
-
-                # Check for cancellation after each major step
-                if current_process != threading.current_thread():
-                    ui_logger.logger.info("Process cancelled")
-                    return None
-
-                if figs:
-                    results.update(figs)
-                    ui_logger.logger.info(f"Figures generated for {package_name}")
-                else:
-                    ui_logger.logger.warning(f"No figures generated for package {package_name}")
-            except Exception as e:
-                ui_logger.logger.error(f"Error processing package {package_name}: {str(e)}")
-
-    ui_logger.logger.info("APK processing complete")
-    return results
+URL_PATTERN = re.compile(r'https?://\S+')
 
+# results-store analysis name for uploaded APKs, keyed by file content hash
+UPLOAD_ANALYSIS = 'uploaded_connectivity'
+# sampling plans go to the catalogue's sampling_plans table under this page's kind
+PLAN_KIND = 'user-apk-analysis'
 
 def validate_and_clean_apks(universal_cache_dir, trash_dir):
     os.makedirs(trash_dir, exist_ok=True)
@@ -236,10 +161,8 @@ def download_apk_worker(sha256, vercode, vtscandate, package_name, apikey, unive
         return None
 
 
-def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions):
-    pool = mp.Pool(min(mp.cpu_count() - 1, mp.cpu_count()))
+def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, plan_id):
     download_tasks = []
-    apk_log = {}
     for package_name in package_names:
         sha256_vercode_vtscandate_list = find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date)
         if not sha256_vercode_vtscandate_list:
@@ -251,18 +174,10 @@ def download_apks(package_names, apikey, universal_cache_dir, db_path, start_dat
         for sha256, vercode, vtscandate in sampled_apps:
             download_tasks.append((sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir))
 
-        apk_log[package_name] = [
-            {"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate}
-            for sha256, vercode, vtscandate in [latest_app] + sampled_apps
-        ]
-
-    results = pool.starmap(download_apk_worker, download_tasks)
-    pool.close()
-    pool.join()
+        save_sampling_plan(db_path, plan_id, package_name, [latest_app] + sampled_apps)
 
-    # Save the APK log as JSON
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'w') as f:
-        json.dump(apk_log, f, indent=2)
+    # downloads share one thread pool across all requests
+    results = list(get_download_executor().map(lambda task: download_apk_worker(*task), download_tasks))
 
     return [result for result in results if result is not None]
 
@@ -271,7 +186,7 @@ def extract_apk_dex_files(apk_path):
     dex_files = []
     with zipfile.ZipFile(apk_path, 'r') as z:
         for filename in z.namelist():
-            if filename.endswith('.dex'):
+            if is_code_dex(filename):
                 dex_data = z.read(filename)
                 dex_files.append(dex_data)
     return dex_files
@@ -281,42 +196,29 @@ def sanitize_string(input_string):
     return input_string.replace('\u0000', '')
 
 
-def extract_apk_features(file_path, parser_selection):
+def parser_name(parser_selection):
+    return 'digisilk' if parser_selection == 'custom_dex' else 'androguard'
+
+
+def url_features(urls):
+    # Process URLs to extract domains and subdomains
+    data = {'urls': list(urls), 'domains': set(), 'subdomains': set()}
+    for url in data['urls']:
+        parsed_url = tldextract.extract(url)
+        subdomain = '.'.join(filter(None, [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]))
+        domain = '.'.join(filter(None, [parsed_url.domain, parsed_url.suffix]))
+        data['subdomains'].add(subdomain)
+        data['domains'].add(domain)
+    return data
+
+
+def extract_apk_features(file_path, parser_selection, max_parallel=None):
     data = {'urls': [], 'domains': set(), 'subdomains': set()}
     try:
-        if parser_selection == 'custom_dex':
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                dex_files = [f for f in zip_ref.namelist() if f.endswith('.dex')]
-                for dex_file in dex_files:
-                    with zip_ref.open(dex_file) as dex:
-                        parser = DEXParser(dex.read())
-                        parser.parse()
-                        for string in parser.strings:
-                            urls = re.findall(r'https?://\S+', string)
-                            data['urls'].extend(urls)
-        else:  # Androguard parser
-            logging.info(f"Using Androguard parser for {file_path}")
-            a, d, dx = AnalyzeAPK(file_path)
-            logging.info(f"Androguard analysis complete for {file_path}")
-            logging.info(f"APK Package name: {a.get_package()}")
-            logging.info(f"APK Version name: {a.get_androidversion_name()}")
-            logging.info(f"APK Version code: {a.get_androidversion_code()}")
-            
-            for dex in a.get_all_dex():
-                dv = dvm.DalvikVMFormat(dex)
-                for string in dv.get_strings():
-                    sanitized_string = sanitize_string(string)
-                    urls = re.findall(r'https?://\S+', sanitized_string)
-                    data['urls'].extend(urls)
-
-        # Process URLs to extract domains and subdomains
-        for url in data['urls']:
-            parsed_url = tldextract.extract(url)
-            subdomain = '.'.join(filter(None, [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]))
-            domain = '.'.join(filter(None, [parsed_url.domain, parsed_url.suffix]))
-            data['subdomains'].add(subdomain)
-            data['domains'].add(domain)
-
+        # each DEX of the APK is parsed on its own worker, so one large multidex app uses more than one core
+        parser = parser_name(parser_selection)
+        logging.info(f"Using {parser} parser for {file_path}")
+        data = url_features(extract_apk_features_parallel(file_path, 'urls', parser, max_parallel))
         logging.info(f"Extracted features from {file_path}")
         return data
     except Exception as e:
@@ -329,16 +231,11 @@ def process_package(package_name, base_directory, apikey, db_path, start_date, e
     universal_cache_dir = os.path.join(base_directory, "apk_cache")
     os.makedirs(universal_cache_dir, exist_ok=True)
 
-    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions)
-
-    if should_cancel():
-        return None
+    plan_id = sampling_plan_id(PLAN_KIND, start_date, end_date, desired_versions)
+    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, plan_id)
 
     if downloaded_apks:
-        all_data = process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection)
-
-        if should_cancel():
-            return None
+        all_data = process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection, db_path, plan_id)
 
         figs = {}
         for data_type in ['urls', 'subdomains', 'domains']:
@@ -347,29 +244,21 @@ def process_package(package_name, base_directory, apikey, db_path, start_date, e
             fig = plot_data(all_data, package_name, formatted_highlight_config, data_type)
             figs[data_type] = fig
 
-            if should_cancel():
-                return None
-
         return figs
     else:
         return None
 
 
-def process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection):
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'r') as f:
-        apk_log = json.load(f)
-
-    relevant_apks = apk_log.get(package_name, [])
+def process_package_apks(universal_cache_dir, package_name, num_cores, parser_selection, db_path, plan_id):
+    relevant_apks = load_sampling_plan(db_path, plan_id, package_name)
 
     if not relevant_apks:
         print(f"No relevant APKs found for {package_name}")
         return []
 
-    pool = mp.Pool(num_cores, maxtasksperchild=4)
-    results = pool.starmap(process_file, [
-        (apk['sha256'], universal_cache_dir, apk['vercode'], apk['vtscandate'], parser_selection) for apk in relevant_apks])
-    pool.close()
-    pool.join()
+    # extraction runs on the shared, pre-warmed worker pool; num_cores caps this request's share of it
+    results = get_worker_pool().starmap(process_file, [
+        (apk['sha256'], universal_cache_dir, apk['vercode'], apk['vtscandate'], parser_selection) for apk in relevant_apks], max_parallel=num_cores)
 
     all_data = []
     for result in results:
@@ -738,29 +627,74 @@ def plot_locations(locations):
     return fig
 
 
-class UILogger:
-    def __init__(self):
-        self.log_capture_string = StringIO()
-        self.ch = logging.StreamHandler(self.log_capture_string)
-        self.ch.setLevel(logging.INFO)
-        self.formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        self.ch.setFormatter(self.formatter)
-
-        self.logger = logging.getLogger('UILogger')
-        self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(self.ch)
-
-    def get_logs(self):
-        return self.log_capture_string.getvalue()
-
-ui_logger = UILogger()
-
-# Add this function to check if a process should be cancelled
-def should_cancel():
-    return current_process != threading.current_thread()
-
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
+def extract_uploaded_dex(apk_path, dex_name, parser):
+    # worker task, returns (urls, ok); a malformed DEX only loses its own strings rather than failing the whole
+    # comparison, and ok=False keeps the incomplete APK result out of the results store
+    try:
+        return extract_dex_entry(apk_path, dex_name, 'urls', parser), True
+    except Exception as e:
+        logging.error(f"Error while extracting {dex_name} from {apk_path}: {str(e)}")
+        return [], False
+
+
+def upload_run_id(stored_data, parser_selection):
+    # event-buffer key for one analysis of a set of uploads, derivable by the progress poller without a job
+    key = '|'.join([parser_name(parser_selection)] + [item.get('sha256') or item['filename'] for item in stored_data])
+    return 'uploads-' + hashlib.sha1(key.encode()).hexdigest()
+
+
+def iter_uploaded_apk_features(stored_data, num_cores, parser_selection):
+    # yields (index, features) per uploaded APK as soon as it is done. Uploads already analysed with the
+    # same parser are served from the results store by content hash; the rest are split into one task per
+    # DEX across all APKs, so the pool stays busy until the slowest APK finishes, capped by the cores slider
+    store = get_results_store()
+    parser = parser_name(parser_selection)
+    hashes = [item.get('sha256') or file_sha256(item['server_path']) for item in stored_data]
+
+    pending = {}
+    tasks = []
+    for i, (item, sha256) in enumerate(zip(stored_data, hashes)):
+        cached = store.get_payload(UPLOAD_ANALYSIS, sha256, parser)
+        if cached is not None:
+            logging.info(f"Using stored results for {item['filename']}")
+            yield i, url_features(cached)
+            continue
+        try:
+            dex_names = dex_entry_names(item['server_path'])
+        except (zipfile.BadZipFile, OSError) as e:
+            logging.error(f"Error reading {item['filename']}: {str(e)}")
+            yield i, url_features([])
+            continue
+        if not dex_names:
+            yield i, url_features([])
+            continue
+        pending[i] = [None] * len(dex_names)
+        tasks.extend(((i, k), (item['server_path'], dex_name, parser)) for k, dex_name in enumerate(dex_names))
+
+    failed = set()
+    for index, result in get_worker_pool().imap_unordered(extract_uploaded_dex, [args for _, args in tasks], max_parallel=num_cores):
+        i, k = tasks[index][0]
+        urls, ok = result
+        pending[i][k] = urls
+        if not ok:
+            failed.add(i)
+        if all(part is not None for part in pending[i]):
+            urls = [url for part in pending.pop(i) for url in part]
+            item = stored_data[i]
+            if i in failed:
+                logging.warning(f"Not storing results for {item['filename']}: some of its DEX files could not be parsed")
+            else:
+                store.save_result(UPLOAD_ANALYSIS, hashes[i], parser, item.get('package_name'), item.get('version_code'), None,
+                                  urls, [('urls', url, count) for url, count in Counter(urls).items()])
+            yield i, url_features(urls)
 
 
 def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selection, sort_order):
@@ -769,21 +703,23 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
         'domains': [],
         'subdomains': []
     }
-    
-    for i, item in enumerate(stored_data):
-        # Use the server-side file path directly
-        apk_path = item['server_path']
-        features = extract_apk_features(apk_path, parser_selection)
-        
+
+    # each APK is reported as it finishes, for the page's progress poller
+    run_id = upload_run_id(stored_data, parser_selection)
+    emit_progress('parse', 0, len(stored_data), job_id=run_id)
+    for done, (i, features) in enumerate(iter_uploaded_apk_features(stored_data, num_cores, parser_selection), 1):
+        item = stored_data[i]
+        append_job_log(run_id, f"Processed {item['filename']} ({done}/{len(stored_data)}): {len(features['urls'])} URLs")
+        emit_progress('parse', done, len(stored_data), job_id=run_id)
         version = item['filename'] if sort_order == 'ui' else item['version_code']
         ui_index = i
-        
+
         for data_type in ['urls', 'domains', 'subdomains']:
             results[data_type].extend([
                 {'Data': feature, 'version': version, 'ui_order': ui_index}
                 for feature in features[data_type]
             ])
-    
+
     # Generate plots for each data type
     plot_results = {}
     for data_type in ['urls', 'domains', 'subdomains']:
@@ -795,35 +731,6 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
     
     return plot_results
 
-def save_uploaded_files(stored_data, temp_dir):
-    apk_paths = []
-    for item in stored_data:
-        content_type, content_string = item['content'].split(',')
-        decoded = base64.b64decode(content_string)
-        file_path = os.path.join(temp_dir, item['filename'])
-        with open(file_path, 'wb') as f:
-            f.write(decoded)
-        apk_paths.append(file_path)
-    return apk_paths
-
-
-def save_uploaded_file_to_server(content, filename):
-    # Create a directory to store uploaded APKs if it doesn't exist
-    upload_dir = os.path.join(tempfile.gettempdir(), 'uploaded_apks')
-    os.makedirs(upload_dir, exist_ok=True)
-
-    # Generate a unique filename to avoid conflicts
-    unique_filename = f"{os.urandom(8).hex()}_{filename}"
-    file_path = os.path.join(upload_dir, unique_filename)
-
-    # Save the file
-    content_type, content_string = content.split(',')
-    decoded = base64.b64decode(content_string)
-    with open(file_path, 'wb') as f:
-        f.write(decoded)
-
-    return file_path
-
 
 
 
@@ -0,0 +1,98 @@
+# utils/version_diff.py
+# what changed between consecutive sampled versions: added, removed and persisting features
+import hashlib
+
+import plotly.graph_objects as go
+
+from utils.results_store import get_results_store
+
+
+def version_presence(count_matrix, version):
+    # feature set of one version from the feature x version count matrix
+    return frozenset(count_matrix.index[count_matrix[version].values > 0])
+
+
+def set_fingerprint(features):
+    return hashlib.sha1('\n'.join(sorted(features)).encode('utf-8', errors='replace')).hexdigest()
+
+
+def diff_sets(previous, current):
+    return {
+        'added': sorted(current - previous),
+        'removed': sorted(previous - current),
+        'persisting': len(current & previous),
+    }
+
+
+def source_fingerprint(sha256s):
+    # stored per-APK results never change for a given (sha256, params), so the APKs behind a version identify
+    # its feature set without rebuilding it
+    return 'apks:' + hashlib.sha1('\n'.join(sorted(sha256s)).encode()).hexdigest()
+
+
+def compute_deltas(count_matrix, versions, version_dates, package_name=None, data_type=None, params=None, store=None,
+                   version_sources=None):
+    # deltas are stored per (package, params, data_type, version pair); a stored delta is reused while both
+    # versions still come from the same APKs, so only new or changed pairs are diffed and written. feature sets
+    # are built only for the versions of those pairs, or for versions whose APKs aren't known
+    pairs = list(zip(versions[:-1], versions[1:]))
+    cached = store.get_deltas(package_name, params, data_type, pairs) if store is not None else {}
+    version_sources = version_sources or {}
+
+    presence = {}
+
+    def features(version):
+        if version not in presence:
+            presence[version] = version_presence(count_matrix, version)
+        return presence[version]
+
+    def fingerprint(version):
+        if version_sources.get(version):
+            return source_fingerprint(version_sources[version])
+        return set_fingerprint(features(version))
+
+    fingerprints = {version: fingerprint(version) for version in versions}
+    deltas = []
+    new_deltas = []
+    for from_version, to_version in pairs:
+        pair_fingerprint = f"{fingerprints[from_version]}:{fingerprints[to_version]}"
+        delta = cached.get((from_version, to_version))
+        if delta is None or delta['fingerprint'] != pair_fingerprint:
+            delta = dict(diff_sets(features(from_version), features(to_version)), fingerprint=pair_fingerprint)
+            new_deltas.append((from_version, to_version, delta))
+        deltas.append({
+            'from_version': from_version,
+            'to_version': to_version,
+            'date': version_dates.get(to_version),
+            'added': delta['added'],
+            'removed': delta['removed'],
+            'persisting': delta['persisting'],
+        })
+
+    if new_deltas and store is not None:
+        store.save_deltas(package_name, params, data_type, new_deltas)
+    return deltas
+
+
+def changes_timeline(count_matrix, versions, version_dates, package_name, data_type, params=None, version_sources=None):
+    if count_matrix is None or len(versions) < 2:
+        return []
+    store = get_results_store() if params is not None else None
+    return compute_deltas(count_matrix, versions, version_dates, package_name, data_type, params, store, version_sources)
+
+
+def plot_changes_timeline(deltas, package_name, data_type):
+    labels = [f"{delta['from_version']} → {delta['to_version']} ({delta['date']})" for delta in deltas]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=labels, y=[len(delta['added']) for delta in deltas], name='Added', marker_color='green'))
+    fig.add_trace(go.Bar(x=labels, y=[-len(delta['removed']) for delta in deltas], name='Removed', marker_color='red'))
+    fig.add_trace(go.Scatter(x=labels, y=[delta['persisting'] for delta in deltas], name='Persisting', mode='lines+markers',
+                             line=dict(color='grey'), yaxis='y2'))
+    fig.update_layout(
+        title=f"{data_type.capitalize()} Changes Between Versions, {package_name}",
+        barmode='relative',
+        yaxis=dict(title='Added / removed'),
+        yaxis2=dict(title='Persisting', overlaying='y', side='right', showgrid=False),
+        legend=dict(orientation='h'),
+    )
+    return fig
@@ -0,0 +1,153 @@
+# utils/worker_pool.py
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# global core budget shared by every page and job, the per-request core setting only caps a job's share of it
+MAX_WORKERS = int(os.environ.get('JANUS_MAX_WORKERS', max(1, mp.cpu_count() - 1)))
+# a worker whose resident memory grows past this gets the pool replaced, once its queued tasks have drained
+MAX_WORKER_RSS_MB = int(os.environ.get('JANUS_WORKER_MAX_RSS_MB', 1536))
+# downloads are network bound, so they run on threads rather than processes
+DOWNLOAD_THREADS = int(os.environ.get('JANUS_DOWNLOAD_THREADS', 8))
+
+
+def warm_worker():
+    # pay for the heavy imports and the public suffix list once per worker instead of once per task
+    try:
+        import pandas  # noqa: F401
+        import tldextract
+        from androguard.core.bytecodes import dvm  # noqa: F401
+        from androguard.misc import AnalyzeAPK  # noqa: F401
+        import utils.historical_connectivity_logic  # noqa: F401  compiled patterns live at module level
+
+        tldextract.extract('https://www.example.com')
+    except Exception as e:
+        # an initializer that raises would make the pool respawn workers forever
+        logging.warning(f"Worker warm-up failed: {str(e)}")
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is in KB on Linux; this is a peak, which is still a fair signal for recycling
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0
+
+
+def run_task(func, args):
+    result = func(*args)
+    return result, current_rss_mb()
+
+
+class SharedWorkerPool:
+    def __init__(self, processes=MAX_WORKERS, max_rss_mb=MAX_WORKER_RSS_MB):
+        self.processes = max(1, processes)
+        self.max_rss_mb = max_rss_mb
+        self._lock = threading.Lock()
+        self._pool = None
+        self._recycle = False
+
+    def _create_pool(self):
+        logging.info(f"Starting shared worker pool with {self.processes} processes")
+        return mp.Pool(self.processes, initializer=warm_worker)
+
+    def _retire(self, pool):
+        # close() lets tasks already queued on the old pool finish; join() waits for them, so the old and the
+        # new pool never run side by side and the process count stays within the core budget
+        pool.close()
+        pool.join()
+
+    def _submit(self, func, args, callback, error_callback):
+        with self._lock:
+            if self._recycle and self._pool is not None:
+                logging.info(f"Recycling shared worker pool, a worker went over {self.max_rss_mb} MB")
+                self._retire(self._pool)
+                self._pool = None
+            if self._pool is None:
+                self._pool = self._create_pool()
+                self._recycle = False
+            return self._pool.apply_async(run_task, (func, args), callback=callback, error_callback=error_callback)
+
+    def _check_memory(self, rss_mb):
+        if rss_mb > self.max_rss_mb:
+            self._recycle = True
+
+    def imap_unordered(self, func, iterable, max_parallel=None):
+        # yields (index, result) as tasks finish, keeping at most max_parallel of this caller's tasks in flight
+        limit = max(1, min(max_parallel or self.processes, self.processes))
+        done = queue.Queue()
+        tasks = enumerate(iterable)
+
+        def on_result(index):
+            def callback(value):
+                result, rss_mb = value
+                self._check_memory(rss_mb)
+                done.put((index, result, None))
+            return callback
+
+        def on_error(index):
+            return lambda error: done.put((index, None, error))
+
+        def submit_next():
+            for index, args in tasks:
+                self._submit(func, args, on_result(index), on_error(index))
+                return True
+            return False
+
+        pending = 0
+        while pending < limit and submit_next():
+            pending += 1
+
+        while pending:
+            index, result, error = done.get()
+            pending -= 1
+            if submit_next():
+                pending += 1
+            if error is not None:
+                raise error
+            yield index, result
+
+    def starmap(self, func, iterable, max_parallel=None):
+        tasks = list(iterable)
+        results = [None] * len(tasks)
+        for index, result in self.imap_unordered(func, tasks, max_parallel):
+            results[index] = result
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+_shared_pool = None
+_download_executor = None
+_init_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _shared_pool
+    with _init_lock:
+        if _shared_pool is None:
+            _shared_pool = SharedWorkerPool()
+        return _shared_pool
+
+
+def get_download_executor():
+    global _download_executor
+    with _init_lock:
+        if _download_executor is None:
+            _download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS, thread_name_prefix='apk-download')
+        return _download_executor